@@ -1,3 +1,5 @@
-from .inbound import follow, accept, undo, create, delete, like
+from .inbound import follow, accept, undo, create, update, delete, like
+from .inbound import resolve_actors
 
-__all__ = ["follow", "accept", "undo", "create", "delete", "like"]
+__all__ = ["follow", "accept", "undo", "create", "update", "delete", "like"]
+__all__ += ["resolve_actors"]
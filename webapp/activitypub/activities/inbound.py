@@ -2,31 +2,71 @@ import logging
 from webapp.activitypub.models import Actor
 from webapp.activitypub.activity import ActivityObject
 from webapp.activitypub.tasks import fetchRemoteActor
+from webapp.activitypub.local import is_local
+from webapp.activitypub.signature import invalidatePublicKey
 
 
 from django.http import JsonResponse
 from django.conf import settings
-from webapp.signals import action
+from webapp.activitypub.signals import action
 
 
 logger = logging.getLogger(__name__)
 
 
+def _object_id(activity: ActivityObject) -> str | None:
+    """
+    Return the id of the activity's object, whether embedded or referenced.
+    """
+    if isinstance(activity.object, dict):
+        return activity.object.get("id")
+    return activity.object
+
+
+def resolve_actors(activity: ActivityObject) -> dict[str, Actor]:
+    """
+    Load the actors `activity` refers to, in one query.
+
+    The `actor` of the activity has signed it, and is created if it is not
+    known yet. The `object` is included if it is a known actor, i.e. the
+    local actor of a `Follow`.
+
+    :return: The actors by id.
+    """
+    ids = {
+        iri
+        for iri in (getattr(activity, "actor", None), _object_id(activity))
+        if isinstance(iri, str)
+    }
+    actors = Actor.objects.in_bulk(ids)
+
+    missing = [
+        Actor(id=iri)
+        for iri in (getattr(activity, "actor", None),)
+        if isinstance(iri, str) and iri not in actors
+    ]
+    if missing:
+        Actor.objects.bulk_create(missing, ignore_conflicts=True)
+        actors.update({actor.id: actor for actor in missing})
+    return actors
+
+
 def action_decorator(f):
     def wrapper(target, activity: ActivityObject, *args, **kwargs):
-        try:
-            localactor = Actor.objects.get(id=activity.actor)
-        except Actor.DoesNotExist:
+        actors = kwargs.pop("actors", None)
+        if actors is None:
+            actors = resolve_actors(activity)
+
+        localactor = actors.get(activity.actor)
+        if localactor is None:
             logger.error(f"Actor not found: '{activity.actor}'")
             return JsonResponse(
                 {"error": "Actor f'{activity.actor}' not found"}, status=404
             )
 
-        try:
-            action_object = Actor.objects.get(id=activity.object)
-        except Actor.DoesNotExist:
+        action_object = actors.get(_object_id(activity))
+        if action_object is None:
             logger.error(f"{activity.type}: Object not found: '{activity.object}'")
-            action_object = None
 
         action.send(
             sender=localactor,
@@ -35,13 +75,15 @@ def action_decorator(f):
             target=target,
         )  # noqa: E501
 
-        return f(target, activity, *args, **kwargs)
+        return f(target, activity, *args, actors=actors, **kwargs)
 
     return wrapper
 
 
 @action_decorator
-def create(target: Actor, activity: ActivityObject) -> JsonResponse:
+def create(
+    target: Actor, activity: ActivityObject, actors: dict[str, Actor]
+) -> JsonResponse:
     """
     Create a new `:model:Note`.
 
@@ -84,13 +126,21 @@ def create(target: Actor, activity: ActivityObject) -> JsonResponse:
     assert isinstance(note, dict)
 
     if note.get('type') == "Note":
-        from webapp.models import Note
+        from webapp.activitypub.models import Note
 
-        localNote = Note.objects.create(  # noqa: F841
-            remoteID=note.get("id"),
-            content=note.get("content"),
-            published=note.get("published"),
-        )  # noqa: F841
+        fields = {
+            "content": note.get("content"),
+            "published": note.get("published"),
+        }
+        if note.get("id") and is_local(note.get("id")):
+            logger.debug(f"Note {note.get('id')} is local")
+        elif note.get("id"):
+            # Once, even when dispatched to several recipients of a shared inbox.
+            localNote, created = Note.objects.get_or_create(  # noqa: F841
+                remoteID=note.get("id"), defaults=fields
+            )  # noqa: F841
+        else:
+            localNote = Note.objects.create(**fields)  # noqa: F841
 
     return JsonResponse(
         {
@@ -100,35 +150,74 @@ def create(target: Actor, activity: ActivityObject) -> JsonResponse:
 
 
 @action_decorator
-def accept(target: Actor, activity: ActivityObject) -> JsonResponse:
+def accept(
+    target: Actor, activity: ActivityObject, actors: dict[str, Actor]
+) -> JsonResponse:
     """
     Received an Accept.
 
     Remember the accept-id in the database.
     So we can later delete the follow request.
 
+    The `Follow` is the one of the accepted activity, embedded in the
+    `Accept`: it was sent by its `actor`, and is accepted by its `object`,
+    the actor of the `Accept`.
+
     :param target: The target of the activity
     :param activity: The :py:class:webapp.activity.Activityobject`
+    :param actors: The actors of the activity, see :py:func:`resolve_actors`
     """
-    from webapp.models.activitypub.actor import Follow
+    from webapp.activitypub.models import Follow
+
+    accepted = activity.object
+    if not isinstance(accepted, dict) or accepted.get("type") != "Follow":
+        return JsonResponse({"status": "cannot accept"})
 
-    follow = Follow.objects.get(actor=activity.actor)
-    follow.accepted = activity.id  # remember the accept-id
-    follow.save()
+    if accepted.get("object") != activity.actor:
+        return JsonResponse({"error": "not the followed actor"}, status=403)
+
+    follows = Follow.objects.filter(
+        actor_id=accepted.get("actor"), object_id=accepted.get("object")
+    )
+    if not follows.update(accepted=activity.id):  # remember the accept-id
+        return JsonResponse({"status": "follow not found"})
 
     return JsonResponse({"status": "accepted."})
 
 
 @action_decorator
-def delete(target: Actor, activity: ActivityObject) -> JsonResponse:
+def update(
+    target: Actor, activity: ActivityObject, actors: dict[str, Actor]
+) -> JsonResponse:
+    """
+    Update an object.
+
+    Remote actors send an `Update` for themselves, i.e. after a key
+    rotation. Forget what is cached about them.
+    """
+    if _object_id(activity) == activity.actor:
+        invalidatePublicKey(activity.actor)
+        return JsonResponse({"status": "updated."})
+
+    return JsonResponse({"status": "cannot update"})
+
+
+@action_decorator
+def delete(
+    target: Actor, activity: ActivityObject, actors: dict[str, Actor]
+) -> JsonResponse:
     """
     Delete an activity.
     """
+    if _object_id(activity) == activity.actor:
+        invalidatePublicKey(activity.actor)
 
     return JsonResponse({"status": "cannot delete"})
 
 @action_decorator
-def like(target: Actor, activity: ActivityObject) -> JsonResponse:
+def like(
+    target: Actor, activity: ActivityObject, actors: dict[str, Actor]
+) -> JsonResponse:
     """
     Like an activity.
     """
@@ -136,7 +225,7 @@ def like(target: Actor, activity: ActivityObject) -> JsonResponse:
     return JsonResponse({"status": "cannot like"})
 
 @action_decorator
-def undo(target: Actor, activity: ActivityObject):
+def undo(target: Actor, activity: ActivityObject, actors: dict[str, Actor]):
     """
     Undo an activity.
 
@@ -156,29 +245,33 @@ def undo(target: Actor, activity: ActivityObject):
     if not activity.object:
         return JsonResponse({"status": "missing object"})
 
-    if (
-        not activity.actor and activity.object.get('type').lower() != "follow"  # noqa: E501
-    ):  # noqa: E501
+    undone = activity.object
+    if not isinstance(undone, dict) or undone.get("type") != "Follow":
         return JsonResponse({"status": "invalid object/unsupported activity"})
 
+    if undone.get("actor", activity.actor) != activity.actor:
+        return JsonResponse({"error": "not the following actor"}, status=403)
+
+    from webapp.activitypub.models import Follow
 
-    from webapp.models.activitypub.actor import Follow
-    try:
-        follow = Follow.objects.get(accepted=activity.object.get('id'))
-    except Follow.DoesNotExist:
+    # counted by the `post_delete` receiver, see webapp.activitypub.counters
+    deleted, _ = Follow.objects.filter(
+        actor_id=activity.actor, object_id=undone.get("object")
+    ).delete()
+    if not deleted:
         return JsonResponse({"status": "follow not found"})
-    follow.delete()
     logger.error(f"{activity.actor} has undone {activity.object}")
 
     return JsonResponse({"status": "undone"})
 
 
 @action_decorator
-def follow(target: Actor, activity: ActivityObject):
+def follow(target: Actor, activity: ActivityObject, actors: dict[str, Actor]):
     """
 
     :param target: The target of the activity
     :param activity: The :py:class:webapp.activity.Activityobject`
+    :param actors: The actors of the activity, see :py:func:`resolve_actors`
 
     .. example:: Follow Activity {
         '@context': 'https://www.w3.org/ns/activitystreams',
@@ -200,13 +293,17 @@ def follow(target: Actor, activity: ActivityObject):
     # Create the actor profile in the database
     # and establish the follow relationship
     remoteActor = fetchRemoteActor(activity.actor)
-    remoteActorObject = Actor.objects.get(id=remoteActor.get("id"))
-    localActorObject = Actor.objects.get(id=activity.object)
+    remoteActorObject = actors[activity.actor]
+    localActorObject = actors.get(_object_id(activity))
+    if localActorObject is None:
+        return JsonResponse(
+            {"error": f"Actor '{activity.object}' not found"}, status=404
+        )
     remoteActorObject.follows.add(localActorObject)
 
     # Step 2:
     # Confirm the follow request to message.actor
-    from webapp.tasks.activitypub import acceptFollow
+    from webapp.activitypub.tasks import acceptFollow
 
     """
     .. todo::
@@ -15,6 +15,8 @@ from dataclasses import field
 # from dataclasses import asdict
 # from dataclasses import is_dataclass
 
+from webapp.activitypub.cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -40,10 +42,38 @@ def default_document_loader(url: str, options: dict = {}):
             return schemas["unknown"]
 
 
-def canonicalize(ld_data: dict) -> dict:
-    """ """
-    from pyld import jsonld
+def static_document_loader(url: str, options: dict = {}):
+    """
+    Load contexts from :py:data:`webapp.activitypub.schema.schemas`.
+
+    The documents never change, so they are tagged `static`: pyld then
+    keeps the resolved context, and every context processed relative to
+    it, in :py:data:`context_cache` instead of resolving them per call.
+    """
+    return dict(default_document_loader(url, options), tag="static")
+
+
+context_cache = TTLCache(maxsize=256, ttl=86400)
+"""Resolved and processed JSON-LD contexts, shared between calls."""
 
+
+def jsonld_options(**kwargs) -> dict:
+    """
+    Options for `pyld.jsonld` that resolve contexts offline and reuse them.
+    """
+    from pyld.context_resolver import ContextResolver
+
+    return {
+        "documentLoader": static_document_loader,
+        "contextResolver": ContextResolver(context_cache, static_document_loader),
+        **kwargs,
+    }
+
+
+def _context(ld_data: dict) -> list:
+    """
+    The `@context` of `ld_data` as a list, defaulting to Mastodon's.
+    """
     if not isinstance(ld_data, dict):
         raise ValueError("Pass decoded JSON data into LDDocument")
 
@@ -72,10 +102,294 @@ def canonicalize(ld_data: dict) -> dict:
                 "votersCount": "toot:votersCount",
             }
         )
+    return context
+
+
+def canonicalize(ld_data: dict) -> dict:
+    """
+    Expand `ld_data` and compact it against its own context.
+
+    Contexts are loaded from the bundled schemas and their processed form
+    is cached, so only the document itself is processed per call. See the
+    `canonicalize` management command for a benchmark.
+    """
+    from pyld import jsonld
+
+    context = _context(ld_data)
     ld_data["@context"] = context
 
-    jsonld.set_document_loader(default_document_loader)
-    return jsonld.compact(jsonld.expand(ld_data), context)
+    expanded = jsonld.expand(ld_data, jsonld_options())
+    return jsonld.compact(expanded, context, jsonld_options(skipExpansion=True))
+
+
+KNOWN_CONTEXTS = frozenset(
+    {
+        "https://www.w3.org/ns/activitystreams",
+        "https://w3id.org/security/v1",
+        "https://w3id.org/security/data-integrity/v1",
+        "https://w3id.org/security/multikey/v1",
+    }
+)
+"""Remote contexts that :py:func:`fast_canonicalize` handles."""
+
+
+class SlowPath(Exception):
+    """
+    The document uses JSON-LD features the fast path does not handle.
+    """
+
+
+_drop = object()
+
+_SIMPLE_DEFINITION = {
+    "reverse",
+    "protected",
+    "_prefix",
+    "_term_has_colon",
+    "@id",
+    "@type",
+    "@container",
+}
+"""Keys of term definitions without scoped contexts, languages etc."""
+
+
+class CompiledContext:
+    """
+    The term definitions of a known context, for :py:func:`fast_canonicalize`.
+
+    Compaction of a document against its own context mostly leaves it
+    alone. For the subset of JSON-LD used by Mastodon-compatible servers
+    the remaining changes are applied directly: `null` values are dropped,
+    single element arrays unwrapped, keyword aliases applied and IRIs
+    compacted to CURIEs (i.e. `as:Public`). Anything else raises
+    :py:class:`SlowPath`.
+    """
+
+    def __init__(self, active_context: dict) -> None:
+        self.mappings = {
+            term: definition
+            for term, definition in active_context["mappings"].items()
+            if definition
+        }
+        self.vocab = active_context.get("@vocab")
+        self.defaults = {"@base", "@direction", "@language"} & set(active_context)
+        self.prefixes = {
+            term: definition["@id"]
+            for term, definition in self.mappings.items()
+            if definition["_prefix"]
+        }
+        self.aliases = {
+            definition["@id"]: term
+            for term, definition in sorted(self.mappings.items(), reverse=True)
+            if definition["@id"] in ("@id", "@type")
+        }
+        self.terms: dict[str, list[str]] = {}
+        keys: dict[tuple, list[str]] = {}
+        for term, definition in self.mappings.items():
+            self.terms.setdefault(definition["@id"], []).append(term)
+            container = tuple(definition.get("@container", []))
+            keys.setdefault((definition["@id"], container), []).append(term)
+
+        self.unsupported = {
+            term
+            for term, definition in self.mappings.items()
+            if definition["reverse"]
+            or set(definition) - _SIMPLE_DEFINITION
+            or definition.get("@container", []) not in ([], ["@list"], ["@language"])
+            or definition.get("@type") == "@vocab"
+        }
+        for terms in keys.values():
+            if len(terms) > 1:
+                self.unsupported.update(terms)
+
+    @property
+    def eligible(self) -> bool:
+        """
+        Whether the context can be applied directly, i.e. sets no default
+        `@language` that would turn plain strings into language maps.
+        """
+        return (
+            self.vocab in (None, "_:")
+            and not self.defaults
+            and not any(":" in term for term in self.mappings)
+        )
+
+    def expand_iri(self, value: str) -> str:
+        if value.startswith("_:"):
+            raise SlowPath(f"blank node {value}")
+        prefix, colon, suffix = value.partition(":")
+        if not colon or prefix not in self.mappings:
+            return value
+        if prefix not in self.prefixes or suffix.startswith("//"):
+            raise SlowPath(f"ambiguous IRI {value}")
+        return self.prefixes[prefix] + suffix
+
+    def compact_iri(self, iri: str) -> str:
+        candidate = None
+        for term, prefix in self.prefixes.items():
+            if iri == prefix or not iri.startswith(prefix):
+                continue
+            curie = f"{term}:{iri[len(prefix) :]}"
+            if curie in self.mappings:
+                continue
+            if candidate is None or (len(curie), curie) < (len(candidate), candidate):
+                candidate = curie
+        return candidate or iri
+
+    def compact_id(self, value) -> str:
+        if not isinstance(value, str):
+            raise SlowPath(f"invalid @id {value!r}")
+        return self.compact_iri(self.expand_iri(value))
+
+    def compact_type(self, value) -> str:
+        if not isinstance(value, str):
+            raise SlowPath(f"invalid @type {value!r}")
+        if value in self.mappings:
+            iri = self.mappings[value]["@id"]
+        elif ":" in value:
+            iri = self.expand_iri(value)
+        elif self.vocab == "_:":
+            return value
+        else:
+            raise SlowPath(f"undefined type {value}")
+        terms = self.terms.get(iri, [])
+        if len(terms) > 1 or set(terms) & self.unsupported:
+            raise SlowPath(f"ambiguous type {value}")
+        return terms[0] if terms else self.compact_iri(iri)
+
+    def node(self, node: dict) -> dict:
+        result = {}
+        for key, value in node.items():
+            if value is None:
+                continue
+            if key in ("@id", "@type"):
+                key = self.aliases.get(key, key)
+            keyword = self.mappings.get(key, {}).get("@id")
+            if key in result:
+                raise SlowPath(f"duplicate {key}")
+            if keyword == "@id" or key == "@id":
+                result[key] = self.compact_id(value)
+            elif keyword == "@type" or key == "@type":
+                types = [self.compact_type(t) for t in _as_list(value)]
+                result[key] = types[0] if len(types) == 1 else types
+            elif key.startswith("@") or ":" in key or key in self.unsupported:
+                raise SlowPath(f"unsupported key {key}")
+            elif key in self.mappings:
+                if keyword.startswith("@"):
+                    raise SlowPath(f"unsupported alias {key}")
+                value = self.value(self.mappings[key], value)
+                if value is not _drop:
+                    result[key] = value
+            elif self.vocab == "_:":
+                result[key] = self.value({}, value)
+        return result
+
+    def value(self, definition: dict, value):
+        container = definition.get("@container", [])
+        if "@language" in container:
+            if not isinstance(value, dict) or any(
+                not isinstance(text, str) or language != language.lower()
+                for language, text in value.items()
+            ):
+                raise SlowPath(f"unsupported language map {value!r}")
+            return dict(value)
+        items = [self.item(definition, item) for item in _as_list(value)]
+        items = [item for item in items if item is not _drop]
+        if "@list" in container:
+            return items
+        if not isinstance(value, list) and not items:
+            return _drop
+        return items[0] if len(items) == 1 else items
+
+    def item(self, definition: dict, value):
+        type_ = definition.get("@type")
+        if value is None:
+            return _drop
+        if isinstance(value, list):
+            raise SlowPath("nested list")
+        if isinstance(value, dict):
+            if type_ not in (None, "@id") or any(
+                key.startswith("@") and key not in ("@id", "@type") for key in value
+            ):
+                raise SlowPath(f"unsupported value {value!r}")
+            node = self.node(value)
+            id_ = self.aliases.get("@id", "@id")
+            if type_ == "@id" and list(node) == [id_]:
+                return node[id_]
+            return node
+        if type_ == "@id":
+            return self.compact_id(value)
+        return value
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+compiled_contexts = TTLCache(maxsize=64, ttl=86400)
+"""Compiled known contexts, by their JSON serialization."""
+
+
+def compile_context(context: list) -> CompiledContext | None:
+    """
+    Compile `context` once, or return None if it is not a known context.
+    """
+    from pyld import jsonld
+
+    key = json.dumps(context, sort_keys=True)
+    compiled = compiled_contexts.get(key)
+    if compiled is None:
+        compiled = False
+        if all(isinstance(c, dict) or c in KNOWN_CONTEXTS for c in context):
+            processor = jsonld.JsonLdProcessor()
+            options = jsonld_options(processingMode="json-ld-1.1")
+            try:
+                active = processor.process_context(
+                    processor._get_initial_context(options), context, options
+                )
+            except jsonld.JsonLdError as e:
+                logger.info(f"Invalid context {context!r}: {e}")
+            else:
+                compiled = CompiledContext(active)
+                compiled = compiled.eligible and compiled
+        compiled_contexts.set(key, compiled)
+    return compiled or None
+
+
+def fast_canonicalize(ld_data: dict) -> dict | None:
+    """
+    Canonicalize `ld_data` without JSON-LD processing, if possible.
+
+    :return: The same result as :py:func:`canonicalize`, or None if the
+        document has an unknown context or uses unsupported features.
+    """
+    context = _context(ld_data)
+    compiled = compile_context(context)
+    if compiled is None:
+        return None
+    try:
+        node = compiled.node(
+            {key: value for key, value in ld_data.items() if key != "@context"}
+        )
+    except SlowPath as e:
+        logger.debug(f"Falling back to JSON-LD processing: {e}")
+        return None
+    return {"@context": context[0] if len(context) == 1 else context, **node}
+
+
+def parse(ld_data: dict) -> dict:
+    """
+    Canonicalize `ld_data`, taking the fast path where possible.
+
+    Set `JSONLD_FAST_PATH = False` to always process JSON-LD in full.
+    """
+    from django.conf import settings
+
+    if getattr(settings, "JSONLD_FAST_PATH", True):
+        result = fast_canonicalize(ld_data)
+        if result is not None:
+            return result
+    return canonicalize(ld_data)
 
 
 @dataclass
@@ -113,9 +427,9 @@ class ActivityObject:
         """
         match message:
             case dict():
-                self._fromDict(incoming=canonicalize(message))
+                self._fromDict(incoming=parse(message))
             case str():
-                self._fromDict(incoming=canonicalize(json.loads(message)))
+                self._fromDict(incoming=parse(json.loads(message)))
             case _:
                 raise ValueError("Invalid type for message")
 
@@ -6,6 +6,10 @@ from .models import Note
 from .models import Action
 from .models import Like
 from .models import Actor
+from .models import Delivery
+from .models import RemoteHost
+from .models import InboxItem
+from .models import InstancePolicy
 
 from django.conf import settings
 from django.utils.encoding import force_str as force_text  # Django >= 4.0
@@ -255,3 +259,45 @@ class LikeAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Like, LikeAdmin)
+
+
+class DeliveryAdmin(admin.ModelAdmin):
+    model = Delivery
+    date_hierarchy = "created"
+    list_display = ("__str__", "host", "status", "attempts", "next_attempt")
+    list_filter = ("status",)
+    search_fields = ("inbox", "host")
+
+
+admin.site.register(Delivery, DeliveryAdmin)
+
+
+class RemoteHostAdmin(admin.ModelAdmin):
+    model = RemoteHost
+    list_display = ("host", "failures", "last_failure", "open_until", "gone")
+    list_filter = ("gone",)
+    search_fields = ("host",)
+
+
+admin.site.register(RemoteHost, RemoteHostAdmin)
+
+
+class InboxItemAdmin(admin.ModelAdmin):
+    model = InboxItem
+    date_hierarchy = "received"
+    list_display = ("__str__", "actor", "status", "attempts", "processed")
+    list_filter = ("status",)
+    search_fields = ("path", "body")
+
+
+admin.site.register(InboxItem, InboxItemAdmin)
+
+
+class InstancePolicyAdmin(admin.ModelAdmin):
+    model = InstancePolicy
+    list_display = ("domain", "severity", "reject_media", "updated")
+    list_filter = ("severity", "reject_media")
+    search_fields = ("domain", "reason")
+
+
+admin.site.register(InstancePolicy, InstancePolicyAdmin)
@@ -1,5 +1,5 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ImproperlyConfigured
 import logging
@@ -16,18 +16,68 @@ class ActivitypubConfig(AppConfig):
 
     def ready(self):
         from webapp.activitypub import registry
-        from webapp.activitypub.models import Actor, Note, Like
+        from webapp.activitypub import counters
+        from webapp.activitypub.models import Action, Actor, Follow, Note, Like
+        from webapp.activitypub.models import InstancePolicy
+        from webapp.activitypub.policy import reloadPolicies
+        from django.test.signals import setting_changed
         from webapp.activitypub.signals import createActor, signalHandler, action
+        from webapp.activitypub.signals import invalidateActions, invalidateActor
+        from webapp.activitypub.signals import updateEndpoints
+        from webapp.activitypub.signature import invalidatePrivateKey
         from webapp.models import Profile
         from django.conf import settings
 
         logger.error("Successfully working with ActivityPub")
 
         post_save.connect(createActor, sender=Profile)
+        post_save.connect(updateEndpoints, sender=Profile)
+        post_save.connect(invalidatePrivateKey, sender=Profile)
 
         settings = settings._wrapped.__dict__
         settings.setdefault("BLOCKED_SERVERS", [])
+        settings.setdefault("INSTANCE_POLICY_CHECK_INTERVAL", 5)
         settings.setdefault("FETCH_RELATIONS", False)
+        settings.setdefault("JSONLD_FAST_PATH", True)
+        settings.setdefault("RESOLVER_CACHE_SIZE", 1024)
+        settings.setdefault("RESOLVER_TTL", 300)
+        settings.setdefault("RESOLVER_NEGATIVE_TTL", 30)
+        settings.setdefault("KEY_CACHE_SIZE", 1024)
+        settings.setdefault("KEY_CACHE_TTL", 3600)
+        settings.setdefault("KEY_REFRESH_INTERVAL", 60)
+        settings.setdefault("DELIVERY_MAX_WORKERS", 16)
+        settings.setdefault("DELIVERY_PER_HOST", 4)
+        settings.setdefault("DELIVERY_TIMEOUT", 10)
+        settings.setdefault("DELIVERY_MAX_ATTEMPTS", 12)
+        settings.setdefault("DELIVERY_BACKOFF_BASE", 60)
+        settings.setdefault("DELIVERY_BACKOFF_MAX", 86400)
+        settings.setdefault("CIRCUIT_BREAKER_THRESHOLD", 5)
+        settings.setdefault("HOST_GONE_DAYS", 7)
+        settings.setdefault("COLLECTION_PAGE_SIZE", 20)
+        settings.setdefault("ACTION_RENDER_TTL", 86400)
+        settings.setdefault("ACTOR_RENDER_TTL", 3600)
+        settings.setdefault("NODEINFO_TTL", 86400)
+        settings.setdefault("NODEINFO_MAX_AGE", 1800)
+        settings.setdefault("INBOX_ASYNC", False)
+        settings.setdefault("INBOX_MAX_ATTEMPTS", 5)
+        settings.setdefault("INBOX_DEDUP_CACHE_SIZE", 4096)
+        settings.setdefault("INBOX_DEDUP_TTL", 7 * 86400)
+        settings.setdefault("FETCH_TIMEOUT", 10)
+        settings.setdefault("FETCH_NEGATIVE_TTL", 600)
+        settings.setdefault("FETCH_STALE_TTL", 7 * 86400)
+        settings.setdefault("REMOTE_ACTOR_TTL", 86400)
+        settings.setdefault(
+            "FETCH_TTL",
+            {
+                "*": 3600,
+                "Application": 86400,
+                "Group": 86400,
+                "Organization": 86400,
+                "Person": 86400,
+                "Service": 86400,
+                "Note": 600,
+            },
+        )
 
         try:
             registry.register(Actor)
@@ -49,4 +99,22 @@ class ActivitypubConfig(AppConfig):
             logger.error(f"Fucking fix this error: {e}")
 
         action.connect(signalHandler, dispatch_uid="activitypub")
+        for model in (Action, Actor, Like, Note):
+            post_save.connect(invalidateActions, sender=model)
+            post_delete.connect(invalidateActions, sender=model)
+        for model in (Actor, Profile):
+            post_save.connect(invalidateActor, sender=model)
+            post_delete.connect(invalidateActor, sender=model)
+        pre_save.connect(invalidateActor, sender=Profile)
+
+        post_save.connect(counters.countFollow, sender=Follow)
+        post_delete.connect(counters.countFollow, sender=Follow)
+        m2m_changed.connect(counters.countFollows, sender=Actor.follows.through)
+        post_save.connect(counters.countLike, sender=Like)
+        post_delete.connect(counters.countLike, sender=Like)
+        post_delete.connect(counters.uncountAction, sender=Action)
+
+        post_save.connect(reloadPolicies, sender=InstancePolicy)
+        post_delete.connect(reloadPolicies, sender=InstancePolicy)
+        setting_changed.connect(reloadPolicies)
         logger.info("WebApp ready.")
@@ -0,0 +1,109 @@
+"""
+.. py:module:: webapp.activitypub.cache
+    :synopsis: Small in-process caches for federation hot paths.
+
+The django cache is shared between workers, but it can only hold picklable
+values. Parsed key objects, compiled contexts and similar things are not
+picklable or too expensive to (de-)serialize on every access, so they are
+kept per process in a :py:class:`TTLCache`.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+_missing = object()
+
+
+class TTLCache:
+    """
+    A thread-safe mapping with time-to-live and LRU eviction.
+
+    Entries expire `ttl` seconds after they have been stored. Once the
+    cache holds `maxsize` entries, the least recently used entry is evicted.
+
+    .. doctest::
+
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.get("a")
+
+    .. testoutput::
+
+        1
+    """
+
+    def __init__(
+        self, maxsize: int = 512, ttl: float = 3600, timer: Callable = time.monotonic
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _missing) is not _missing
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the value for `key`, or `default` if missing or expired.
+        """
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires <= self.timer():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """
+        Store `value` for `key`, optionally with a specific `ttl`.
+        """
+        expires = self.timer() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> bool:
+        """
+        Remove `key`. Return whether it was present.
+        """
+        with self._lock:
+            return self._data.pop(key, _missing) is not _missing
+
+    def delete_many(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Remove all keys for which `predicate` returns True.
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
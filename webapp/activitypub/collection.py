@@ -0,0 +1,183 @@
+"""
+.. py:module:: webapp.activitypub.collection
+    :synopsis: Paginated `OrderedCollection` documents.
+
+The followers, following, liked and outbox collections of an actor are
+served by :py:class:`OrderedCollection`. Without a `page` parameter the
+collection itself is returned, with `totalItems` and a link to the `first`
+page. Pages are `OrderedCollectionPage` documents with the newest items
+first and a `next` link.
+
+Pages are selected with a cursor (keyset pagination) on an indexed
+timestamp instead of an offset: `max_id` holds the timestamp and primary
+key of the last item of the previous page, `min_id` those of the first
+item of the next page. Every page is an index range scan, however deep
+it is. The cursors are opaque to clients.
+
+.. code-block:: python
+
+    # settings.py
+    COLLECTION_PAGE_SIZE = 20
+"""
+
+import base64
+from datetime import datetime
+from typing import Callable
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+
+
+def encode_cursor(timestamp: datetime, pk) -> str:
+    """
+    The cursor pointing to the item with `timestamp` and `pk`.
+    """
+    value = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(value).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """
+    The timestamp and primary key a cursor points to.
+
+    :raises ValueError: If `cursor` is not a valid cursor.
+    """
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, _, pk = value.decode().partition("|")
+        return datetime.fromisoformat(timestamp), pk
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class OrderedCollection:
+    """
+    An `OrderedCollection` of the rows of `queryset`, newest first.
+
+    :param id: The IRI of the collection.
+    :param queryset: The items of the collection.
+    :param item: Returns the JSON value of an item for a row, i.e. its IRI.
+    :param timestamp: The indexed field the collection is ordered by.
+    :param page_size: Items per page, defaults to `COLLECTION_PAGE_SIZE`.
+    :param items: Returns the JSON values for all rows of a page at once,
+        instead of `item`.
+    :param total: The number of items, if it is known without counting,
+        see :py:mod:`webapp.activitypub.counters`.
+    """
+
+    def __init__(
+        self,
+        id: str,
+        queryset: QuerySet,
+        item: Callable | None = None,
+        timestamp: str = "created",
+        page_size: int | None = None,
+        items: Callable | None = None,
+        total: int | None = None,
+    ) -> None:
+        self.id = id
+        self.queryset = queryset
+        self.item = item
+        self.items = items or (lambda rows: [self.item(row) for row in rows])
+        self.timestamp = timestamp
+        self.page_size = page_size or settings.COLLECTION_PAGE_SIZE
+        self.total = total
+
+    def url(self, **params) -> str:
+        return f"{self.id}?{urlencode(dict(page='true', **params))}"
+
+    def count(self) -> int:
+        """
+        The number of items, counted by the database unless `total` is set.
+        """
+        if self.total is not None:
+            return self.total
+        return self.queryset.count()
+
+    def collection(self) -> dict:
+        """
+        The `OrderedCollection`, linking to its first page.
+        """
+        return {
+            "@context": "https://www.w3.org/ns/activitystreams",
+            "id": self.id,
+            "type": "OrderedCollection",
+            "totalItems": self.count(),
+            "first": self.url(),
+        }
+
+    def after(self, queryset: QuerySet, cursor: str, newer: bool) -> QuerySet:
+        """
+        The rows of `queryset` older than `cursor`, or newer if `newer`.
+        """
+        timestamp, pk = decode_cursor(cursor)
+        op = "gt" if newer else "lt"
+        return queryset.filter(
+            Q(**{f"{self.timestamp}__{op}": timestamp})
+            | Q(**{self.timestamp: timestamp, f"pk__{op}": pk})
+        )
+
+    def rows(self, max_id: str | None = None, min_id: str | None = None) -> list:
+        """
+        The rows of the page after the cursor `max_id`, or before `min_id`,
+        newest first, plus one to tell whether there are more.
+        """
+        ordering = (f"-{self.timestamp}", "-pk")
+        if min_id:
+            queryset = self.after(self.queryset, min_id, newer=True)
+            ordering = (self.timestamp, "pk")
+        elif max_id:
+            queryset = self.after(self.queryset, max_id, newer=False)
+        else:
+            queryset = self.queryset
+        rows = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        if min_id:
+            more = rows[self.page_size :]
+            rows = list(reversed(rows[: self.page_size])) + more
+        return rows
+
+    def cursor(self, row) -> str:
+        return encode_cursor(getattr(row, self.timestamp), row.pk)
+
+    def page(self, max_id: str | None = None, min_id: str | None = None) -> dict:
+        """
+        The `OrderedCollectionPage` after the cursor `max_id`, or the one
+        before `min_id`.
+
+        `next` links to older items, `prev` to newer ones; they are left out
+        at the end and at the start of the collection.
+
+        :raises ValueError: If a cursor is not valid.
+        """
+        rows = self.rows(max_id, min_id)
+        items, more = rows[: self.page_size], len(rows) > self.page_size
+        if min_id:
+            id = self.url(min_id=min_id)
+        elif max_id:
+            id = self.url(max_id=max_id)
+        else:
+            id = self.url()
+        result = {
+            "@context": "https://www.w3.org/ns/activitystreams",
+            "id": id,
+            "type": "OrderedCollectionPage",
+            "partOf": self.id,
+            "orderedItems": self.items(items),
+        }
+        if items and (more or min_id):
+            result["next"] = self.url(max_id=self.cursor(items[-1]))
+        if items and (max_id or (min_id and more)):
+            result["prev"] = self.url(min_id=self.cursor(items[0]))
+        return result
+
+    def document(self, params) -> dict:
+        """
+        The collection, or one of its pages, as requested by `params`.
+
+        :param params: The query parameters of the request.
+        :raises ValueError: If the requested cursor is not valid.
+        """
+        if "page" in params or "max_id" in params or "min_id" in params:
+            return self.page(params.get("max_id"), params.get("min_id"))
+        return self.collection()
@@ -0,0 +1,172 @@
+"""
+.. py:module:: webapp.activitypub.counters
+    :synopsis: Denormalized counters on :py:class:`Actor`.
+
+Every :py:class:`webapp.activitypub.models.Actor` keeps the sizes of its
+collections, so they do not have to be counted for every request:
+
+    - `followers_count`: :py:class:`Follow` rows with the actor as `object`
+    - `following_count`: :py:class:`Follow` rows with the actor as `actor`
+    - `likes_count`: :py:class:`Like` rows of the actor
+    - `statuses_count`: public :py:class:`Action` rows of a local actor,
+      its outbox, see :py:meth:`webapp.activitypub.managers.ActionManager.outbox`
+
+The counters are adjusted in the transaction that changes the rows, by
+the receivers below and by :py:func:`webapp.activitypub.signals.signalHandler`:
+`Follow.save` and `Like.save` run their `post_save` receivers atomically,
+deletes and `m2m_changed` run theirs within the transaction Django opens
+for them, and actions are written and counted in one.
+Writes that bypass signals, i.e. `QuerySet.update` or raw SQL, make them
+drift; :py:func:`reconcile` (`manage.py counters`) recounts them.
+"""
+
+import logging
+from collections import Counter
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from webapp.activitypub.models import Action, Actor, Follow, Like
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = (
+    "followers_count",
+    "following_count",
+    "likes_count",
+    "statuses_count",
+)
+
+
+def adjust(field: str, deltas: dict, actors=None) -> None:
+    """
+    Add `deltas` (by actor id) to the counter `field`, never below zero.
+
+    :param actors: The actors that have the counter, default all.
+    """
+    if actors is None:
+        actors = Actor.objects.all()
+    by_delta = {}
+    for actor_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(actor_id)
+    for delta, actor_ids in by_delta.items():
+        actors.filter(pk__in=actor_ids).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def count_actions(actions, sign: int = 1) -> None:
+    """
+    Count public `actions` of local actors in `statuses_count`.
+    """
+    content_type = ContentType.objects.get_for_model(Actor)
+    deltas = Counter(
+        action.actor_object_id
+        for action in actions
+        if action.public and action.actor_content_type_id == content_type.pk
+    )
+    adjust(
+        "statuses_count",
+        {key: sign * n for key, n in deltas.items()},
+        actors=Actor.objects.filter(profile__isnull=False),
+    )
+
+
+def actual(field: str):
+    """
+    An expression counting the rows behind the counter `field`.
+    """
+    match field:
+        case "followers_count":
+            rows = Follow.objects.filter(object=OuterRef("pk")).values("object")
+        case "following_count":
+            rows = Follow.objects.filter(actor=OuterRef("pk")).values("actor")
+        case "likes_count":
+            rows = Like.objects.filter(actor=OuterRef("pk")).values("actor")
+        case "statuses_count":
+            rows = Action.objects.outbox(OuterRef("pk")).values("actor_object_id")
+        case _:
+            raise ValueError(f"Unknown counter {field}")
+    return Coalesce(
+        Subquery(rows.order_by().annotate(count=Count("pk")).values("count")), 0
+    )
+
+
+def reconcile(queryset=None) -> dict[str, int]:
+    """
+    Recount the counters of the actors in `queryset`, default all.
+
+    :return: The number of actors whose counter had drifted, per counter.
+    """
+    if queryset is None:
+        queryset = Actor.objects.all()
+    result = {}
+    for field in COUNTERS:
+        expression = actual(field)
+        drifted = list(
+            queryset.annotate(actual=expression)
+            .exclude(**{field: F("actual")})
+            .values_list("pk", flat=True)
+        )
+        if drifted:
+            Actor.objects.filter(pk__in=drifted).update(**{field: actual(field)})
+            logger.info(f"Reconciled {field} of {len(drifted)} actors")
+        result[field] = len(drifted)
+    return result
+
+
+def countFollow(sender, instance, **kwargs) -> None:
+    """
+    Count a created or deleted :py:class:`Follow`.
+
+    Connected to `post_save` and `post_delete` of :py:class:`Follow`.
+    """
+    if kwargs.get("created") is False:
+        return
+    sign = 1 if kwargs.get("created") else -1
+    adjust("followers_count", {instance.object_id: sign})
+    adjust("following_count", {instance.actor_id: sign})
+
+
+def countFollows(sender, instance, action, reverse, pk_set, **kwargs) -> None:
+    """
+    Count follows added with `Actor.follows.add()` or
+    `Actor.followed_by.add()`, which bypass `post_save`.
+
+    Removals delete the :py:class:`Follow` rows, and are counted by
+    :py:func:`countFollow`.
+
+    Connected to `m2m_changed` of `Actor.follows.through`.
+    """
+    if action != "post_add" or not pk_set:
+        return
+    if reverse:  # instance is followed by pk_set
+        adjust("followers_count", {instance.pk: len(pk_set)})
+        adjust("following_count", {pk: 1 for pk in pk_set})
+    else:  # instance follows pk_set
+        adjust("following_count", {instance.pk: len(pk_set)})
+        adjust("followers_count", {pk: 1 for pk in pk_set})
+
+
+def countLike(sender, instance, **kwargs) -> None:
+    """
+    Count a created or deleted :py:class:`Like`.
+
+    Connected to `post_save` and `post_delete` of :py:class:`Like`.
+    """
+    if kwargs.get("created") is False:
+        return
+    sign = 1 if kwargs.get("created") else -1
+    adjust("likes_count", {instance.actor_id: sign})
+
+
+def uncountAction(sender, instance, **kwargs) -> None:
+    """
+    Count a deleted :py:class:`Action`.
+
+    Connected to `post_delete` of :py:class:`Action`; created actions are
+    counted by :py:func:`webapp.activitypub.signals.signalHandler`.
+    """
+    count_actions([instance], sign=-1)
@@ -0,0 +1,467 @@
+"""
+.. py:module:: webapp.activitypub.delivery
+    :synopsis: Concurrent delivery of signed activities to remote inboxes.
+
+Outbound activities are signed with :py:func:`signedRequests` and sent
+concurrently by a :py:class:`DeliveryEngine`. The engine keeps one
+`requests.Session` with a keep-alive connection pool per remote host and
+caps the number of requests in flight per host, so one slow instance
+cannot occupy all workers.
+
+.. code-block:: python
+
+    from webapp.activitypub.delivery import deliver
+
+    results = deliver(actor.keyID, activity, inboxes)
+    failed = [result.inbox for result in results if not result.ok]
+
+:py:func:`deliver` records the health of every remote host and queues
+failed deliveries as :py:class:`webapp.activitypub.models.Delivery`, to be
+retried with exponential backoff by :py:func:`process_queue`.
+
+To publish an activity to its audience, :py:func:`expand_recipients`
+resolves `to`/`cc` (including the actor's followers collection) to actor
+ids and :py:func:`group_inboxes` collapses them onto one `sharedInbox`
+per remote instance, see :py:func:`publish`.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+from urllib.parse import urlparse
+
+import requests
+
+from webapp.activitypub.network import PinnedAdapter, ResolutionError
+from webapp.activitypub.policy import blocked
+from webapp.activitypub.signature import signedRequests
+from webapp.typing import url
+
+logger = logging.getLogger(__name__)
+
+PUBLIC = "https://www.w3.org/ns/activitystreams#Public"
+"""The special public collection, which is never delivered to."""
+
+ADDRESSING = ("to", "bto", "cc", "bcc", "audience")
+
+
+@dataclass
+class DeliveryResult:
+    """
+    The outcome of delivering an activity to one inbox.
+    """
+
+    inbox: url
+    status: int | None = None
+    error: str | None = None
+    elapsed: float = 0.0
+    attempted: bool = False
+    transient: bool = False  # did not validate, but may later
+
+    @property
+    def ok(self) -> bool:
+        return self.status is not None and 200 <= self.status < 300
+
+
+def _validate(inbox: url) -> bool:
+    from webapp.activitypub.tasks import is_valid
+
+    return is_valid(inbox)
+
+
+class DeliveryEngine:
+    """
+    Send signed activities to many inboxes concurrently.
+
+    :param max_workers: Number of requests in flight overall.
+    :param per_host: Number of requests in flight per remote host.
+    :param timeout: Connect and read timeout per request, in seconds.
+    :param validate: Callable to check an inbox url before sending,
+        defaults to the SSRF protection in :py:func:`is_valid`.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        per_host: int = 4,
+        timeout: float = 10,
+        validate: Callable[[url], bool] = _validate,
+    ) -> None:
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.validate = validate
+        self._sessions: dict[str, requests.Session] = {}
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="delivery"
+        )
+
+    def session(self, host: str) -> requests.Session:
+        """
+        Return the keep-alive session for `host`.
+        """
+        with self._lock:
+            if host not in self._sessions:
+                adapter = PinnedAdapter(pool_connections=1, pool_maxsize=self.per_host)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[host] = session
+                self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._sessions[host]
+
+    def send(self, request: requests.PreparedRequest) -> DeliveryResult:
+        """
+        Send one signed request, waiting for a free slot of its host.
+        """
+        host = urlparse(request.url).netloc
+        session = self.session(host)
+        start = time.monotonic()
+        with self._slots[host]:
+            try:
+                response = session.send(
+                    request, timeout=self.timeout, allow_redirects=False
+                )
+            except requests.RequestException as e:
+                logger.info(f"Delivery to {request.url} failed: {e}")
+                return DeliveryResult(
+                    inbox=request.url,
+                    error=str(e),
+                    elapsed=time.monotonic() - start,
+                    attempted=True,
+                )
+        logger.debug(f"Delivered to {request.url}: {response.status_code}")
+        return DeliveryResult(
+            inbox=request.url,
+            status=response.status_code,
+            error=None if response.ok else response.text[:255],
+            elapsed=time.monotonic() - start,
+            attempted=True,
+        )
+
+    def post(
+        self, key_id: str, messages: list[tuple[url, dict]]
+    ) -> list[DeliveryResult]:
+        """
+        Sign every `(inbox, message)` pair with `key_id` and post them.
+
+        :return: One :py:class:`DeliveryResult` per pair, in order.
+        """
+        results: list[DeliveryResult | None] = [None] * len(messages)
+        valid = []
+        for index, (inbox, message) in enumerate(messages):
+            try:
+                self.validate(inbox)
+            except ValueError as e:
+                results[index] = DeliveryResult(
+                    inbox=inbox,
+                    error=str(e),
+                    transient=isinstance(e, ResolutionError),
+                )
+                continue
+            valid.append(index)
+
+        signed = signedRequests(key_id, [messages[index] for index in valid])
+        for index, result in zip(valid, self._executor.map(self.send, signed)):
+            result.inbox = messages[index][0]
+            results[index] = result
+
+        return results
+
+    def deliver(
+        self, key_id: str, activity: dict, inboxes: list[url]
+    ) -> list[DeliveryResult]:
+        """
+        Sign `activity` with `key_id` and post it to every inbox.
+
+        :return: One :py:class:`DeliveryResult` per inbox, in order.
+        """
+        inboxes = list(dict.fromkeys(inboxes))  # keep order, drop duplicates
+        return self.post(key_id, [(inbox, activity) for inbox in inboxes])
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._slots.clear()
+
+
+_engine: DeliveryEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> DeliveryEngine:
+    """
+    Return the delivery engine of this process.
+    """
+    global _engine
+    from django.conf import settings
+
+    with _engine_lock:
+        if _engine is None:
+            _engine = DeliveryEngine(
+                max_workers=settings.DELIVERY_MAX_WORKERS,
+                per_host=settings.DELIVERY_PER_HOST,
+                timeout=settings.DELIVERY_TIMEOUT,
+            )
+        return _engine
+
+
+def _permanent(result: DeliveryResult) -> bool:
+    """
+    Whether retrying the delivery cannot succeed.
+    """
+    if not result.attempted:  # i.e. the inbox did not validate
+        return not result.transient
+    return (
+        result.status is not None
+        and 400 <= result.status < 500
+        and (result.status not in (408, 429))
+    )
+
+
+def _record_health(results: list[DeliveryResult]) -> None:
+    """
+    Update the :py:class:`RemoteHost` circuit breakers from `results`.
+
+    A host that answered at all is alive, even if it rejected the activity.
+    """
+    from webapp.activitypub.models import RemoteHost
+
+    alive: dict[str, bool] = {}
+    for result in results:
+        host = urlparse(result.inbox).netloc
+        alive[host] = alive.get(host, False) or result.ok or _permanent(result)
+
+    hosts = RemoteHost.objects.in_bulk(list(alive))
+    for host, ok in alive.items():
+        if ok:
+            if host in hosts:
+                hosts[host].succeeded()
+        else:
+            hosts.get(host, RemoteHost(host=host)).failed()
+
+
+def deliver(key_id: str, activity: dict, inboxes: list[url]) -> list[DeliveryResult]:
+    """
+    Deliver `activity`, signed with `key_id`, to `inboxes`.
+
+    Inboxes on hosts with an open circuit are not attempted, and hosts
+    that are gone are skipped. Deliveries that fail for a transient reason
+    are queued as :py:class:`Delivery` and retried by :py:func:`process_queue`.
+
+    Local inboxes are delivered to in-process, without signing, see
+    :py:func:`webapp.activitypub.local.deliver`. Blocked hosts are skipped,
+    see :py:mod:`webapp.activitypub.policy`.
+    """
+    from webapp.activitypub import local
+    from webapp.activitypub.models import Delivery, RemoteHost
+
+    inboxes = list(dict.fromkeys(inboxes))
+    results = {
+        result.inbox: result
+        for result in local.deliver(
+            activity, [inbox for inbox in inboxes if local.is_local(inbox)]
+        )
+    }
+    for inbox in inboxes:
+        if inbox not in results and blocked(inbox):
+            results[inbox] = DeliveryResult(inbox=inbox, error="Host is blocked")
+    remote = [inbox for inbox in inboxes if inbox not in results]
+    hosts = RemoteHost.objects.in_bulk([urlparse(inbox).netloc for inbox in remote])
+
+    attempt = []
+    for inbox in remote:
+        host = hosts.get(urlparse(inbox).netloc)
+        if host is None or host.available:
+            attempt.append(inbox)
+        elif host.gone:
+            results[inbox] = DeliveryResult(inbox=inbox, error="Host is gone")
+        else:
+            results[inbox] = DeliveryResult(inbox=inbox, error="Circuit open")
+            Delivery.objects.create(
+                key_id=key_id,
+                inbox=inbox,
+                host=host.host,
+                activity=activity,
+                next_attempt=host.open_until,
+            )
+
+    attempted = get_engine().deliver(key_id, activity, attempt) if attempt else []
+    _record_health([result for result in attempted if result.attempted])
+    for result in attempted:
+        results[result.inbox] = result
+        if not result.ok and not _permanent(result):
+            Delivery(
+                key_id=key_id,
+                inbox=result.inbox,
+                host=urlparse(result.inbox).netloc,
+                activity=activity,
+            ).failed(result.error)
+
+    return [results[inbox] for inbox in inboxes]
+
+
+def process_queue(limit: int = 100, force: bool = False) -> dict[str, int]:
+    """
+    Retry queued deliveries that are due.
+
+    Rows are claimed by moving their next attempt past the delivery
+    timeout, so concurrent workers do not pick up the same deliveries.
+
+    :param limit: The maximum number of deliveries to attempt.
+    :param force: Attempt pending deliveries even if they are not due yet.
+    :return: The number of deliveries per resulting status.
+    """
+    from datetime import timedelta
+
+    from django.conf import settings
+    from django.db import transaction
+    from django.utils.timezone import now
+
+    from webapp.activitypub.models import Delivery, RemoteHost
+
+    with transaction.atomic():
+        due = Delivery.objects.select_for_update(skip_locked=True).filter(
+            status=Delivery.Status.PENDING
+        )
+        if not force:
+            due = due.filter(next_attempt__lte=now())
+        due = list(due.order_by("next_attempt")[:limit])
+        Delivery.objects.filter(pk__in=[d.pk for d in due]).update(
+            next_attempt=now() + timedelta(seconds=3 * settings.DELIVERY_TIMEOUT)
+        )
+
+    hosts = RemoteHost.objects.in_bulk({d.host for d in due})
+    batches: dict[str, list[Delivery]] = {}
+    for delivery in due:
+        host = hosts.get(delivery.host)
+        if host is not None and host.gone:
+            delivery.failed("Host is gone", permanent=True)
+        elif host is not None and not host.available and not force:
+            delivery.next_attempt = host.open_until
+            delivery.save(update_fields=["next_attempt", "updated"])
+        else:
+            batches.setdefault(delivery.key_id, []).append(delivery)
+
+    for key_id, deliveries in batches.items():
+        try:
+            results = get_engine().post(
+                key_id, [(d.inbox, d.activity) for d in deliveries]
+            )
+        except Exception as e:  # i.e. the local key is gone
+            logger.error(f"Cannot sign deliveries for {key_id}: {e}")
+            for delivery in deliveries:
+                delivery.failed(str(e), permanent=True)
+            continue
+
+        _record_health([result for result in results if result.attempted])
+        for delivery, result in zip(deliveries, results):
+            if result.ok:
+                delivery.attempts += 1
+                delivery.status = Delivery.Status.DELIVERED
+                delivery.last_error = ""
+                delivery.save()
+            else:
+                delivery.failed(result.error, permanent=_permanent(result))
+
+    counts = {status: 0 for status in Delivery.Status.values}
+    for delivery in due:
+        counts[delivery.status] += 1
+    return counts
+
+
+def _addresses(value) -> list[url]:
+    if value is None:
+        return []
+    if isinstance(value, (str, dict)):
+        value = [value]
+    return [v.get("id") if isinstance(v, dict) else v for v in value]
+
+
+def expand_recipients(activity: dict, actor) -> list[url]:
+    """
+    Resolve the audience of `activity` to a sorted list of actor ids.
+
+    The public collection is dropped. The followers collection of the
+    sending `actor` is replaced by the ids of its followers. The sending
+    actor itself is never a recipient.
+
+    :param activity: The activity to be published.
+    :param actor: The sending :py:class:`webapp.activitypub.models.Actor`.
+    """
+    followers = actor.followers
+
+    recipients = set()
+    for field in ADDRESSING:
+        for address in _addresses(activity.get(field)):
+            if not address or address == PUBLIC:
+                continue
+            if address == followers:
+                recipients.update(actor.followed_by.values_list("id", flat=True))
+                continue
+            recipients.add(address)
+
+    recipients.discard(actor.id)
+    return sorted(recipients)
+
+
+def group_inboxes(recipients: list[url]) -> list[url]:
+    """
+    Return the inboxes to deliver to for `recipients`.
+
+    Recipients are grouped by host. Recipients that advertise
+    `endpoints.sharedInbox` are collapsed onto that shared inbox, so every
+    instance receives one request instead of one per recipient.
+
+    The endpoints stored on :py:class:`webapp.activitypub.models.Actor`
+    are used; the documents of recipients without a stored inbox are
+    fetched, which stores them. Recipients that cannot be resolved are
+    skipped.
+    """
+    from webapp.activitypub.models import Actor
+    from webapp.activitypub.tasks import fetchRemoteActor
+
+    actors = Actor.objects.in_bulk(recipients)
+    hosts: dict[str, set] = {}
+    for recipient in recipients:
+        if blocked(recipient):
+            logger.info(f"Recipient {recipient} is blocked")
+            continue
+        actor = actors.get(recipient)
+        if actor is not None and actor.inbox:
+            endpoints = {"inbox": actor.inbox, "sharedInbox": actor.sharedInbox}
+        else:
+            try:
+                document = fetchRemoteActor(recipient)
+            except Exception as e:
+                logger.info(f"Cannot resolve recipient {recipient}: {e}")
+                continue
+            endpoints = Actor.document_endpoints(document)
+
+        inbox = endpoints.get("sharedInbox") or endpoints.get("inbox")
+        if not inbox:
+            logger.info(f"Recipient {recipient} has no inbox")
+            continue
+        hosts.setdefault(urlparse(recipient).netloc, set()).add(inbox)
+
+    return [inbox for host in sorted(hosts) for inbox in sorted(hosts[host])]
+
+
+def publish(actor, activity: dict) -> list[DeliveryResult]:
+    """
+    Deliver `activity` of the local `actor` to its whole audience.
+
+    Blind recipients (`bto`, `bcc`) are delivered to, but stripped from
+    the delivered activity.
+    """
+    inboxes = group_inboxes(expand_recipients(activity, actor))
+    message = {k: v for k, v in activity.items() if k not in ("bto", "bcc")}
+    return deliver(actor.keyID, message, inboxes)
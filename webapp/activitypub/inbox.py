@@ -0,0 +1,564 @@
+"""
+.. py:module:: webapp.activitypub.inbox
+    :synopsis: Processing of activities received in an inbox.
+
+:py:func:`dispatch` hands a verified activity to its handler in
+:py:mod:`webapp.activitypub.activities`.
+
+With `INBOX_ASYNC = True`, :py:class:`webapp.activitypub.views.InboxView`
+does not verify and dispatch activities while the remote server waits.
+It only runs the cheap checks in :py:func:`receive`, stores the request
+as an :py:class:`webapp.activitypub.models.InboxItem` and responds with
+`202 Accepted`. Celery workers verify and dispatch the stored activities,
+see :py:func:`process_item` and :py:func:`process_queue`.
+:py:func:`stats` reports the depth of the queue and the processing latency.
+
+Either way, an activity is only processed the first time its `id` and
+body are seen. Duplicates are acknowledged before any verification,
+see :py:func:`seen` and :py:func:`claim`.
+
+Activities posted to the shared inbox are verified once and dispatched
+to every local actor they are for, see :py:func:`recipients` and
+:py:func:`dispatch_shared`.
+
+.. code-block:: python
+
+    # settings.py
+    INBOX_ASYNC = True
+    CELERY_BEAT_SCHEDULE = {
+        "drain-inbox": {
+            "task": "webapp.activitypub.tasks.drainInbox",
+            "schedule": 60,
+        },
+    }
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import urllib.parse
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest, JsonResponse
+from django.utils.datastructures import CaseInsensitiveMapping
+
+from webapp.activitypub.activity import ActivityObject
+from webapp.activitypub.activities import (
+    accept,
+    create,
+    delete,
+    follow,
+    like,
+    resolve_actors,
+    undo,
+    update,
+)
+from webapp.activitypub.cache import TTLCache
+from webapp.activitypub.models import Actor, InboxItem, ReceivedActivity
+from webapp.activitypub.policy import blocked, policy_for
+from webapp.activitypub.signals import bulk_actions
+from webapp.activitypub.signature import (
+    Signature,
+    SignatureChecker,
+    check_max_offset_now,
+    parse_gmt,
+)
+from webapp.exceptions import ParseError, ParseJSONError, ParseUTF8Error
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {
+    "like": like,
+    "follow": follow,
+    "undo": undo,
+    "create": create,
+    "update": update,
+    "delete": delete,
+    "accept": accept,
+}
+"""Handlers for the supported activity types."""
+
+CLAIM = timedelta(minutes=5)
+"""How long a worker may take to process an item before others retry it."""
+
+MEDIA = ("attachment", "icon", "image")
+"""Properties dropped from objects of hosts whose media is rejected."""
+
+EXCLUDED_HEADERS = ("cookie", "authorization")
+"""Request headers that are not stored with an inbox item."""
+
+ADDRESSING = ("to", "cc", "bto", "bcc", "audience")
+"""Properties that address the recipients of an activity."""
+
+PUBLIC = (
+    "https://www.w3.org/ns/activitystreams#Public",
+    "as:Public",
+    "Public",
+)
+"""The ways the public collection is written after canonicalization."""
+
+
+seen_cache = TTLCache(
+    maxsize=getattr(settings, "INBOX_DEDUP_CACHE_SIZE", 4096),
+    ttl=getattr(settings, "INBOX_DEDUP_TTL", 7 * 86400),
+)
+"""Dedup keys of activities claimed by this process or found claimed."""
+
+
+def dedup_key(body: bytes) -> tuple[str, str] | None:
+    """
+    The activity `id` and the SHA-256 digest of the request `body`.
+
+    :return: The key, or None if `body` is not a JSON object.
+    """
+    try:
+        message = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(message, dict):
+        return None
+    activity_id = message.get("id")
+    if not isinstance(activity_id, str):
+        activity_id = ""
+    return activity_id[:1024], hashlib.sha256(body).hexdigest()
+
+
+def seen(key: tuple[str, str]) -> bool:
+    """
+    Whether the activity with `key` has already been accepted.
+    """
+    if key in seen_cache:
+        return True
+    activity_id, digest = key
+    if ReceivedActivity.objects.filter(activity_id=activity_id, digest=digest).exists():
+        seen_cache.set(key, True)
+        return True
+    return False
+
+
+def claim(key: tuple[str, str]) -> bool:
+    """
+    Record the activity with `key` as accepted.
+
+    Call this only after the request has been verified, so forged copies
+    cannot suppress the real one.
+
+    :return: False if it had been accepted before, i.e. concurrently.
+    """
+    if key in seen_cache:
+        return False
+    activity_id, digest = key
+    try:
+        with transaction.atomic():
+            ReceivedActivity.objects.create(activity_id=activity_id, digest=digest)
+    except IntegrityError:
+        return False
+    finally:
+        seen_cache.set(key, True)
+    return True
+
+
+def release(key: tuple[str, str]) -> None:
+    """
+    Forget the activity with `key`, i.e. so a retry is processed.
+    """
+    seen_cache.delete(key)
+    activity_id, digest = key
+    ReceivedActivity.objects.filter(activity_id=activity_id, digest=digest).delete()
+
+
+def forget_received() -> int:
+    """
+    Delete records of activities received before `INBOX_DEDUP_TTL`.
+    """
+    from django.utils.timezone import now
+
+    deleted, _ = ReceivedActivity.objects.filter(
+        received__lt=now() - timedelta(seconds=settings.INBOX_DEDUP_TTL)
+    ).delete()
+    return deleted
+
+
+def dispatch(
+    target: Actor, activity: ActivityObject, actors: dict[str, Actor] | None = None
+) -> JsonResponse:
+    """
+    Dispatch `activity` to the handler for its type.
+
+    Activities from blocked hosts are rejected, those from silenced hosts
+    only reach actors that follow their sender, see
+    :py:mod:`webapp.activitypub.policy`.
+
+    :param actors: The actors of the activity, if they have been resolved
+        already, see :py:func:`webapp.activitypub.activities.resolve_actors`.
+    """
+    sender = next(iter(_ids(getattr(activity, "actor", None))), None)
+    policy = policy_for(sender)
+    if policy.blocked:
+        logger.info(f"Blocked {sender}")
+        return JsonResponse({"error": "Blocked"}, status=403)
+
+    kind = str(getattr(activity, "type", "")).lower()
+    handler = HANDLERS.get(kind)
+    if handler is None:
+        error = f"InboxView: Unsupported activity: {getattr(activity, 'type', None)}"
+        logger.error(f"Actvity error: {error}")
+        return JsonResponse({"error": error}, status=400)
+
+    if policy.reject_media and isinstance(getattr(activity, "object", None), dict):
+        activity.object = {k: v for k, v in activity.object.items() if k not in MEDIA}
+    if (
+        policy.silenced
+        and target is not None
+        and kind not in ("follow", "accept", "undo")
+        and not target.follows.filter(id=sender).exists()
+    ):
+        logger.debug(f"Silenced {sender} for {target}")
+        return JsonResponse({"status": "silenced"})
+
+    return handler(target=target, activity=activity, actors=actors)
+
+
+def _ids(value) -> list[str]:
+    if not isinstance(value, list):
+        value = [value]
+    return [
+        item.get("id") if isinstance(item, dict) else item
+        for item in value
+        if isinstance(item, (str, dict))
+    ]
+
+
+def recipients(activity: ActivityObject) -> QuerySet[Actor]:
+    """
+    The local actors an activity posted to the shared inbox is for.
+
+    These are the actors addressed in `to`, `cc`, `bto`, `bcc` and
+    `audience`, the actor that is the `object` of the activity, i.e. of a
+    `Follow`, and, if the activity is public or addressed to a followers
+    collection, the local followers of its `actor`. All of them are
+    resolved in one query.
+    """
+    addressed = set()
+    for name in ADDRESSING:
+        addressed.update(_ids(getattr(activity, name, None) or []))
+    addressed.update(_ids(getattr(activity, "object", None) or []))
+    addressed.discard(None)
+
+    query = Q(id__in=addressed - set(PUBLIC))
+    sender = getattr(activity, "actor", None)
+    if isinstance(sender, str) and any(
+        iri in PUBLIC or iri.endswith("/followers") for iri in addressed
+    ):
+        query |= Q(follows=sender)
+    return Actor.objects.filter(query, profile__isnull=False).distinct().order_by("id")
+
+
+def dispatch_shared(activity: ActivityObject) -> JsonResponse:
+    """
+    Dispatch `activity` to each of its local :py:func:`recipients`.
+
+    :return: An error if the activity is not supported, or failed for
+        all recipients, otherwise the status per recipient.
+    """
+    if str(getattr(activity, "type", "")).lower() not in HANDLERS:
+        return dispatch(None, activity)
+
+    targets = list(recipients(activity))
+    actors = resolve_actors(activity) if targets else {}
+    results = {}
+    failed = None
+    with bulk_actions():
+        for target in targets:
+            response = dispatch(target, activity, actors)
+            results[target.id] = response.status_code
+            if response.status_code >= 400:
+                failed = response
+    if not results:
+        logger.debug(f"No local recipients for {getattr(activity, 'id', None)}")
+    elif failed is not None and all(status >= 400 for status in results.values()):
+        return failed
+    return JsonResponse({"status": "success", "recipients": results})
+
+
+def _check_digest(header: str, body: bytes) -> bool:
+    algorithm, _, value = header.partition("=")
+    if algorithm.lower() != "sha-256":
+        return True  # Not something we can check here.
+    return value == base64.b64encode(hashlib.sha256(body).digest()).decode()
+
+
+def receive(request: HttpRequest, actor: Actor | None) -> InboxItem | None:
+    """
+    Check the basics of an inbox request and store it for processing.
+
+    Only checks that are cheap and need no network access run here: the
+    body must be a JSON object with a `type` and an `actor`, the request
+    must be signed recently and match its `Digest`.
+
+    :param actor: The local actor the inbox belongs to, None for the
+        shared inbox.
+    :return: The stored item, or None if the activity has been seen before.
+    :raises ParseError: If the request is rejected.
+    """
+    try:
+        body = request.body.decode("utf-8")
+    except ValueError:
+        raise ParseUTF8Error("InboxView: Cannot decode utf-8")
+
+    try:
+        message = json.loads(body)
+    except ValueError as e:
+        raise ParseJSONError(f"InboxView: Received invalid JSON {e}") from e
+    if not isinstance(message, dict) or not message.get("type"):
+        raise ParseError("InboxView: Not an activity")
+    if not message.get("actor"):
+        raise ParseError("InboxView: Activity without actor")
+
+    if "signature" not in request.headers:
+        raise ParseError("Invalid Signature")
+    try:
+        date = parse_gmt(request.headers["date"])
+    except (KeyError, ValueError, OverflowError):
+        raise ParseError("Invalid Date")
+    if not check_max_offset_now(date):
+        raise ParseError(f"Found too old date {request.headers['date']}")
+    if "digest" in request.headers and not _check_digest(
+        request.headers["digest"], request.body
+    ):
+        raise ParseError("Invalid Digest")
+
+    if seen(dedup_key(request.body)):
+        logger.debug(f"Duplicate {message.get('id')}")
+        return None
+
+    return InboxItem.objects.create(
+        actor=actor,
+        method=request.method,
+        path=request.path,
+        headers={
+            key: value
+            for key, value in request.headers.items()
+            if key.lower() not in EXCLUDED_HEADERS
+        },
+        body=body,
+    )
+
+
+class StoredRequest:
+    """
+    The parts of a request :py:class:`SignatureChecker` needs, restored
+    from an :py:class:`InboxItem`.
+    """
+
+    def __init__(self, item: InboxItem) -> None:
+        self.method = item.method
+        self.path = item.path
+        self.headers = CaseInsensitiveMapping(item.headers)
+
+
+def _key_id(request: StoredRequest) -> str | None:
+    try:
+        return Signature.from_signature_header(request.headers["signature"]).key_id
+    except Exception:
+        return None
+
+
+def _signed_by(key_id: str, actor) -> bool:
+    """
+    Whether `key_id` is a key of `actor`.
+
+    Keys are usually a fragment of their actor. Otherwise the owner is
+    looked up in the key document, which is already stored or cached from
+    verifying the signature.
+    """
+    from webapp.activitypub.tasks import _same_origin, fetchRemoteActor
+
+    if isinstance(actor, dict):
+        actor = actor.get("id")
+    if not isinstance(actor, str) or not _same_origin(key_id, actor):
+        return False
+    if urllib.parse.urldefrag(key_id).url == actor:
+        return True
+    try:
+        document = fetchRemoteActor(key_id)
+    except Exception as e:
+        logger.info(f"Cannot look up the owner of {key_id}: {e}")
+        return False
+    return document.get("owner", document.get("id")) == actor
+
+
+def verified(request, signature, activity: ActivityObject) -> bool:
+    """
+    Whether `signature`, as returned by
+    :py:meth:`webapp.activitypub.signature.SignatureChecker.validate`, is
+    valid and made with a key of the actor of `activity`.
+
+    `validate` returns the `keyId` if the signature is valid, but error
+    messages and None otherwise.
+    """
+    key_id = _key_id(request)
+    if key_id is None or signature != key_id:
+        return False
+    return _signed_by(key_id, getattr(activity, "actor", None))
+
+
+def rejected(request, activity: ActivityObject | None = None) -> bool:
+    """
+    Whether `request` is from a blocked host, by the `keyId` of its
+    signature and, once it is parsed, the actor of `activity`. Nothing is
+    verified for this.
+    """
+    if blocked(_key_id(request)):
+        return True
+    if activity is None:
+        return False
+    return any(blocked(actor) for actor in _ids(getattr(activity, "actor", None)))
+
+
+def process(item: InboxItem) -> str:
+    """
+    Verify and dispatch a stored activity.
+
+    :return: The resulting status of the item.
+    """
+    request = StoredRequest(item)
+    if rejected(request):  # the policy may have changed since
+        item.done(InboxItem.Status.REJECTED, "Blocked host")
+        return item.status
+
+    try:
+        activity = ActivityObject(json.loads(item.body))
+    except (ValueError, ParseError) as e:
+        item.done(InboxItem.Status.REJECTED, f"Invalid activity: {e}")
+        return item.status
+
+    if rejected(request, activity):
+        item.done(InboxItem.Status.REJECTED, "Blocked host")
+        return item.status
+
+    signature = SignatureChecker().validate(request, received=item.received)
+    if not verified(request, signature, activity):
+        item.done(InboxItem.Status.REJECTED, "Invalid Signature")
+        return item.status
+
+    key = dedup_key(item.body.encode("utf-8"))
+    if not claim(key):
+        item.done(InboxItem.Status.DUPLICATE)
+        return item.status
+
+    try:
+        if item.actor is None:
+            response = dispatch_shared(activity)
+        else:
+            response = dispatch(item.actor, activity)
+    except Exception as e:
+        logger.exception(f"Processing {item} failed")
+        release(key)
+        item.failed(f"{e.__class__.__name__}: {e}")
+        return item.status
+
+    status = (
+        InboxItem.Status.PROCESSED
+        if response.status_code < 400
+        else InboxItem.Status.REJECTED
+    )
+    item.done(status, response.content.decode())
+    logger.debug(f"Processed {item} after {item.latency}")
+    return item.status
+
+
+def _claim(item_id) -> InboxItem | None:
+    from django.utils.timezone import now
+
+    timestamp = now()
+    claimed = InboxItem.objects.filter(
+        pk=item_id,
+        status=InboxItem.Status.PENDING,
+        next_attempt__lte=timestamp,
+    ).update(next_attempt=timestamp + CLAIM)
+    if not claimed:
+        return None
+    return InboxItem.objects.select_related("actor").get(pk=item_id)
+
+
+def process_item(item_id) -> str | None:
+    """
+    Claim and process one pending item.
+
+    :return: The resulting status, or None if the item was not due or
+        another worker processes it.
+    """
+    item = _claim(item_id)
+    if item is None:
+        return None
+    return process(item)
+
+
+def process_queue(limit: int = 100) -> dict[str, int]:
+    """
+    Process pending items that are due, oldest first.
+
+    :return: The number of items per resulting status.
+    """
+    from django.utils.timezone import now
+
+    due = InboxItem.objects.filter(
+        status=InboxItem.Status.PENDING, next_attempt__lte=now()
+    ).order_by("received")
+    counts = {status: 0 for status in InboxItem.Status.values}
+    for item_id in due.values_list("pk", flat=True)[:limit]:
+        status = process_item(item_id)
+        if status is not None:
+            counts[status] += 1
+    return counts
+
+
+def schedule(item: InboxItem) -> None:
+    """
+    Process `item` in a worker, once the current transaction commits.
+    """
+    from django.conf import settings
+    from django.db import transaction
+    from webapp.activitypub.tasks import processInbox
+
+    if settings.DEBUG:
+        transaction.on_commit(lambda: processInbox(str(item.pk)))
+    else:
+        transaction.on_commit(lambda: processInbox.delay(str(item.pk)))
+
+
+def stats(window: timedelta = timedelta(hours=1)) -> dict:
+    """
+    Depth of the inbox queue and processing latency within `window`.
+
+    :return: dict with `pending`, the age of the `oldest` pending item,
+        counts of items processed within `window` per status, and their
+        `average` and `maximum` latency.
+    """
+    from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F
+    from django.db.models import Max, Min
+    from django.utils.timezone import now
+
+    timestamp = now()
+    pending = InboxItem.objects.filter(status=InboxItem.Status.PENDING)
+    oldest = pending.aggregate(oldest=Min("received"))["oldest"]
+
+    recent = InboxItem.objects.filter(processed__gte=timestamp - window)
+    latency = ExpressionWrapper(
+        F("processed") - F("received"), output_field=DurationField()
+    )
+    result = recent.aggregate(average=Avg(latency), maximum=Max(latency))
+    result.update(
+        {
+            row["status"]: row["count"]
+            for row in recent.values("status").annotate(count=Count("pk"))
+        }
+    )
+    result["pending"] = pending.count()
+    result["oldest"] = timestamp - oldest if oldest else None
+    return result
@@ -0,0 +1,150 @@
+"""
+.. py:module:: webapp.activitypub.local
+    :synopsis: Resolve IRIs on this site without going to the network.
+
+IRIs of local actors, notes, actions and likes are resolved by
+:py:func:`resolve` from the database, in the representation this site
+serves for them. :py:func:`webapp.activitypub.tasks.Fetch` and
+:py:func:`webapp.activitypub.tasks.fetchRemoteActor` use it instead of an
+HTTPS request to ourselves.
+
+Activities for local inboxes are dispatched in-process by
+:py:func:`deliver`, without signing them or an HTTP request, see
+:py:func:`webapp.activitypub.delivery.deliver`.
+"""
+
+import logging
+import urllib.parse
+
+from django.contrib.sites.models import Site
+from django.db import transaction
+from django.urls import Resolver404, resolve as resolve_path
+
+from webapp.activitypub.delivery import DeliveryResult
+from webapp.exceptions import ObjectNotFoundError
+from webapp.typing import url
+
+logger = logging.getLogger(__name__)
+
+CONTEXT = "https://www.w3.org/ns/activitystreams"
+
+
+def is_local(iri: url) -> bool:
+    """
+    Whether `iri` is on the domain of this site.
+    """
+    parsed = urllib.parse.urlparse(iri)
+    domain = Site.objects.get_current().domain
+    return parsed.scheme == "https" and parsed.netloc.lower() == domain.lower()
+
+
+def _match(iri: url):
+    try:
+        return resolve_path(urllib.parse.urlparse(iri).path)
+    except Resolver404:
+        return None
+
+
+def render_actor(actor) -> dict:
+    """
+    The document of the local `actor`.
+    """
+    return {
+        "@context": [CONTEXT, "https://w3id.org/security/v1"],
+        "id": actor.id,
+        "type": actor.type,
+        "preferredUsername": actor.profile.user.username,
+        "inbox": actor.inbox,
+        "outbox": actor.outbox,
+        "followers": actor.followers,
+        "following": actor.following,
+        "liked": actor.liked,
+        "endpoints": {"sharedInbox": actor.sharedInbox},
+        "publicKey": {
+            "id": actor.keyID,
+            "owner": actor.id,
+            "publicKeyPem": actor.profile.public_key_pem,
+        },
+    }
+
+
+def resolve(iri: url) -> dict:
+    """
+    The document of the local object `iri`, from the database.
+
+    :raises ObjectNotFoundError: If `iri` is not a local object.
+    """
+    from webapp.activitypub.models import Action, Actor, Like, Note
+    from webapp.activitypub.serializers.action import ActionSerializer, render_object
+
+    match = _match(urllib.parse.urldefrag(iri).url)
+    name = match.url_name if match else None
+    try:
+        match name:
+            case "actor-view":
+                actor = Actor.objects.select_related("profile__user").get(
+                    profile__slug=match.kwargs["slug"]
+                )
+                return render_actor(actor)
+            case "note-detail":
+                note = Note.objects.get(pk=match.kwargs["pk"])
+                return {"@context": CONTEXT, **render_object(note)}
+            case "action_detail":
+                action = Action.objects.get(pk=match.kwargs["pk"])
+                return {"@context": CONTEXT, **ActionSerializer(action).data}
+            case "like-detail":
+                like = Like.objects.get(pk=match.kwargs["pk"])
+                return {
+                    "@context": CONTEXT,
+                    "id": iri,
+                    "type": "Like",
+                    "actor": like.actor_id,
+                    "object": like.object,
+                }
+    except (
+        Action.DoesNotExist,
+        Actor.DoesNotExist,
+        Like.DoesNotExist,
+        Note.DoesNotExist,
+    ):
+        pass
+    raise ObjectNotFoundError(iri)
+
+
+def deliver(activity: dict, inboxes: list[url]) -> list[DeliveryResult]:
+    """
+    Dispatch `activity` to local `inboxes` in-process.
+
+    The shared inbox dispatches to all local recipients, see
+    :py:func:`webapp.activitypub.inbox.dispatch_shared`. Each inbox is
+    delivered to in a transaction of its own.
+    """
+    from webapp.activitypub.activity import ActivityObject
+    from webapp.activitypub.inbox import dispatch, dispatch_shared
+    from webapp.activitypub.models import Actor
+
+    results = []
+    for inbox in inboxes:
+        match = _match(inbox)
+        name = match.url_name if match else None
+        try:
+            message = ActivityObject(activity)
+            with transaction.atomic():
+                if name == "shared-inbox":
+                    response = dispatch_shared(message)
+                elif name == "actor-inbox":
+                    target = Actor.objects.get(profile__slug=match.kwargs["slug"])
+                    response = dispatch(target, message)
+                else:
+                    raise Actor.DoesNotExist(inbox)
+        except Actor.DoesNotExist:
+            results.append(DeliveryResult(inbox=inbox, status=404, attempted=True))
+            continue
+        except Exception as e:
+            logger.exception(f"Local delivery to {inbox} failed")
+            results.append(DeliveryResult(inbox=inbox, error=str(e), attempted=True))
+            continue
+        results.append(
+            DeliveryResult(inbox=inbox, status=response.status_code, attempted=True)
+        )
+    return results
@@ -9,6 +9,21 @@ from .decorators import stream
 from .registry import check
 
 
+def generic_relations(model, *args) -> list[str]:
+    """
+    The names of the generic foreign keys of `model`, limited to `args`
+    if specified.
+    """
+    pf = model._meta.private_fields
+
+    gfk_fields = [g for g in pf if isinstance(g, GenericForeignKey)]
+
+    if args:  # If args is specified, limit to those fields in args
+        gfk_fields = [g for g in gfk_fields if g.name in args]
+
+    return [g.name for g in gfk_fields]
+
+
 class BaseQuerySet(QuerySet):
     """
     A QuerySet with a fetch_generic_relations() method to bulk fetch
@@ -23,14 +38,7 @@ class BaseQuerySet(QuerySet):
             """ """
             return qs
 
-        pf = self.model._meta.private_fields
-
-        gfk_fields = [g for g in pf if isinstance(g, GenericForeignKey)]
-
-        if args:  # If args is specified, limit to those fields in args
-            gfk_fields = [g for g in gfk_fields if g.name in args]
-
-        return qs.prefetch_related(*[g.name for g in gfk_fields])
+        return qs.prefetch_related(*generic_relations(self.model, *args))
 
     def _clone(self, klass=None, **kwargs):
         return super(BaseQuerySet, self)._clone()
@@ -77,6 +85,26 @@ class ActionManager(BaseManager):
         kwargs["public"] = True
         return self.filter(*args, **kwargs)
 
+    def outbox(self, actor_id, **kwargs):
+        """
+        Public actions of the local actor `actor_id`, its outbox, as
+        counted in its `statuses_count`.
+
+        Actions of remote actors, recorded for the activities they send
+        to local inboxes, are not part of it.
+        """
+        from django.contrib.contenttypes.models import ContentType
+        from webapp.activitypub.models import Actor
+
+        return self.public(
+            actor_content_type=ContentType.objects.get_for_model(Actor),
+            actor_object_id=actor_id,
+            actor_object_id__in=Actor.objects.filter(profile__isnull=False).values(
+                "pk"
+            ),
+            **kwargs,
+        )
+
     @stream
     def actor(self, obj: Model, **kwargs):
         """
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:02
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activitypub", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RemoteHost",
+            fields=[
+                (
+                    "host",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("failures", models.PositiveIntegerField(default=0)),
+                ("first_failure", models.DateTimeField(blank=True, null=True)),
+                ("last_failure", models.DateTimeField(blank=True, null=True)),
+                ("open_until", models.DateTimeField(blank=True, null=True)),
+                ("gone", models.BooleanField(db_index=True, default=False)),
+            ],
+            options={
+                "verbose_name": "Remote host",
+                "verbose_name_plural": "Remote hosts",
+            },
+        ),
+        migrations.CreateModel(
+            name="Delivery",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("key_id", models.CharField(max_length=255)),
+                ("inbox", models.URLField(max_length=1024)),
+                ("host", models.CharField(db_index=True, max_length=255)),
+                ("activity", models.JSONField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("delivered", "Delivered"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                (
+                    "next_attempt",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Delivery",
+                "verbose_name_plural": "Deliveries",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt"],
+                        name="activitypub_status_05a0cb_idx",
+                    )
+                ],
+            },
+        ),
+    ]
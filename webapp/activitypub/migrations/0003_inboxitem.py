@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activitypub", "0002_delivery"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InboxItem",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("method", models.CharField(default="POST", max_length=8)),
+                ("path", models.CharField(max_length=255)),
+                ("headers", models.JSONField()),
+                ("body", models.TextField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processed", "Processed"),
+                            ("rejected", "Rejected"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                (
+                    "next_attempt",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("result", models.TextField(blank=True, default="")),
+                ("received", models.DateTimeField(default=django.utils.timezone.now)),
+                ("processed", models.DateTimeField(blank=True, null=True)),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="The local actor the activity was posted to.",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="inbox_items",
+                        to="activitypub.actor",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Inbox item",
+                "verbose_name_plural": "Inbox items",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt"],
+                        name="activitypub_status_f816ad_idx",
+                    ),
+                    models.Index(
+                        fields=["processed"], name="activitypub_process_d3dfa3_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activitypub", "0003_inboxitem"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="inboxitem",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("processed", "Processed"),
+                    ("duplicate", "Duplicate"),
+                    ("rejected", "Rejected"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=16,
+            ),
+        ),
+        migrations.CreateModel(
+            name="ReceivedActivity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("activity_id", models.CharField(blank=True, max_length=1024)),
+                ("digest", models.CharField(max_length=64)),
+                (
+                    "received",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Received activity",
+                "verbose_name_plural": "Received activities",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("activity_id", "digest"),
+                        name="unique_received_activity",
+                    )
+                ],
+            },
+        ),
+    ]
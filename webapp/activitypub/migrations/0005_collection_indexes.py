@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activitypub", "0004_receivedactivity"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["object", "created"], name="activitypub_object__24faf5_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["actor", "created"], name="activitypub_actor_i_61cab8_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="like",
+            index=models.Index(
+                fields=["actor", "created_at"], name="activitypub_actor_i_33fa12_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activitypub", "0005_collection_indexes"),
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="action",
+            index=models.Index(
+                fields=["actor_object_id", "timestamp", "id"],
+                name="activitypub_actor_o_86cd2b_idx",
+            ),
+        ),
+    ]
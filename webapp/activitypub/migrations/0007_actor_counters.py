@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count(apps, schema_editor):
+    """
+    Initialize the counters, like `manage.py counters`.
+    """
+    Action = apps.get_model("activitypub", "Action")
+    Actor = apps.get_model("activitypub", "Actor")
+    Follow = apps.get_model("activitypub", "Follow")
+    Like = apps.get_model("activitypub", "Like")
+    ContentType = apps.get_model("contenttypes", "ContentType")
+
+    def total(rows):
+        return Coalesce(
+            Subquery(rows.order_by().annotate(count=Count("pk")).values("count")), 0
+        )
+
+    Actor.objects.update(
+        followers_count=total(
+            Follow.objects.filter(object=OuterRef("pk")).values("object")
+        ),
+        following_count=total(
+            Follow.objects.filter(actor=OuterRef("pk")).values("actor")
+        ),
+        likes_count=total(Like.objects.filter(actor=OuterRef("pk")).values("actor")),
+    )
+    content_type = ContentType.objects.filter(
+        app_label="activitypub", model="actor"
+    ).first()
+    if content_type is not None:
+        Actor.objects.update(
+            statuses_count=total(
+                Action.objects.filter(
+                    actor_content_type=content_type,
+                    actor_object_id=OuterRef("pk"),
+                    public=True,
+                ).values("actor_object_id")
+            )
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activitypub", "0006_outbox_keyset_index"),
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="actor",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="statuses_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count, migrations.RunPython.noop),
+    ]
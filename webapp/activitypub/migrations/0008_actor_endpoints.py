@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:37
+
+from django.conf import settings
+from django.db import migrations, models
+from django.urls import reverse
+
+
+def endpoints(apps, schema_editor):
+    """
+    Compute the endpoints of local actors, like `Actor.local_endpoints`.
+
+    Remote actors get theirs when their documents are fetched.
+    """
+    Actor = apps.get_model("activitypub", "Actor")
+    Site = apps.get_model("sites", "Site")
+
+    site = Site.objects.filter(pk=settings.SITE_ID).first()
+    if site is None:
+        return
+    base = f"https://{site.domain}"
+    views = {
+        "inbox": "actor-inbox",
+        "outbox": "actor-outbox",
+        "followers": "actor-followers",
+        "following": "actor-following",
+        "liked": "actor-liked",
+    }
+    for actor in Actor.objects.filter(profile__isnull=False).select_related("profile"):
+        for field, view in views.items():
+            setattr(actor, field, f"{base}{reverse(view, args=[actor.profile.slug])}")
+        actor.sharedInbox = f"{base}{reverse('shared-inbox')}"
+        actor.save(update_fields=[*views, "sharedInbox"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activitypub", "0007_actor_counters"),
+        ("sites", "0002_alter_domain_unique"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="actor",
+            name="followers",
+            field=models.URLField(
+                blank=True, editable=False, max_length=255, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="following",
+            field=models.URLField(
+                blank=True, editable=False, max_length=255, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="inbox",
+            field=models.URLField(
+                blank=True, editable=False, max_length=255, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="liked",
+            field=models.URLField(
+                blank=True, editable=False, max_length=255, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="outbox",
+            field=models.URLField(
+                blank=True, editable=False, max_length=255, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="sharedInbox",
+            field=models.URLField(
+                blank=True, editable=False, max_length=255, null=True
+            ),
+        ),
+        migrations.RunPython(endpoints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activitypub", "0008_actor_endpoints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="actor",
+            name="document",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="last_fetched",
+            field=models.DateTimeField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="preferredUsername",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="publicKeyPem",
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+    ]
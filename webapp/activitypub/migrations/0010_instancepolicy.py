@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activitypub", "0009_remote_actor_documents"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InstancePolicy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("domain", models.CharField(max_length=255, unique=True)),
+                (
+                    "severity",
+                    models.CharField(
+                        choices=[
+                            ("none", "None"),
+                            ("silence", "Silence"),
+                            ("block", "Block"),
+                        ],
+                        default="none",
+                        max_length=16,
+                    ),
+                ),
+                ("reject_media", models.BooleanField(default=False)),
+                ("reason", models.TextField(blank=True, default="")),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Instance policy",
+                "verbose_name_plural": "Instance policies",
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("activitypub", "0010_instancepolicy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="actor",
+            name="next_refresh",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -2,11 +2,19 @@ from .actor import Actor, Follow
 from .note import Note
 from .action import Action
 from .like import Like
+from .delivery import Delivery, RemoteHost
+from .inbox import InboxItem, ReceivedActivity
+from .policy import InstancePolicy
 
 __all__ = [
     "Like",
     "Note",
     "Action",
     "Actor",
-    "Follow"
+    "Follow",
+    "Delivery",
+    "RemoteHost",
+    "InboxItem",
+    "ReceivedActivity",
+    "InstancePolicy",
 ]
@@ -100,6 +100,11 @@ class Action(models.Model):
 
     class Meta:
         ordering = ("-timestamp",)
+        indexes = [
+            # the outbox, by keyset, see
+            # :py:class:`webapp.activitypub.collection.OrderedCollection`
+            models.Index(fields=["actor_object_id", "timestamp", "id"]),
+        ]
 
     def __str__(self):
         result = ""
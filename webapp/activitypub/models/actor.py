@@ -12,7 +12,7 @@ import uuid
 from functools import cached_property
 
 from django.contrib.sites.models import Site
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
@@ -156,6 +156,33 @@ class Actor(models.Model):
     #     "self", related_name="flwng", symmetrical=False, blank=True, through="Fllwng"
     # )
 
+    # Endpoints, computed for local actors (see :py:meth:`local_endpoints`),
+    # or taken from the documents of remote actors.
+    inbox = models.URLField(max_length=255, blank=True, null=True, editable=False)
+    outbox = models.URLField(max_length=255, blank=True, null=True, editable=False)
+    sharedInbox = models.URLField(max_length=255, blank=True, null=True, editable=False)
+    followers = models.URLField(max_length=255, blank=True, null=True, editable=False)
+    following = models.URLField(max_length=255, blank=True, null=True, editable=False)
+    liked = models.URLField(max_length=255, blank=True, null=True, editable=False)
+
+    # The documents of remote actors, see
+    # :py:func:`webapp.activitypub.tasks.fetchRemoteActor`.
+    preferredUsername = models.CharField(max_length=255, blank=True, null=True)
+    publicKeyPem = models.TextField(blank=True, null=True, editable=False)
+    document = models.JSONField(blank=True, null=True, editable=False)
+    last_fetched = models.DateTimeField(
+        blank=True, null=True, db_index=True, editable=False
+    )
+    # When a failed refresh is retried, see
+    # :py:func:`webapp.activitypub.tasks.refreshRemoteActors`.
+    next_refresh = models.DateTimeField(blank=True, null=True, editable=False)
+
+    # Maintained by :py:mod:`webapp.activitypub.counters`.
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    statuses_count = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = _("Actor (Activity Streams 2.0)")
         verbose_name_plural = _("Actors (Activity Streams 2.0)")
@@ -220,118 +247,88 @@ class Actor(models.Model):
             return f"{self.id}#main-key"
         raise RemoteActorError("Remote actors do not have a key-id.")
 
-    @cached_property
-    def inbox(self):
-        """
-        :py:attr:inbox returns a link to an `OrderedCollection`
-
-        Return the URL of the `inbox`, that contains an `OrderedCollection`.
-        An `Inbox` is a `Collection` to which `Items` are added, typically by
-        the `owner` of the `Inbox`. The `inbox` property is *REQUIRED* for
-        `Actor` objects.
-
-        :: return: URL
-        :: rtype: str
-
-        .. seealso::
-            :py:class:`webapp.views.inbox.InboxView`
-
-        """
-        if not self.remote:
-            base = f"https://{Site.objects.get_current().domain}"
-            return f"{base}" + reverse(
-                "actor-inbox",
-                args=[self.profile.slug],
-            )
-        raise RemoteActorError("Remote actors do not have a local inbox.")
+    ENDPOINTS = {
+        "inbox": "actor-inbox",
+        "outbox": "actor-outbox",
+        "followers": "actor-followers",
+        "following": "actor-following",
+        "liked": "actor-liked",
+    }
+    """The endpoint fields of local actors, and the views serving them."""
 
-    @cached_property
-    def outbox(self):
+    def local_endpoints(self) -> dict[str, str]:
         """
-        :py:attr:outbox returns a link to an `OrderedCollection`
-
-        Return the URL of the outbox.
-
-        :: return: URL
-        :: rtype: str
+        The endpoint IRIs of a local actor, for its profile's slug.
 
         .. seealso::
-            :py:class:`webapp.views.outbox.OutboxView`
+            :py:class:`webapp.views.inbox.InboxView`,
+            :py:class:`webapp.views.inbox.SharedInboxView`,
+            :py:class:`webapp.views.outbox.OutboxView`,
+            :py:class:`webapp.views.followers.FollowersView`,
+            :py:class:`webapp.views.following.FollowingView`
         """
-        if not self.remote:
-            base = f"https://{Site.objects.get_current().domain}"
-            return f"{base}%s" % reverse(
-                "actor-outbox",
-                args=[self.profile.slug],
-            )
-        raise RemoteActorError("Remote actors do not have a local outbox.")
-
-    @property
-    def followers(self):
+        base = f"https://{Site.objects.get_current().domain}"
+        result = {
+            field: f"{base}{reverse(view, args=[self.profile.slug])}"
+            for field, view in self.ENDPOINTS.items()
+        }
+        result["sharedInbox"] = f"{base}{reverse('shared-inbox')}"
+        return result
+
+    @staticmethod
+    def document_endpoints(document: dict) -> dict[str, str | None]:
+        """
+        The endpoint IRIs advertised by a (remote) actor document.
         """
-        `followers` will return the URL to an `OrderedCollection`, a
-        collection of `actors` that are `following` this `actor`.
-
-        :return: URL
-
-        .. seealso::
-            The view to serve this `OrderedCollection` is served by
-            :py:class:`webapp.views.followers.FollowersView`
 
-        .. seealso:: Following the `Activity Streams 2.0` specification for
-            `followers <https://www.w3.org/TR/activitypub/#actor-objects>`_,
-            the `followers` property is OPTIONAL.
+        def iri(value):
+            return value.get("id") if isinstance(value, dict) else value
 
+        result = {field: iri(document.get(field)) for field in Actor.ENDPOINTS}
+        endpoints = document.get("endpoints") or {}
+        result["sharedInbox"] = iri(endpoints.get("sharedInbox"))
+        return result
 
+    @staticmethod
+    def document_fields(document: dict) -> dict:
         """
-        if not self.remote:
-            base = f"https://{Site.objects.get_current().domain}"
-            return f"{base}%s" % reverse(
-                "actor-followers",
-                args=[self.profile.slug],
-            )
-        raise RemoteActorError("Remote actors do not have a local follower.")
-
-    @property
-    def following(self):
+        The fields of a remote actor parsed from its `document`.
         """
-        `following` returns a link to an `OrderedCollection`, a
-        collection of `actors` that this `actor` is `following`.
-
-        :return: URL
-        :rtype: str
-
-        .. seealso::
-            The view to serve this `OrderedCollection` is served by
-            :py:class:`webapp.views.following.FollowingView`
-
+        key = document.get("publicKey")
+        if isinstance(key, list):
+            key = key[0] if key else None
+        result = {
+            **Actor.document_endpoints(document),
+            "preferredUsername": document.get("preferredUsername"),
+            "publicKeyPem": key.get("publicKeyPem") if isinstance(key, dict) else None,
+            "document": document,
+        }
+        if document.get("type") in get_actor_types():
+            result["type"] = document["type"]
+        return result
+
+    def update_endpoints(self, endpoints: dict) -> bool:
         """
-        if not self.remote:
-            base = f"https://{Site.objects.get_current().domain}"
-            return f"{base}%s" % reverse(
-                "actor-following",
-                args=[self.profile.slug],
-            )
+        Store `endpoints`, if they changed.
 
-    @property
-    def liked(self):
+        :return: Whether they changed.
         """
-        Following the definition of the `Activity Streams 2.0` specification,
-        the `liked` property returns a link to a collection of `Objects` tha
-        this `actor` has `liked`.
-
-        Return the URL to the likes-collection.
-
-        :: return: URL
-        :: rtype: str
-
+        changed = {k: v for k, v in endpoints.items() if getattr(self, k) != v}
+        if not changed:
+            return False
+        for field, value in changed.items():
+            setattr(self, field, value)
+        Actor.objects.filter(pk=self.pk).update(**changed)
+        return True
+
+    def save(self, *args, **kwargs):
         """
-        if not self.remote:
-            base = f"https://{Site.objects.get_current().domain}"
-            return f"{base}%s" % reverse(
-                "actor-liked",
-                args=[self.profile.slug],
-            )
+        Compute the endpoints of local actors when they are saved.
+        """
+        if self.profile_id is not None:
+            for field, value in self.local_endpoints().items():
+                setattr(self, field, value)
+        super().save(*args, **kwargs)
 
 
 class Follow(models.Model):
@@ -342,6 +339,14 @@ class Follow(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # followers and following, newest first, see
+            # :py:class:`webapp.activitypub.collection.OrderedCollection`
+            models.Index(fields=["object", "created"]),
+            models.Index(fields=["actor", "created"]),
+        ]
+
     def getID(self):
         from django.contrib.sites.models import Site
 
@@ -350,3 +355,10 @@ class Follow(models.Model):
 
     def __str__(self):
         return f"{self.actor} follows {self.object}"
+
+    def save(self, *args, **kwargs):
+        """
+        Save, and count in :py:mod:`webapp.activitypub.counters`, atomically.
+        """
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
@@ -0,0 +1,147 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: ts=4 et sw=4 sts=4
+# pylint: disable=invalid-name
+
+"""
+Outbound delivery queue for `Angry Planet Cloud`.
+
+Specifically:
+    - Delivery
+    - RemoteHost
+
+"""
+
+import logging
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _
+
+logger = logging.getLogger(__name__)
+
+
+def backoff(attempts: int) -> timedelta:
+    """
+    Delay before the next attempt, after `attempts` failed attempts.
+
+    Exponential in the number of attempts, capped at
+    `DELIVERY_BACKOFF_MAX` and jittered so retries of many deliveries
+    do not hit a recovering host at the same time.
+    """
+    delay = min(
+        settings.DELIVERY_BACKOFF_MAX,
+        settings.DELIVERY_BACKOFF_BASE * 2 ** max(attempts - 1, 0),
+    )
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+class Delivery(models.Model):
+    """
+    An activity waiting to be delivered to one remote inbox.
+
+    Deliveries that failed for a transient reason are retried by
+    :py:func:`webapp.activitypub.delivery.process_queue` with exponential
+    backoff, until they succeed, fail permanently or run out of attempts.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        DELIVERED = "delivered", _("Delivered")
+        FAILED = "failed", _("Failed")
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    key_id = models.CharField(max_length=255)
+    inbox = models.URLField(max_length=1024)
+    host = models.CharField(max_length=255, db_index=True)
+    activity = models.JSONField()
+
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=now)
+    last_error = models.TextField(blank=True, default="")
+
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Delivery")
+        verbose_name_plural = _("Deliveries")
+        indexes = [models.Index(fields=["status", "next_attempt"])]
+
+    def __str__(self):
+        return f"{self.activity.get('type')} to {self.inbox} ({self.status})"
+
+    def failed(self, error: str | None, permanent: bool = False) -> None:
+        """
+        Record a failed attempt and schedule the next one.
+        """
+        self.attempts += 1
+        self.last_error = error or ""
+        if permanent or self.attempts >= settings.DELIVERY_MAX_ATTEMPTS:
+            self.status = self.Status.FAILED
+        else:
+            self.next_attempt = now() + backoff(self.attempts)
+        self.save()
+
+
+class RemoteHost(models.Model):
+    """
+    Health of a remote host, used as a circuit breaker for deliveries.
+
+    After `CIRCUIT_BREAKER_THRESHOLD` consecutive failures, the circuit
+    opens and deliveries to the host are skipped until `open_until`.
+    A host that has failed for `HOST_GONE_DAYS` is marked as gone and
+    never delivered to again.
+    """
+
+    host = models.CharField(max_length=255, primary_key=True)
+    failures = models.PositiveIntegerField(default=0)
+    first_failure = models.DateTimeField(blank=True, null=True)
+    last_failure = models.DateTimeField(blank=True, null=True)
+    open_until = models.DateTimeField(blank=True, null=True)
+    gone = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        verbose_name = _("Remote host")
+        verbose_name_plural = _("Remote hosts")
+
+    def __str__(self):
+        return self.host
+
+    @property
+    def available(self) -> bool:
+        """
+        Whether deliveries to this host should be attempted now.
+        """
+        if self.gone:
+            return False
+        return self.open_until is None or self.open_until <= now()
+
+    def succeeded(self) -> None:
+        if self.failures or self.open_until:
+            self.failures = 0
+            self.first_failure = None
+            self.open_until = None
+            self.save()
+
+    def failed(self) -> None:
+        timestamp = now()
+        self.failures += 1
+        self.first_failure = self.first_failure or timestamp
+        self.last_failure = timestamp
+        if self.failures >= settings.CIRCUIT_BREAKER_THRESHOLD:
+            self.open_until = timestamp + backoff(
+                self.failures - settings.CIRCUIT_BREAKER_THRESHOLD + 1
+            )
+            logger.info(f"Circuit open for {self.host} until {self.open_until}")
+        if timestamp - self.first_failure >= timedelta(days=settings.HOST_GONE_DAYS):
+            logger.warning(f"Giving up on {self.host}")
+            self.gone = True
+        self.save()
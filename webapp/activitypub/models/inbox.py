@@ -0,0 +1,132 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: ts=4 et sw=4 sts=4
+# pylint: disable=invalid-name
+
+"""
+Inbound activity queue for `Angry Planet Cloud`.
+
+Specifically:
+    - InboxItem
+    - ReceivedActivity
+
+"""
+
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _
+
+from .actor import Actor
+from .delivery import backoff
+
+
+class InboxItem(models.Model):
+    """
+    An activity received in an inbox, waiting to be processed.
+
+    With `INBOX_ASYNC`, the inbox only checks the request for the basics,
+    stores it and responds with `202 Accepted`. Verification of the
+    signature and the activity handlers run later, in
+    :py:func:`webapp.activitypub.inbox.process_queue`.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        PROCESSED = "processed", _("Processed")
+        DUPLICATE = "duplicate", _("Duplicate")
+        REJECTED = "rejected", _("Rejected")
+        FAILED = "failed", _("Failed")
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    actor = models.ForeignKey(
+        Actor,
+        on_delete=models.CASCADE,
+        related_name="inbox_items",
+        blank=True,
+        null=True,
+        help_text=_("The local actor the activity was posted to."),
+    )
+    method = models.CharField(max_length=8, default="POST")
+    path = models.CharField(max_length=255)
+    headers = models.JSONField()
+    body = models.TextField()
+
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=now)
+    result = models.TextField(blank=True, default="")
+
+    received = models.DateTimeField(default=now)
+    processed = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = _("Inbox item")
+        verbose_name_plural = _("Inbox items")
+        indexes = [
+            models.Index(fields=["status", "next_attempt"]),
+            models.Index(fields=["processed"]),
+        ]
+
+    def __str__(self):
+        return f"{self.path} at {self.received} ({self.status})"
+
+    @property
+    def latency(self):
+        """
+        Time between receiving and processing the activity.
+        """
+        if self.processed is None:
+            return None
+        return self.processed - self.received
+
+    def done(self, status: str, result: str = "") -> None:
+        self.attempts += 1
+        self.status = status
+        self.result = result
+        self.processed = now()
+        self.save()
+
+    def failed(self, error: str) -> None:
+        """
+        Record a failed attempt and schedule the next one.
+        """
+        self.attempts += 1
+        self.result = error
+        if self.attempts >= settings.INBOX_MAX_ATTEMPTS:
+            self.status = self.Status.FAILED
+            self.processed = now()
+        else:
+            self.next_attempt = now() + backoff(self.attempts)
+        self.save()
+
+
+class ReceivedActivity(models.Model):
+    """
+    An activity that has been accepted by an inbox.
+
+    Remote servers retry deliveries, and the same activity arrives once
+    per local recipient, so activities are processed only the first time
+    their `id` and body are seen, see
+    :py:func:`webapp.activitypub.inbox.claim`.
+    """
+
+    activity_id = models.CharField(max_length=1024, blank=True)
+    digest = models.CharField(max_length=64)
+    received = models.DateTimeField(default=now, db_index=True)
+
+    class Meta:
+        verbose_name = _("Received activity")
+        verbose_name_plural = _("Received activities")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["activity_id", "digest"], name="unique_received_activity"
+            )
+        ]
+
+    def __str__(self):
+        return self.activity_id or self.digest
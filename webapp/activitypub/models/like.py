@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 from webapp.activitypub.models.actor import Actor
 from webapp.activitypub.validators import validate_iri
@@ -28,6 +28,19 @@ class Like(models.Model):
     object = models.URLField(validators=[validate_iri])
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # liked, newest first
+            models.Index(fields=["actor", "created_at"]),
+        ]
+
     def get_absolute_url(self):
         from django.urls import reverse
         return reverse("like-detail", kwargs={'pk': self.id})
+
+    def save(self, *args, **kwargs):
+        """
+        Save, and count in :py:mod:`webapp.activitypub.counters`, atomically.
+        """
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
@@ -0,0 +1,51 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: ts=4 et sw=4 sts=4
+# pylint: disable=invalid-name
+
+"""
+Instance policies for `Angry Planet Cloud`.
+
+Specifically:
+    - InstancePolicy
+
+"""
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class InstancePolicy(models.Model):
+    """
+    How activities from and to a remote domain, and its subdomains, are
+    treated.
+
+    The policies are compiled into a suffix trie, see
+    :py:mod:`webapp.activitypub.policy`. The most specific domain wins.
+    """
+
+    class Severity(models.TextChoices):
+        NONE = "none", _("None")
+        SILENCE = "silence", _("Silence")
+        BLOCK = "block", _("Block")
+
+    domain = models.CharField(max_length=255, unique=True)
+    severity = models.CharField(
+        max_length=16, choices=Severity.choices, default=Severity.NONE
+    )
+    reject_media = models.BooleanField(default=False)
+    reason = models.TextField(blank=True, default="")
+
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Instance policy")
+        verbose_name_plural = _("Instance policies")
+
+    def __str__(self):
+        return f"{self.domain} ({self.severity})"
+
+    def save(self, *args, **kwargs):
+        self.domain = self.domain.strip().strip(".").lower()
+        super().save(*args, **kwargs)
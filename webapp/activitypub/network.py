@@ -0,0 +1,206 @@
+"""
+.. py:module:: webapp.activitypub.network
+    :synopsis: Validated, pinned name resolution for outgoing requests.
+
+Every outgoing request to a remote server is checked for SSRF: all
+addresses the hostname resolves to must be public. The result of that
+check is cached per process for `RESOLVER_TTL` seconds (failures for
+`RESOLVER_NEGATIVE_TTL`), and :py:class:`PinnedAdapter` connects to the
+validated address instead of resolving the hostname a second time. That
+saves a lookup per request and closes the DNS rebinding window between
+validation and connection.
+
+:py:func:`get` follows redirects itself, and validates every hop like the
+first.
+"""
+
+import ipaddress
+import logging
+import socket
+from urllib.parse import urljoin, urlparse
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from requests.utils import select_proxy
+
+from webapp.activitypub.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+MAX_REDIRECTS = 5
+"""Redirects followed by :py:func:`get`."""
+
+resolver_cache = TTLCache(
+    maxsize=getattr(settings, "RESOLVER_CACHE_SIZE", 1024),
+    ttl=getattr(settings, "RESOLVER_TTL", 300),
+)
+
+
+class ResolutionError(ValueError):
+    """
+    A hostname does not resolve, which, unlike other rejections, may be
+    temporary.
+    """
+
+
+def _is_ip(hostname: str) -> bool:
+    try:
+        ipaddress.ip_address(hostname)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def resolve(hostname: str, port: int = 443) -> list[str]:
+    """
+    Resolve `hostname` and validate all of its addresses.
+
+    :param hostname: str: The hostname to resolve
+    :param port: int: The port that will be connected to
+    :return: list[str]: The public addresses of `hostname`
+    :raises ResolutionError: If the hostname does not resolve
+    :raises ValueError: If any of its addresses is not public (private,
+        loopback, link-local, ...)
+    """
+    key = (hostname.lower(), port)
+    cached = resolver_cache.get(key)
+    if isinstance(cached, ValueError):
+        raise cached
+    if cached is not None:
+        return cached
+
+    try:
+        try:
+            infos = socket.getaddrinfo(
+                hostname, port, type=socket.SOCK_STREAM, proto=socket.IPPROTO_TCP
+            )
+        except socket.gaierror:  # [Errno -2] Name or service not known
+            logger.info(f"rejecting unresolvable hostname {hostname}")
+            raise ResolutionError(f"rejecting unresolvable hostname {hostname}")
+
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addresses:
+            raise ResolutionError(f"rejecting unresolvable hostname {hostname}")
+        for address in addresses:
+            if not _is_public(address):
+                logger.info(f"rejecting private address {hostname} -> {address}")
+                raise ValueError(f"rejecting private address {hostname} -> {address}")
+    except ValueError as e:
+        resolver_cache.set(key, e, getattr(settings, "RESOLVER_NEGATIVE_TTL", 30))
+        raise
+
+    resolver_cache.set(key, addresses)
+    return addresses
+
+
+def _default_port(scheme: str) -> int:
+    return 80 if scheme == "http" else 443
+
+
+class PinnedAdapter(HTTPAdapter):
+    """
+    Connect to the address validated by :py:func:`resolve`.
+
+    The request URL is rewritten to the address, with the original
+    hostname kept in the `Host` header, for TLS server name indication
+    and for certificate verification. Requests to IP literals and through
+    proxies are sent unchanged.
+    """
+
+    def send(self, request: requests.PreparedRequest, **kwargs):
+        parsed = urlparse(request.url)
+        hostname = parsed.hostname
+        if (
+            hostname
+            and not _is_ip(hostname)
+            and not select_proxy(request.url, kwargs.get("proxies"))
+        ):
+            port = parsed.port or _default_port(parsed.scheme)
+            address = resolve(hostname, port)[0]
+            if ":" in address:
+                address = f"[{address}]"
+            request = request.copy()
+            request.headers.setdefault("Host", parsed.netloc)
+            request.url = parsed._replace(netloc=f"{address}:{port}").geturl()
+            request.pinned_hostname = hostname
+        return super().send(request, **kwargs)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        hostname = getattr(request, "pinned_hostname", None)
+        if hostname is None:
+            return super().get_connection_with_tls_context(
+                request, verify, proxies=proxies, cert=cert
+            )
+        host_params, pool_kwargs = self.build_connection_pool_key_attributes(
+            request, verify, cert
+        )
+        if host_params["scheme"] == "https":
+            pool_kwargs["server_hostname"] = hostname
+            pool_kwargs["assert_hostname"] = hostname
+        return self.poolmanager.connection_from_host(
+            **host_params, pool_kwargs=pool_kwargs
+        )
+
+
+_session: requests.Session | None = None
+
+
+def session() -> requests.Session:
+    """
+    Return the process wide session for fetching remote objects.
+    """
+    global _session
+    if _session is None:
+        adapter = PinnedAdapter()
+        _session = requests.Session()
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+    return _session
+
+
+def _check_address(url: str) -> None:
+    """
+    Reject `url` if its host is an IP literal that is not public.
+
+    Hostnames are validated when :py:class:`PinnedAdapter` resolves them.
+    """
+    hostname = urlparse(url).hostname
+    if hostname and _is_ip(hostname) and not _is_public(hostname):
+        logger.info(f"rejecting private address {hostname}")
+        raise ValueError(f"rejecting private address {hostname}")
+
+
+def get(url: str, allow_redirects: bool = True, **kwargs) -> requests.Response:
+    """
+    `GET` `url` through the pinned session.
+
+    Redirects are followed here, not by requests: every hop is checked with
+    :py:func:`_check_address`, the locations redirected to as well with
+    :py:func:`webapp.activitypub.tasks.is_valid`, like the requested URL by
+    the callers. Relative locations are resolved against the requested URL
+    instead of the pinned address.
+
+    :raises ValueError: If a hop is not a public address, or not valid.
+    :raises requests.TooManyRedirects: After `MAX_REDIRECTS` redirects.
+    """
+    from webapp.activitypub.tasks import is_valid
+
+    for hop in range(MAX_REDIRECTS + 1):
+        if hop and not is_valid(url):
+            raise ValueError(f"Invalid redirect to {url}")
+        _check_address(url)
+        response = session().get(url, allow_redirects=False, **kwargs)
+        response.url = url
+        if not allow_redirects or not response.is_redirect:
+            return response
+        url = urljoin(url, response.headers["Location"])
+        response.close()
+    raise requests.TooManyRedirects(f"Exceeded {MAX_REDIRECTS} redirects")
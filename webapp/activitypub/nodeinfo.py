@@ -0,0 +1,82 @@
+"""
+.. py:module:: webapp.activitypub.nodeinfo
+    :synopsis: Usage statistics for NodeInfo.
+
+The statistics reported by :py:class:`webapp.activitypub.views.VersionView`
+are computed with a few aggregate queries by :py:func:`compute_usage` and
+kept in the cache. The periodic task
+:py:func:`webapp.activitypub.tasks.updateNodeInfo` refreshes them, so
+requests only read the cache.
+
+.. code-block:: python
+
+    # settings.py
+    CELERY_BEAT_SCHEDULE = {
+        "update-nodeinfo": {
+            "task": "webapp.activitypub.tasks.updateNodeInfo",
+            "schedule": 3600,
+        },
+    }
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from webapp.activitypub.models import Action, Actor, Note
+from webapp.models import Profile
+
+USAGE_KEY = "activitypub:nodeinfo:usage"
+
+
+def active_users(days: int) -> int:
+    """
+    The number of local actors with an action within the last `days`.
+    """
+    local = Actor.objects.filter(profile__isnull=False).values("id")
+    return (
+        Action.objects.filter(
+            actor_content_type=ContentType.objects.get_for_model(Actor),
+            actor_object_id__in=local,
+            timestamp__gte=now() - timedelta(days=days),
+        )
+        .values("actor_object_id")
+        .distinct()
+        .count()
+    )
+
+
+def compute_usage() -> dict:
+    """
+    Compute the `usage` section of NodeInfo.
+    """
+    return {
+        "users": {
+            "total": Profile.objects.count(),
+            "activeMonth": active_users(30),
+            "activeHalfyear": active_users(180),
+        },
+        "localPosts": Note.objects.filter(remoteID__isnull=True).count(),
+    }
+
+
+def update_usage() -> dict:
+    """
+    Compute the usage statistics and store them in the cache.
+    """
+    result = compute_usage()
+    cache.set(USAGE_KEY, result, settings.NODEINFO_TTL)
+    return result
+
+
+def usage() -> dict:
+    """
+    The cached usage statistics, computed if they are not cached yet.
+    """
+    result = cache.get(USAGE_KEY)
+    if result is None:
+        result = update_usage()
+    return result
@@ -0,0 +1,175 @@
+"""
+.. py:module:: webapp.activitypub.policy
+    :synopsis: Per-host instance policies.
+
+:py:class:`webapp.activitypub.models.InstancePolicy` rows, plus the
+domains in `BLOCKED_SERVERS`, are compiled into a :py:class:`SuffixTrie`
+of reversed domain labels. Looking up the policy of a host walks one node
+per label, however many domains there are.
+
+- `block`: activities from the host are rejected by the inbox before
+  their JSON is parsed or their signature verified, and nothing is
+  delivered or fetched from it.
+- `silence`: activities from the host only reach local actors that follow
+  their sender.
+- `reject_media`: attachments, icons and images are dropped from the
+  objects of activities from the host.
+
+The domain of this site never has a policy, even if a parent domain is
+blocked.
+
+Every process keeps its compiled trie. Saving or deleting a policy bumps
+a version in the cache; processes compare it at most every
+`INSTANCE_POLICY_CHECK_INTERVAL` seconds and recompile when it changed.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "activitypub:policy:version"
+
+
+@dataclass(frozen=True)
+class Policy:
+    """
+    The policy for one host.
+    """
+
+    severity: str = "none"
+    reject_media: bool = False
+
+    @property
+    def blocked(self) -> bool:
+        return self.severity == "block"
+
+    @property
+    def silenced(self) -> bool:
+        return self.severity == "silence"
+
+
+NONE = Policy()
+"""The policy of hosts without one."""
+
+
+class SuffixTrie:
+    """
+    Policies by domain, in a trie of reversed domain labels.
+
+    A policy for `example.com` applies to `example.com` and all its
+    subdomains, unless a subdomain has a policy of its own.
+    """
+
+    _policy = ""  # never a label of a normalized domain
+
+    def __init__(self) -> None:
+        self.root: dict = {}
+
+    def add(self, domain: str, policy: Policy) -> None:
+        node = self.root
+        for label in reversed(domain.strip(".").lower().split(".")):
+            node = node.setdefault(label, {})
+        node[self._policy] = policy
+
+    def lookup(self, host: str) -> Policy:
+        """
+        The policy of the most specific domain `host` belongs to.
+        """
+        result = NONE
+        node = self.root
+        for label in reversed(host.strip(".").lower().split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            result = node.get(self._policy, result)
+        return result
+
+
+_trie: SuffixTrie | None = None
+_version: str | None = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+def compile_policies() -> SuffixTrie:
+    """
+    Compile `BLOCKED_SERVERS` and all instance policies into a trie.
+    """
+    from webapp.activitypub.models import InstancePolicy
+
+    trie = SuffixTrie()
+    for domain in settings.BLOCKED_SERVERS:
+        trie.add(domain, Policy(severity=InstancePolicy.Severity.BLOCK))
+    for domain, severity, reject_media in InstancePolicy.objects.values_list(
+        "domain", "severity", "reject_media"
+    ):
+        trie.add(domain, Policy(severity=severity, reject_media=reject_media))
+    return trie
+
+
+def get_trie() -> SuffixTrie:
+    """
+    The compiled trie of this process, recompiled if the policies changed.
+    """
+    global _trie, _version, _checked
+
+    with _lock:
+        timestamp = time.monotonic()
+        if (
+            _trie is not None
+            and timestamp - _checked < settings.INSTANCE_POLICY_CHECK_INTERVAL
+        ):
+            return _trie
+        _checked = timestamp
+
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+        if _trie is None or version != _version:
+            logger.debug(f"Compiling instance policies, version {version}")
+            _trie, _version = compile_policies(), version
+        return _trie
+
+
+def policy_for(iri: str | None) -> Policy:
+    """
+    The policy of the host of `iri`, which may be a host name, too.
+    """
+    if not iri:
+        return NONE
+    host = urlparse(iri).hostname if "//" in iri else iri
+    if not host or host.lower() == Site.objects.get_current().domain.lower():
+        return NONE
+    return get_trie().lookup(host)
+
+
+def blocked(iri: str | None) -> bool:
+    """
+    Whether the host of `iri` is blocked.
+    """
+    return policy_for(iri).blocked
+
+
+def reloadPolicies(*args, **kwargs) -> None:
+    """
+    Make all processes recompile the policies.
+
+    Connected to `post_save` and `post_delete` of
+    :py:class:`webapp.activitypub.models.InstancePolicy`, and to
+    `setting_changed`.
+    """
+    global _trie
+
+    if kwargs.get("setting") not in (None, "BLOCKED_SERVERS"):
+        return
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _trie = None
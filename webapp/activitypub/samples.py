@@ -0,0 +1,101 @@
+# flake8: noqa: E501
+
+"""
+Activities as received from Mastodon, for benchmarks and tests, see
+:py:mod:`webapp.management.commands.canonicalize`.
+"""
+
+false = False
+null = None
+
+undo = {
+    "@context": "https://www.w3.org/ns/activitystreams",
+    "id": "https://23.social/users/andreasofthings#follows/58530/undo",
+    "type": "Undo",
+    "actor": "https://23.social/users/andreasofthings",
+    "object": {
+        "id": "https://23.social/e6630b4e-9401-4c26-9091-e3570cea344e",
+        "type": "Follow",
+        "actor": "https://23.social/users/andreasofthings",
+        "object": "https://pramari.de/@andreas",
+    },
+}
+
+
+follow = {
+    "@context": "https://www.w3.org/ns/activitystreams",
+    "id": "https://pramari.de/113eb421-8273-4b29-b418-9d1aeffe26e2",
+    "type": "Follow",
+    "actor": "https://pramari.de/@andreas",
+    "object": "https://pramari.de/@andreas",
+}
+
+mention = {
+    "@context": [
+        "https://www.w3.org/ns/activitystreams",
+        {
+            "ostatus": "http://ostatus.org#",
+            "atomUri": "ostatus:atomUri",
+            "inReplyToAtomUri": "ostatus:inReplyToAtomUri",
+            "conversation": "ostatus:conversation",
+            "sensitive": "as:sensitive",
+            "toot": "http://joinmastodon.org/ns#",
+            "votersCount": "toot:votersCount",
+        },
+    ],
+    "id": "https://23.social/users/andreasofthings/statuses/112621194858481951/activity",  # noqa: E501
+    "type": "Create",
+    "actor": "https://23.social/users/andreasofthings",
+    "published": "2024-06-15T14:50:56Z",
+    "to": ["https://www.w3.org/ns/activitystreams#Public"],
+    "cc": [
+        "https://23.social/users/andreasofthings/followers",
+        "https://pramari.de/@andreas",
+    ],
+    "object": {
+        "id": "https://23.social/users/andreasofthings/statuses/112621194858481951",  # noqa: E501
+        "type": "Note",
+        "summary": null,
+        "inReplyTo": null,
+        "published": "2024-06-15T14:50:56Z",
+        "url": "https://23.social/@andreasofthings/112621194858481951",
+        "attributedTo": "https://23.social/users/andreasofthings",
+        "to": ["https://www.w3.org/ns/activitystreams#Public"],
+        "cc": [
+            "https://23.social/users/andreasofthings/followers",
+            "https://pramari.de/@andreas",
+        ],
+        "sensitive": false,
+        "atomUri": "https://23.social/users/andreasofthings/statuses/112621194858481951",  # noqa: E501
+        "inReplyToAtomUri": null,
+        "conversation": "tag:23.social,2024-06-15:objectId=3873286:objectType=Conversation",  # noqa: E501
+        "content": '\u003cp\u003e\u003cspan class="h-card" translate="no"\u003e\u003ca href="https://pramari.de/@andreas" class="u-url mention"\u003e@\u003cspan\u003eandreas\u003c/span\u003e\u003c/a\u003e\u003c/span\u003e Test!\u003c/p\u003e',  # noqa: E501
+        "contentMap": {
+            "en": '\u003cp\u003e\u003cspan class="h-card" translate="no"\u003e\u003ca href="https://pramari.de/@andreas" class="u-url mention"\u003e@\u003cspan\u003eandreas\u003c/span\u003e\u003c/a\u003e\u003c/span\u003e Test!\u003c/p\u003e'  # noqa: E501
+        },
+        "attachment": [],
+        "tag": [
+            {
+                "type": "Mention",
+                "href": "https://pramari.de/@andreas",
+                "name": "@andreas@pramari.de",
+            }
+        ],
+        "replies": {
+            "id": "https://23.social/users/andreasofthings/statuses/112621194858481951/replies",  # noqa: E501
+            "type": "Collection",
+            "first": {
+                "type": "CollectionPage",
+                "next": "https://23.social/users/andreasofthings/statuses/112621194858481951/replies?only_other_accounts=true\u0026page=true",  # noqa: E501
+                "partOf": "https://23.social/users/andreasofthings/statuses/112621194858481951/replies",  # noqa: E501
+                "items": [],
+            },
+        },
+    },
+    "signature": {
+        "type": "RsaSignature2017",
+        "creator": "https://23.social/users/andreasofthings#main-key",
+        "created": "2024-06-15T14:50:56Z",
+        "signatureValue": "ntW2W8BA5rQntHA6wBy+meR7W/XR8nlv74MKoBWKySK2tCbTWtnSvb3PHiIlmhpnabrBj/IUg3dPJwTRwe9a/raBsBSvLfPnLheo/9Ra25AGgEtBAimClmwYGZpO9CDrvPQJPisjkMBKHnkSDW7+TvnvUEVXfleU1ImA8stly3XvhPiuapfxFlygRBltNddUxzUJ+CjNAUb0hMrS/P9aH2z6jwa+o3X1YOhBoqXkg+krTKbECLLumlVhB5SfL6NpCXQVTA5qNn/W4ej2W5oNbzmsDWUscvathuk4hF0livfhm8gEKwFNTaZx15miVmGqueXwQVwDu/Gh6i4S5b844w==",  # noqa: E501
+    },
+}
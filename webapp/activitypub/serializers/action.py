@@ -1,8 +1,128 @@
+"""
+Serialize :py:class:`webapp.activitypub.models.Action` objects as
+ActivityStreams activities.
+
+Rendered activities are kept in the cache, see :py:func:`render_key`, and
+forgotten when the action or an object it refers to changes, see
+:py:func:`webapp.activitypub.signals.invalidateActions`.
+"""
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.utils import translation
 from rest_framework import serializers
-from webapp.activitypub.models import Action
+
+from webapp.activitypub.managers import generic_relations
+from webapp.activitypub.models import Action, Actor, Like, Note
+from webapp.activitypub.schema import ACTIVITY_TYPES
+
+PUBLIC = "https://www.w3.org/ns/activitystreams#Public"
+
+
+def render_key(pk) -> str:
+    """
+    The cache key of the rendered activity of the action `pk`.
+    """
+    return f"activitypub:action:{pk}"
+
+
+def activity_type(action: Action) -> str:
+    """
+    The ActivityStreams type of `action`, i.e. `TentativeAccept`.
+    """
+    with translation.override(None):
+        return str(ACTIVITY_TYPES.get(action.activity_type, action.activity_type))
+
+
+def render_object(obj):
+    """
+    The ActivityStreams representation of an object of an action.
+    """
+    base = f"https://{Site.objects.get_current().domain}"
+    match obj:
+        case None:
+            return None
+        case Actor():
+            return obj.id
+        case Like():
+            return obj.object
+        case Note():
+            return {
+                "id": obj.remoteID or f"{base}{obj.get_absolute_url()}",
+                "type": "Note",
+                "attributedTo": obj.attributedTo_id,
+                "content": obj.content,
+                "published": obj.published.isoformat(),
+                "to": [PUBLIC] if obj.public else [],
+            }
+        case _:
+            if hasattr(obj, "get_absolute_url"):
+                return f"{base}{obj.get_absolute_url()}"
+            return str(obj)
+
+
+class ActionListSerializer(serializers.ListSerializer):
+    """
+    Look up all rendered activities of a page in one cache request, and
+    store the ones that had to be rendered in another.
+
+    The objects of the actions that are rendered are fetched in bulk, with
+    one query per model, like
+    :py:meth:`webapp.activitypub.managers.BaseQuerySet.fetch_generic_relations`.
+    """
+
+    def to_representation(self, data):
+        actions = list(data.all() if hasattr(data, "all") else data)
+        keys = {action.pk: render_key(action.pk) for action in actions}
+        cached = cache.get_many(list(keys.values()))
+
+        missing = [action for action in actions if keys[action.pk] not in cached]
+        prefetch_related_objects(missing, *generic_relations(Action))
+
+        rendered = {}
+        result = []
+        for action in actions:
+            activity = cached.get(keys[action.pk])
+            if activity is None:
+                activity = self.child.to_representation(action)
+                rendered[keys[action.pk]] = activity
+            result.append(activity)
+
+        if rendered:
+            cache.set_many(rendered, settings.ACTION_RENDER_TTL)
+        return result
 
 
 class ActionSerializer(serializers.ModelSerializer):
+    """
+    An :py:class:`Action` as an ActivityStreams activity.
+
+    With `many=True`, see :py:class:`ActionListSerializer`.
+    """
+
     class Meta:
         model = Action
-        fields = ['id', 'activity_id', ]
+        fields = [
+            "id",
+            "activity_id",
+        ]
+        list_serializer_class = ActionListSerializer
+
+    def to_representation(self, instance: Action) -> dict:
+        activity = {
+            "id": instance.activity_id,
+            "type": activity_type(instance),
+            "actor": render_object(instance.actor) or instance.actor_object_id,
+            "published": instance.timestamp.isoformat(),
+        }
+        if instance.action_object_object_id is not None:
+            activity["object"] = render_object(instance.action_object)
+        if instance.target_object_id is not None:
+            activity["target"] = render_object(instance.target)
+        if instance.description:
+            activity["summary"] = instance.description
+        if instance.public:
+            activity["to"] = [PUBLIC]
+        return activity
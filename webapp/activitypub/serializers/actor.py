@@ -9,6 +9,13 @@ from webapp.activitypub.models import Actor  # noqa: E402
 from webapp.activitypub.schema import schemas  # noqa: E402
 
 
+def actor_key(slug: str) -> str:
+    """
+    The cache key of the rendered actor documents of the profile `slug`.
+    """
+    return f"activitypub:actor:{slug}"
+
+
 class ActorSerializer(serializers.ModelSerializer):
     """
         "@context": [
@@ -25,6 +32,7 @@ class ActorSerializer(serializers.ModelSerializer):
         "followers": actor.followers,
         "following": actor.following,
         "liked": actor.liked,
+        "endpoints": {"sharedInbox": actor.sharedInbox},
         "url": self.get_object().get_absolute_url,
         "manuallyApprovesFollowers": False,
         "discoverable": False,
@@ -55,12 +63,16 @@ class ActorSerializer(serializers.ModelSerializer):
             "publicKeyPem": actor.profile.public_key_pem,
         }
 
+    def get_endpoints(self, actor):
+        return {"sharedInbox": actor.sharedInbox}
+
     def get_url(self, actor):
         return (actor.id,)
 
     def get_preferred_username(self, actor):
         return actor.profile.user.username
 
+    endpoints = serializers.SerializerMethodField("get_endpoints")
     url = serializers.SerializerMethodField("get_url")
     public_key = serializers.SerializerMethodField("get_public_key")
     preferred_username = serializers.SerializerMethodField("get_preferred_username")
@@ -76,6 +88,7 @@ class ActorSerializer(serializers.ModelSerializer):
             "followers",
             "following",
             "liked",
+            "endpoints",
             "public_key",
             "url",
         ]
@@ -1,18 +1,94 @@
 from .models import Actor
 from .registry import check
+from .counters import count_actions
 from webapp.models import Profile
 from django.contrib.sites.models import Site
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from django.apps import apps
+from django.db import transaction
 from django.dispatch import Signal
 
 import logging
+import threading
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
 action = Signal()
 
+_registered = set()
+"""Model classes checked against the registry."""
+
+_pending = threading.local()
+"""Actions collected by :py:func:`bulk_actions` in the current thread."""
+
+
+def content_type(instance, registered: bool = True) -> ContentType:
+    """
+    The ContentType of `instance`.
+
+    ContentTypes are cached per model class by Django; the registry is
+    checked once per model class, too.
+
+    :param registered: Whether the model must be registered, see
+        :py:mod:`webapp.activitypub.registry`.
+    """
+    model_class = instance.__class__
+    if getattr(instance, "_deferred", None):
+        model_class = instance._meta.proxy_for_model
+    if registered and model_class not in _registered:
+        check(model_class)  # Check if the object is registered
+        _registered.add(model_class)
+    return ContentType.objects.get_for_model(model_class)
+
+
+@contextmanager
+def bulk_actions(batch_size: int = 500):
+    """
+    Collect the actions sent within the block and write them with
+    `bulk_create`, in batches of `batch_size` and on exit.
+
+    Actions are discarded if the block raises. Nested blocks write with
+    the outermost one.
+
+    .. code-block:: python
+
+        with bulk_actions():
+            for follower in followers:
+                action.send(sender=follower, verb="Follow", target=actor)
+    """
+    if getattr(_pending, "actions", None) is not None:
+        yield _pending.actions
+        return
+
+    _pending.actions = []
+    _pending.batch_size = batch_size
+    try:
+        yield _pending.actions
+        flush_actions()
+    finally:
+        _pending.actions = None
+
+
+def flush_actions() -> int:
+    """
+    Write the actions collected by :py:func:`bulk_actions`.
+
+    :return: The number of actions written.
+    """
+    actions = getattr(_pending, "actions", None)
+    if not actions:
+        return 0
+    Action = apps.get_model("activitypub", "action")
+    with transaction.atomic(savepoint=False):
+        Action.objects.bulk_create(actions, batch_size=_pending.batch_size)
+        count_actions(actions)
+    count = len(actions)
+    actions.clear()
+    return count
+
+
 def signalHandler(*args, **kwargs):
     """
     Handler function to create Action instance upon action signal call.
@@ -23,7 +99,8 @@ def signalHandler(*args, **kwargs):
     :param  \*args: Additional arguments for the action.  # noqa: W605
     :param  \*\*kwargs: Additional keyword arguments to an action. # noqa: W605
 
-    :return: The created Action instance.
+    :return: The created Action instance. Within :py:func:`bulk_actions`,
+        it is written when the block exits.
 
     This function will handle signals sent by the action signal. It will create
     an instance of the Action model and save it to the database. It will allow
@@ -69,12 +146,9 @@ def signalHandler(*args, **kwargs):
     if hasattr(verb, "_proxy____args"):
         verb = verb._proxy____args[0]
 
-    actor_content_type = ContentType.objects.get_for_model(actor)
-    actor_object_id = actor.pk
-
     activity = apps.get_model("activitypub", "action")(
-        actor_content_type=actor_content_type,
-        actor_object_id=actor_object_id,
+        actor_content_type=content_type(actor, registered=False),
+        actor_object_id=actor.pk,
         activity_type=str(verb).lower(),
         public=bool(kwargs.pop("public", True)),
         description=kwargs.pop("description", None),
@@ -84,30 +158,95 @@ def signalHandler(*args, **kwargs):
     # for opt in ("target", "action_object"):
     target = kwargs.pop("target", None)
     if target is not None:
-        check(target)  # Check if the object is registered
         setattr(activity, "target_object_id", target.pk)
-        setattr(
-            activity,
-            "target_content_type",
-            ContentType.objects.get_for_model(target),
-        )
+        setattr(activity, "target_content_type", content_type(target))
 
     action_object = kwargs.pop("action_object", None)
     if action_object is not None:
-        check(action_object)  # Check if the object is registered
         setattr(activity, "action_object_object_id", action_object.pk)
-        setattr(
-            activity,
-            "action_object_content_type",
-            ContentType.objects.get_for_model(action_object),
-        )
+        setattr(activity, "action_object_content_type", content_type(action_object))
+
+    actions = getattr(_pending, "actions", None)
+    if actions is not None:
+        actions.append(activity)
+        if len(actions) >= _pending.batch_size:
+            flush_actions()
+        return activity
 
-    activity.save(force_insert=True)
+    with transaction.atomic(savepoint=False):
+        activity.save(force_insert=True)
+        count_actions([activity])
     logger.debug("Succesfully exited signalHandler")
     return activity
 
 
 
+def invalidateActions(sender, instance, **kwargs):
+    """
+    Forget the rendered activities of the actions that refer to `instance`.
+
+    Connected to `post_save` and `post_delete` of the registered models
+    and of :py:class:`webapp.activitypub.models.Action` itself.
+    """
+    from django.core.cache import cache
+    from django.db.models import Q
+    from webapp.activitypub.serializers.action import render_key
+
+    Action = apps.get_model("activitypub", "action")
+    if isinstance(instance, Action):
+        cache.delete(render_key(instance.pk))
+        return
+
+    content_type = ContentType.objects.get_for_model(instance)
+    pk = str(instance.pk)
+    actions = Action.objects.filter(
+        Q(actor_content_type=content_type, actor_object_id=pk)
+        | Q(target_content_type=content_type, target_object_id=pk)
+        | Q(action_object_content_type=content_type, action_object_object_id=pk)
+    ).values_list("pk", flat=True)
+    cache.delete_many([render_key(action) for action in actions])
+
+
+def invalidateActor(sender, instance, **kwargs):
+    """
+    Forget the rendered documents of a local actor.
+
+    Connected to `post_save` and `post_delete` of
+    :py:class:`webapp.activitypub.models.Actor` and
+    :py:class:`webapp.models.Profile`, which holds the keys, and to
+    `pre_save` of the latter, for the slug a profile is renamed from.
+    """
+    from django.core.cache import cache
+    from django.db.models.signals import pre_save
+    from webapp.activitypub.serializers.actor import actor_key
+
+    if isinstance(instance, Profile) and kwargs.get("signal") is pre_save:
+        slugs = Profile.objects.filter(pk=instance.pk).values_list("slug", flat=True)
+    elif isinstance(instance, Profile):
+        slugs = [instance.slug]
+    elif instance.profile_id is None:  # remote actor
+        return
+    else:
+        slugs = Profile.objects.filter(pk=instance.profile_id).values_list(
+            "slug", flat=True
+        )
+    cache.delete_many([actor_key(slug) for slug in slugs])
+
+
+def updateEndpoints(sender, instance, **kwargs):
+    """
+    Recompute the endpoints of the local actor of a saved profile, i.e.
+    when it was renamed.
+
+    Connected to `post_save` of :py:class:`webapp.models.Profile`.
+    """
+    actor = Actor.objects.filter(profile=instance).first()
+    if actor is None:
+        return
+    actor.profile = instance
+    actor.update_endpoints(actor.local_endpoints())
+
+
 def createActor(sender, instance, created, **kwargs):
     if created:  # not user.profile:
 
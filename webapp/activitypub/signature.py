@@ -16,6 +16,7 @@ import base64
 import hashlib
 import logging
 import traceback
+import uuid
 
 from datetime import datetime, timedelta, timezone
 import requests
@@ -31,10 +32,43 @@ from cryptography.hazmat.primitives.serialization import (
 )
 
 from webapp.typing import url, method
+from webapp.activitypub.cache import TTLCache
+from django.conf import settings
 from django.http import HttpRequest
 
 logger = logging.getLogger(__name__)
 
+public_key_cache = TTLCache(
+    maxsize=getattr(settings, "KEY_CACHE_SIZE", 1024),
+    ttl=getattr(settings, "KEY_CACHE_TTL", 3600),
+)
+"""Loaded public keys of remote actors, indexed by keyId."""
+
+private_key_cache = TTLCache(
+    maxsize=getattr(settings, "KEY_CACHE_SIZE", 1024),
+    ttl=getattr(settings, "KEY_CACHE_TTL", 3600),
+)
+"""Loaded private keys of local actors, with their version, indexed by keyId."""
+
+PRIVATE_KEY_VERSION_KEY = "activitypub:private-key:version:{actor_id}"
+"""Shared cache key of the version of the private keys of an actor."""
+
+
+def _private_key_version(actor_id: str) -> str:
+    """
+    The current version of the private keys of `actor_id`, shared by all
+    processes, see :py:func:`invalidatePrivateKey`.
+    """
+    from django.core.cache import cache
+
+    key = PRIVATE_KEY_VERSION_KEY.format(actor_id=actor_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
 class HttpSignature:
     def __init__(self):
         self.fields = []
@@ -62,8 +96,16 @@ class HttpSignature:
         return ",".join(signature_parts)
 
     def verify(self, public_key, signature):
+        """
+        Verify `signature` over the message built from the fields.
+
+        :param public_key: A PEM string or an already loaded public key.
+        """
         message = self.build_message()
-        public_key_loaded = load_pem_public_key(public_key.encode("utf-8"))
+        if isinstance(public_key, str):
+            public_key_loaded = load_pem_public_key(public_key.encode("utf-8"))
+        else:
+            public_key_loaded = public_key
 
         try:
             public_key_loaded.verify(
@@ -123,6 +165,82 @@ def digest_sha256(content: str) -> str:
     return "SHA-256=" + digest
 
 
+def _public_key_pem(document: dict, key_id: str) -> str | None:
+    """
+    Find the PEM for `key_id` in an actor or key document.
+
+    Actors usually embed the key as `publicKey`; some servers use a
+    dedicated key document carrying `publicKeyPem` itself.
+    """
+    if "publicKeyPem" in document:
+        return document.get("publicKeyPem")
+
+    keys = document.get("publicKey")
+    if isinstance(keys, dict):
+        keys = [keys]
+    for key in keys or []:
+        if isinstance(key, dict) and key.get("id") in (key_id, None):
+            return key.get("publicKeyPem")
+    return None
+
+
+def getPublicKey(key_id: str, refresh: bool = False):
+    """
+    Get the loaded public key for a given key_id.
+
+    Keys are kept in :py:data:`public_key_cache`, so a burst of deliveries
+    from the same remote actor parses the PEM only once.
+
+    :param key_id: The keyId of an incoming signature.
+    :param refresh: Ignore cached keys and documents, i.e. after a failed
+        verification to pick up a rotated key. Documents are refetched at
+        most every `KEY_REFRESH_INTERVAL` seconds, by any process; when
+        throttled, only the key loaded by this process is dropped, and
+        reloaded from the document another one has refetched.
+    :return: The public key object or None, if the key cannot be found.
+    """
+    from django.core.cache import cache
+    from webapp.activitypub.tasks import fetchRemoteActor, invalidateFetch
+
+    if not refresh:
+        public_key = public_key_cache.get(key_id)
+        if public_key is not None:
+            return public_key
+    elif not cache.add(
+        f"activitypub:key-refresh:{key_id}", 1, settings.KEY_REFRESH_INTERVAL
+    ):
+        logger.info(f"Not refreshing {key_id} again yet")
+        public_key_cache.delete(key_id)
+    else:
+        public_key_cache.delete(key_id)
+        invalidateFetch(key_id)
+
+    document = fetchRemoteActor(key_id)
+    public_key_pem = _public_key_pem(document or {}, key_id)
+    if public_key_pem is None:
+        return None
+
+    public_key = load_pem_public_key(public_key_pem.encode("utf-8"))
+    public_key_cache.set(key_id, public_key)
+    return public_key
+
+
+def invalidatePublicKey(actor_id: str) -> None:
+    """
+    Forget all cached keys and the cached document of `actor_id`.
+
+    Called when a remote actor sends an `Update` or `Delete` for itself.
+    """
+    from webapp.activitypub.tasks import invalidateFetch
+
+    invalidateFetch(actor_id)
+    removed = public_key_cache.delete_many(
+        lambda key_id: key_id.split("#")[0] == actor_id
+        or key_id.startswith(f"{actor_id}/")
+    )
+    logger.debug(f"Invalidated {removed} cached key(s) for {actor_id}")
+
+
 def getPrivateKey(key_id: str) -> str:
     """
     Get the private key for a given key_id
@@ -144,43 +262,70 @@ def getPrivateKey(key_id: str) -> str:
     return Profile.objects.get(actor__id=actor_id).private_key_pem
 
 
-def signedRequest(
-    method: method, url: url, message: dict, key_id: str, headers: dict = {}
-) -> requests.PreparedRequest:  # noqa: E501
+def loadPrivateKey(key_id: str):
     """
-    Wrapper around requests.method to sign a request with
-    a private key for the fediverse
+    Get the loaded private key for a given key_id.
 
-    Fields to sign:
-        host date digest content-type
+    Keys are kept in :py:data:`private_key_cache`, so fanning out an
+    activity to many inboxes queries and parses the key only once.
+    Saving the :py:class:`webapp.models.Profile` bumps the version of its
+    keys, and every process reloads them on their next use.
+    """
+    version = _private_key_version(key_id.split("#")[0])
+    cached = private_key_cache.get(key_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
 
-    :param method: The HTTP method
-    :param url: The URL to send the request to
-    :param message: The message to send in JSON LD
-    :param key_id: The private key_id to sign the message with
+    private_key = load_pem_private_key(
+        getPrivateKey(key_id=key_id).encode("utf-8"), password=None
+    )
+    private_key_cache.set(key_id, (version, private_key))
+    return private_key
 
-    :return: The signed request
 
-    https://docs.python-requests.org/en/latest/user/advanced/
+def invalidatePrivateKey(sender, instance, **kwargs) -> None:
+    """
+    Forget the cached private keys of a saved profile, in all processes.
 
-    Example:
+    The keys of this process are dropped, the others notice the new
+    version in the shared cache, see :py:func:`loadPrivateKey`.
 
+    Connected to `post_save` of :py:class:`webapp.models.Profile`.
     """
-    from urllib.parse import urlparse
+    from django.core.cache import cache
+    from webapp.activitypub.models import Actor
+
+    for actor_id in Actor.objects.filter(profile=instance).values_list(
+        "id", flat=True
+    ):
+        cache.set(
+            PRIVATE_KEY_VERSION_KEY.format(actor_id=actor_id), uuid.uuid4().hex, None
+        )
+        private_key_cache.delete_many(
+            lambda key_id: key_id.split("#")[0] == actor_id
+        )
 
-    assert isinstance(message, dict)
-    message_string = json.dumps(message)
 
-    private_key = getPrivateKey(key_id=key_id)
-    headers = {} if headers is None else headers
+def _signedRequest(
+    method: method,
+    url: url,
+    body: str,
+    digest: str,
+    key_id: str,
+    private_key,
+    headers: dict | None = None,
+) -> requests.PreparedRequest:
+    """
+    Build a request for `url` and sign it with the loaded `private_key`.
+    """
+    from urllib.parse import urlparse
+
+    headers = dict(headers or {})
 
     host = urlparse(url).hostname  # req.headers.get("host")
     target = urlparse(url).path  # noqa F841
     logger.debug(f"host: {host} of {url}")
 
-    digest = digest_sha256(message_string)
-    logger.debug(f"digest: {digest}")
-
     date = datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")
     logger.debug(f"date: {date}")
 
@@ -189,7 +334,7 @@ def signedRequest(
 
     signature = (
         HttpSignature()
-        .with_field("(request-target)", f"post {target}")
+        .with_field("(request-target)", f"{method.lower()} {target}")
         .with_field("host", host)
         .with_field("date", date)
         .with_field("digest", digest)
@@ -210,16 +355,100 @@ def signedRequest(
     match method:
         case "POST":
             request = requests.Request(
-                "POST", url, data=message, headers=headers
+                "POST", url, data=body.encode("utf-8"), headers=headers
             ).prepare()
         case "GET":
-            assert message == {}
             request = requests.Request("GET", url, headers=headers).prepare()
         case _:
             raise ValueError(f"Unsupported method {method}")
     return request
 
 
+def signedRequest(
+    method: method, url: url, message: dict, key_id: str, headers: dict = {}
+) -> requests.PreparedRequest:  # noqa: E501
+    """
+    Wrapper around requests.method to sign a request with
+    a private key for the fediverse
+
+    Fields to sign:
+        host date digest content-type
+
+    :param method: The HTTP method
+    :param url: The URL to send the request to
+    :param message: The message to send in JSON LD
+    :param key_id: The private key_id to sign the message with
+
+    :return: The signed request
+
+    https://docs.python-requests.org/en/latest/user/advanced/
+
+    Example:
+
+    """
+    assert isinstance(message, dict)
+    if method == "GET":
+        assert message == {}
+    message_string = json.dumps(message)
+
+    digest = digest_sha256(message_string)
+    logger.debug(f"digest: {digest}")
+
+    return _signedRequest(
+        method,
+        url,
+        message_string,
+        digest,
+        key_id,
+        loadPrivateKey(key_id),
+        headers,
+    )
+
+
+def signedRequests(
+    key_id: str, messages: list[tuple[url, dict]], headers: dict = {}
+) -> list[requests.PreparedRequest]:
+    """
+    Sign many `POST` requests for one actor in one call.
+
+    The private key is loaded once, and every distinct message is serialized
+    and digested once, no matter how many inboxes it is sent to.
+
+    :param key_id: The private key_id to sign the messages with
+    :param messages: `(url, message)` pairs
+    :return: The signed requests, in the order of `messages`
+
+    Example::
+
+        signedRequests(
+            actor.keyID,
+            [(inbox, activity) for inbox in inboxes],
+        )
+    """
+    private_key = loadPrivateKey(key_id)
+    bodies: dict[int, tuple[str, str]] = {}
+
+    signed = []
+    for target_url, message in messages:
+        assert isinstance(message, dict)
+        if id(message) not in bodies:
+            message_string = json.dumps(message)
+            bodies[id(message)] = (message_string, digest_sha256(message_string))
+        message_string, digest = bodies[id(message)]
+        signed.append(
+            _signedRequest(
+                "POST",
+                target_url,
+                message_string,
+                digest,
+                key_id,
+                private_key,
+                headers,
+            )
+        )
+    return signed
+
+
 def did_key_to_public_key(did):
     """
     .. todo::
@@ -242,8 +471,10 @@ def parse_gmt(date_string: str) -> datetime:
     return parse(date_string)
 
 
-def check_max_offset_now(dt: datetime, minutes: int = 5) -> bool:
-    now = datetime.now(tz=timezone.utc)
+def check_max_offset_now(
+    dt: datetime, minutes: int = 5, now: datetime | None = None
+) -> bool:
+    now = now or datetime.now(tz=timezone.utc)
 
     if dt > now + timedelta(minutes=minutes):
         return False
@@ -255,7 +486,13 @@ def check_max_offset_now(dt: datetime, minutes: int = 5) -> bool:
 
 
 def sign_message(private_key, message):
-    key = load_pem_private_key(private_key.encode("utf-8"), password=None)
+    """
+    Sign `message` with a PEM string or an already loaded private key.
+    """
+    if isinstance(private_key, str):
+        key = load_pem_private_key(private_key.encode("utf-8"), password=None)
+    else:
+        key = private_key
 
     return base64.standard_b64encode(
         key.sign(
@@ -314,11 +551,15 @@ class SignatureChecker:
     """
 
     def __init__(self):
-        from webapp.activitypub.tasks import fetchRemoteActor
+        self.key_retriever = getPublicKey
 
-        self.key_retriever = fetchRemoteActor
+    def validate(self, request: HttpRequest, digest=None, received=None):
+        """
+        Verify the signature of `request`.
 
-    def validate(self, request: HttpRequest, digest=None):
+        :param received: When the request was received, if it is verified
+            later, i.e. from :py:class:`webapp.activitypub.models.InboxItem`.
+        """
         if "signature" not in request.headers:
             """
             This is a request without a signature.
@@ -356,7 +597,7 @@ class SignatureChecker:
                 return "Digest not present, but computable"
 
             http_date = parse_gmt(request.headers["date"])
-            if not check_max_offset_now(http_date):
+            if not check_max_offset_now(http_date, now=received):
                 logger.error(f"Found too old date {request.headers['date']}")
                 return f"Found too old date {request.headers['date']}"
 
@@ -371,11 +612,7 @@ class SignatureChecker:
                 else:
                     http_signature.with_field(field, request.headers[field])
 
-            public_key = self.key_retriever(parsed_signature.key_id).get(
-                "publicKey"
-            )[  # noqa: E501
-                "publicKeyPem"
-            ]  # noqa: E501
+            public_key = self.key_retriever(parsed_signature.key_id)
 
             if public_key is None:
                 logger.error(
@@ -386,6 +623,13 @@ class SignatureChecker:
             if http_signature.verify(public_key, parsed_signature.signature):
                 return parsed_signature.key_id
 
+            # The key may have been rotated, refetch it once.
+            public_key = self.key_retriever(parsed_signature.key_id, refresh=True)
+            if public_key is not None and http_signature.verify(
+                public_key, parsed_signature.signature
+            ):
+                return parsed_signature.key_id
+
         except Exception as e:
             logger.debug(str(e))
             logger.debug(request.headers)
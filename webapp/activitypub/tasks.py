@@ -1,13 +1,10 @@
-import json
 import logging
-import functools
-import ipaddress
-import socket
+import threading
+from concurrent.futures import Future
 
 from celery import shared_task
 from django.contrib.auth import get_user_model
 from webapp.activitypub.activity import ActivityObject
-from webapp.activitypub.signature import signedRequest
 
 # from taktivitypub.actor import Actor
 # from taktivitypub import Follow
@@ -16,19 +13,23 @@ logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
-@functools.lru_cache(maxsize=512)
 def is_valid(url: str) -> bool:
     """
     Implements basic SSRF protection.
     Check if a remote object is valid
-    Check if the URL is blocked
+    Check if the URL is blocked, see :py:mod:`webapp.activitypub.policy`
+
+    All addresses the hostname resolves to are checked, see
+    :py:func:`webapp.activitypub.network.resolve`; the result is cached
+    for a bounded time only.
 
     :param url: str: The URL to check
     :return: bool: True if the URL is valid
     :raises ValueError: If the URL is invalid
     """
     import urllib.parse
-    from django.conf import settings
+    from webapp.activitypub.network import resolve
+    from webapp.activitypub.policy import blocked
 
     parsed = urllib.parse.urlparse(url)
 
@@ -38,50 +39,77 @@ def is_valid(url: str) -> bool:
         """
         raise ValueError(f"Unsupported scheme {parsed.scheme}")
 
-    for blocked_hostname in settings.BLOCKED_SERVERS:  # noqa: E501
-        if parsed.hostname == blocked_hostname or parsed.hostname.endswith(
-            f".{blocked_hostname}"
-        ):
-            raise ValueError(f"Blocked hostname {parsed.hostname}")
-
     if not parsed.hostname or parsed.hostname.lower() in ["localhost"]:
         raise ValueError(f"Invalid hostname {parsed.hostname}")
 
+    if blocked(parsed.hostname):
+        raise ValueError(f"Blocked hostname {parsed.hostname}")
+
     if parsed.hostname.endswith(".onion"):
         logger.warning(f"{url} is an onion service")
         raise ValueError(f"Unsupported onion service {parsed.hostname}")
 
-    try:
-        ip_address = socket.getaddrinfo(
-            parsed.hostname,
-            parsed.port or (80 if parsed.scheme == "http" else 443),  # noqa: E501
-        )[0][4][0]
-        logger.debug(f"{ip_address=}")
-    except socket.gaierror:  # [Errno -2] Name or service not known
-        logger.info(f"rejecting not found invalid URL {url}")
-        raise ValueError(f"rejecting not found invalid URL {url}")
+    addresses = resolve(parsed.hostname, parsed.port or 443)
+    logger.debug(f"{parsed.hostname} -> {addresses}")
 
-    try:
-        ip = ipaddress.ip_address(ip_address)
-    except socket.gaierror:  # [Errno -2] Name or service not known
-        logger.info(f"rejecting invalid IP {ip_address}")
-        raise ValueError(f"rejecting invalid IP {ip_address}")
+    return True
 
-    if ip.is_private:
-        logger.info(f"rejecting private URL {url} -> {ip_address}")
-        raise ValueError(f"rejecting private URL {url} -> {ip_address}")
 
-    return True
+def _fetch_key(url: str) -> str:
+    """
+    Cache key for the fetched document of `url`.
 
+    The fragment is not sent to the remote server, so `actor#main-key`
+    and `actor` share one entry.
+    """
+    import hashlib
+    import urllib.parse
+
+    document_url = urllib.parse.urldefrag(url).url
+    return "fetch:" + hashlib.sha256(document_url.encode("utf-8")).hexdigest()
 
-@functools.lru_cache(maxsize=512)
-def Fetch(url: str) -> dict:
+
+def _fetch_ttl(document: dict) -> int:
+    """
+    Time to live for `document`, by its `type`.
+    """
+    from django.conf import settings
+
+    ttls = settings.FETCH_TTL
+    return ttls.get(document.get("type"), ttls.get("*", 3600))
+
+
+def Fetch(url: str, refresh: bool = False) -> dict:
     """
     Fetch a remote object
+
+    Documents are cached with a time to live per object type, see
+    `FETCH_TTL`. Expired entries are revalidated with a conditional
+    request using their `ETag` and `Last-Modified`. Objects that are
+    not found or gone are cached for `FETCH_NEGATIVE_TTL` seconds.
+
+    :param url: The id of the remote object
+    :param refresh: Skip the cache and fetch the object again
+    :raises ObjectNotFoundError: The remote server answered 404
+    :raises ObjectIsGoneError: The remote server answered 410
+    :raises FetchError: The remote server answered otherwise unsuccessful
+
+    Concurrent fetches of the same `url` are coalesced into one request,
+    see :py:func:`_coalesced`.
+
+    Local objects are resolved from the database, see
+    :py:func:`webapp.activitypub.local.resolve`.
     """
+    import time
     import django.core.exceptions
     from django.conf import settings
     from django.core.cache import cache
+    from webapp.activitypub import local
+    from webapp.exceptions import ObjectIsGoneError
+    from webapp.exceptions import ObjectNotFoundError
+
+    if local.is_local(url):
+        return local.resolve(url)
 
     if not settings.CACHES.get("default"):
         raise django.core.exceptions.ImproperlyConfigured(
@@ -91,47 +119,276 @@ def Fetch(url: str) -> dict:
     if not is_valid(url):
         raise ValueError("Host/URL validation failed.")
 
-    import requests
+    key = _fetch_key(url)
+    entry = None if refresh else cache.get(key)
+    if entry is None or entry["expires"] <= time.time():
+        entry = _coalesced(url, key, entry)
+
+    match entry["status"]:
+        case 404:
+            raise ObjectNotFoundError(url)
+        case 410:
+            raise ObjectIsGoneError(url)
+    return entry["document"]
+
+
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _coalesced(url: str, key: str, entry: dict | None) -> dict:
+    """
+    Fetch `url` once, no matter how many threads ask for it concurrently.
+
+    The first caller fetches, all others wait for its result. Across
+    processes, a lock in the cache makes other workers wait for the
+    cached result instead of fetching themselves.
+    """
+    from django.conf import settings
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+
+    if not leader:
+        logger.debug(f"Waiting for in-flight fetch of {url}")
+        return future.result(timeout=2 * settings.FETCH_TIMEOUT)
+
+    try:
+        result = _locked(url, key, entry)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+
+def _locked(url: str, key: str, entry: dict | None) -> dict:
+    """
+    Fetch `url` while holding its lock in the cache.
+
+    If another process holds the lock, wait for it to store the result.
+    """
+    import time
+    from django.conf import settings
+    from django.core.cache import cache
+
+    lock = f"{key}:lock"
+    timeout = 2 * settings.FETCH_TIMEOUT
+    if cache.add(lock, 1, timeout):
+        try:
+            return _revalidate(url, key, entry)
+        finally:
+            cache.delete(lock)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        current = cache.get(key)
+        if current is not None and current["expires"] > time.time():
+            return current
+        if cache.get(lock) is None:
+            break
+    return _revalidate(url, key, entry)
+
+
+def _revalidate(url: str, key: str, entry: dict | None) -> dict:
+    """
+    (Re-)fetch `url` and store the resulting cache entry.
+    """
+    import time
+    from django.conf import settings
+    from django.core.cache import cache
+    from webapp.activitypub.network import get
+    from webapp.exceptions import FetchError
 
     headers = {
         "Content-type": "application/activity+json",
         "Accept": "application/activity+json",
     }
+    if entry is not None and entry["status"] == 200:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = get(url, headers=headers, timeout=settings.FETCH_TIMEOUT)
+
+    if response.status_code == 304 and entry is not None:
+        logger.debug(f"Revalidated {url}")
+        entry["expires"] = time.time() + _fetch_ttl(entry["document"])
+    elif response.status_code in (404, 410):
+        entry = {
+            "status": response.status_code,
+            "expires": time.time() + settings.FETCH_NEGATIVE_TTL,
+        }
+    elif response.ok:
+        document = response.json()
+        entry = {
+            "status": 200,
+            "document": document,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "expires": time.time() + _fetch_ttl(document),
+        }
+    else:
+        raise FetchError(url, response)
 
-    return cache.get_or_set(
-        url, requests.get(url, headers=headers).json(), 3600
-    )  # noqa: E501
+    # Keep expired entries around for a while to revalidate them.
+    cache.set(key, entry, settings.FETCH_STALE_TTL)
+    return entry
 
 
-@shared_task
-def fetchRemoteActor(id: str) -> dict:
+def invalidateFetch(url: str) -> None:
     """
-    Task to get details for a remote actor
+    Forget the cached document for `url`.
 
-    .. todo::
-        - Add caching
-        - Add error handling
-        - Add tests
+    The next :py:func:`Fetch` for `url` will go to the network again, and
+    so will the next :py:func:`fetchRemoteActor` for a stored actor.
     """
+    import urllib.parse
+    from django.core.cache import cache
+    from webapp.activitypub.models import Actor
 
-    actor = Fetch(id)
+    cache.delete(_fetch_key(url))
+    Actor.objects.filter(
+        id=urllib.parse.urldefrag(url).url, profile__isnull=True
+    ).update(last_fetched=None)
 
+
+def _same_origin(a: str, b: str) -> bool:
+    import urllib.parse
+
+    a, b = urllib.parse.urlparse(a), urllib.parse.urlparse(b)
+    return (a.scheme, a.netloc.lower()) == (b.scheme, b.netloc.lower())
+
+
+def storeRemoteActor(document: dict, url: str) -> bool:
     """
-    .. todo::
-        - Add error handling
-        - Add tests
+    Persist the `document` of a remote actor, fetched from `url`.
+
+    Documents are only stored if `url` has the origin of their `id`, so a
+    server cannot plant documents for the actors of another.
+
+    :return: Whether `document` is an actor and was stored.
     """
+    from django.utils.timezone import now
+    from webapp.activitypub.models import Actor
+    from webapp.activitypub.models.actor import get_actor_types
+
+    id = document.get("id")
+    if not isinstance(id, str) or document.get("type") not in get_actor_types():
+        return False
+    if not _same_origin(id, url):
+        logger.warning(f"Not storing {id}, fetched from {url}")
+        return False
 
+    fields = {
+        **Actor.document_fields(document),
+        "last_fetched": now(),
+        "next_refresh": None,
+    }
+    if not Actor.objects.filter(id=id, profile__isnull=True).update(**fields):
+        Actor.objects.bulk_create([Actor(id=id, **fields)], ignore_conflicts=True)
+    return True
+
+
+@shared_task
+def fetchRemoteActor(id: str, refresh: bool = False) -> dict:
+    """
+    Task to get details for a remote actor
+
+    Actor documents are stored on :py:class:`webapp.activitypub.models.Actor`
+    with the time they were fetched. Stored documents are served, even if
+    they are stale, and revalidated in the background by
+    :py:func:`refreshRemoteActors`. Documents are fetched before returning
+    only if none is stored, it is older than `FETCH_STALE_TTL`, or was
+    invalidated. Local actors are resolved from the database, see
+    :py:mod:`webapp.activitypub.local`.
+
+    :param id: The id of the actor, or of one of its keys.
+    :param refresh: Fetch the document again, i.e. for a rotated key.
+    """
+    import urllib.parse
+    from datetime import timedelta
+    from django.conf import settings
+    from django.utils.timezone import now
+    from webapp.activitypub import local
+    from webapp.activitypub.models import Actor
+
+    if local.is_local(id):
+        return local.resolve(id)
+
+    if not refresh:
+        stored = (
+            Actor.objects.filter(
+                id=urllib.parse.urldefrag(id).url,
+                profile__isnull=True,
+                document__isnull=False,
+                last_fetched__gt=now() - timedelta(seconds=settings.FETCH_STALE_TTL),
+            )
+            .values_list("document", flat=True)
+            .first()
+        )
+        if stored is not None:
+            return stored
+
+    actor = Fetch(id, refresh=refresh)
+    claimed = actor.get("id")
+    if isinstance(claimed, str) and not _same_origin(claimed, id):
+        # Only the origin of an actor is authoritative for its document.
+        logger.info(f"{id} claims to be {claimed}, fetching that")
+        id, actor = claimed, Fetch(claimed, refresh=refresh)
+    storeRemoteActor(actor, id)
     return actor
 
+
+@shared_task
+def refreshRemoteActors(limit: int = 100) -> int:
     """
-    return Actor(
-        id=actor.get("id"),
-        inbox=actor.get("inbox"),
-        outbox=actor.get("outbox"),  # noqa: E501
-        publicKey=actor.get("publicKey", ""),
-    )  # noqa: E501
+    Periodic task to refresh the stored documents of stale remote actors,
+    the oldest first.
+
+    Actors are stale `REMOTE_ACTOR_TTL` seconds after they were fetched.
+    Actors that fail are tried again after another `REMOTE_ACTOR_TTL`; their
+    stored documents age meanwhile, so :py:func:`fetchRemoteActor` stops
+    serving them after `FETCH_STALE_TTL`.
+
+    Schedule this with celery beat, i.e. every minute.
     """
+    from datetime import timedelta
+    from django.conf import settings
+    from django.db.models import F, Q
+    from django.utils.timezone import now
+    from webapp.activitypub.models import Actor
+
+    timestamp = now()
+    stale = timestamp - timedelta(seconds=settings.REMOTE_ACTOR_TTL)
+    ids = list(
+        Actor.objects.filter(profile__isnull=True)
+        .filter(Q(last_fetched__lt=stale) | Q(last_fetched__isnull=True))
+        .filter(Q(next_refresh__lte=timestamp) | Q(next_refresh__isnull=True))
+        .order_by(F("last_fetched").asc(nulls_first=True))
+        .values_list("id", flat=True)[:limit]
+    )
+    refreshed = 0
+    for id in ids:
+        try:
+            fetchRemoteActor(id, refresh=True)
+        except Exception as e:
+            logger.info(f"Cannot refresh remote actor {id}: {e}")
+            Actor.objects.filter(pk=id).update(
+                next_refresh=now() + timedelta(seconds=settings.REMOTE_ACTOR_TTL)
+            )
+        else:
+            refreshed += 1
+    return refreshed
 
 
 @shared_task
@@ -142,55 +399,47 @@ def requestFollow(localID: str, remoteID: str) -> bool:
     args:
         id: str: The id of the remote actor
     """
-    from webapp.models import Actor
-    from webapp.signature import signedRequest
-    from webapp.signals import action
+    from webapp.activitypub.delivery import deliver
+    from webapp.activitypub.models import Actor
+    from webapp.activitypub.signals import action
 
     localActor = Actor.objects.get(id=localID)
     remoteActor = fetchRemoteActor(remoteID)
-    remoteActorObject = Actor.objects.get(id=remoteActor.get("id"))
+    remoteActorObject, _ = Actor.objects.get_or_create(id=remoteActor.get("id"))
 
     activity_id = action.send(
         sender=localActor, verb="Follow", target=remoteActorObject
     )[0][
         1
-    ].id  # noqa: E501, BLK100
-
-    print("Actor: ", localActor)
-    print("Type: ", type(localActor))
-    print("Actor Following: ", localActor.follows)
-    print("Type: ", type(localActor.follows))
-
-    message = json.dumps(
-        {
-            "@context": "https://www.w3.org/ns/activitystreams",
-            "id": f"{activity_id}",
-            "type": "Follow",
-            "actor": localID,
-            "object": remoteID,
-        }
-    )
+    ].activity_id  # noqa: E501, BLK100
+
+    message = {
+        "@context": "https://www.w3.org/ns/activitystreams",
+        "id": f"{activity_id}",
+        "type": "Follow",
+        "actor": localID,
+        "object": remoteID,
+    }
     localActor.follows.add(remoteActorObject)  # remember we follow this actor
 
-    signed = signedRequest(  # noqa: F841,E501
-        "POST", remoteActor.get("inbox"), message, f"{localActor.id}#main-key"
-    )  # noqa: F841,E501
-    return True
+    (result,) = deliver(localActor.keyID, message, [remoteActor.get("inbox")])
+    return result.ok
 
 
 @shared_task
 def acceptFollow(inbox: str, activity: ActivityObject, accept_id: str) -> bool:
     """
-    >>> from webapp.signature import signedRequest
-    >>> r = signedRequest(
-        "POST",
-        "https://pramari.de/accounts/andreas/inbox",
-        activitymessage,
-        "https://pramari.de/@andreas#main-key"
+    Accept a follow request and deliver the `Accept` to `inbox`.
+
+    >>> acceptFollow(
+        "https://remote.example/users/alice/inbox",
+        activity,
+        accept_id,
     )
     """
-    from webapp.signature import signedRequest
     from django.contrib.sites.models import Site
+    from webapp.activitypub.delivery import deliver
+    from webapp.activitypub.models import Follow
 
     base = Site.objects.get_current().domain
 
@@ -201,26 +450,16 @@ def acceptFollow(inbox: str, activity: ActivityObject, accept_id: str) -> bool:
         "actor": activity.object,
         "object": activity.toDict(),
     }
-    logger.error(f"acceptFollow to {activity.actor}")
-    logger.error(f"with message: {message=}")
+    logger.debug(f"acceptFollow to {activity.actor}")
+    logger.debug(f"with message: {message=}")
 
     # remember we accepted this follow
-    from webapp.models.activitypub.actor import Follow
-
-    follow = Follow.objects.get(actor=activity.actor)
-    follow.accepted = accept_id
+    follow = Follow.objects.get(actor=activity.actor, object=activity.object)
+    follow.accepted = message["id"]
     follow.save()
 
-    signed = signedRequest(  # noqa: F841,E501
-        "POST",
-        inbox,
-        message,
-        f"{activity.object}#main-key",  # noqa: E501
-    )  # noqa: F841,E501
-
-    if signed.ok:
-        return True
-    return False
+    (result,) = deliver(f"{activity.object}#main-key", message, [inbox])
+    return result.ok
 
 
 @shared_task
@@ -229,8 +468,8 @@ def sendLike(localActor: str, object: str) -> bool:
     .. py:function:: sendLike(localActor: dict, object: str) -> bool
     .. todo::
         - Add tests
-        - Implement
     """
+    from webapp.activitypub.delivery import deliver
 
     if not isinstance(localActor, str):
         raise ValueError("localActor must be a string")
@@ -243,28 +482,87 @@ def sendLike(localActor: str, object: str) -> bool:
         logger.error(f"Object returned invalid: {object}")
         return False
     remote = fetched.get("attributedTo")
-    actor_inbox = Fetch(remote).get("inbox")
+    actor_inbox = fetchRemoteActor(remote).get("inbox")
     """
     {'@context': ['https://www.w3.org/ns/activitystreams', {'ostatus': 'http://ostatus.org#', 'atomUri': 'ostatus:atomUri', 'inReplyToAtomUri': 'ostatus:inReplyToAtomUri', 'conversation': 'ostatus:conversation', 'sensitive': 'as:sensitive', 'toot': 'http://joinmastodon.org/ns#', 'votersCount': 'toot:votersCount'}], 'id': 'https://23.social/users/andreasofthings/statuses/112826215633359303', 'type': 'Note', 'summary': None, 'inReplyTo': None, 'published': '2024-07-21T19:50:25Z', 'url': 'https://23.social/@andreasofthings/112826215633359303', 'attributedTo': 'https://23.social/users/andreasofthings', 'to': ['https://www.w3.org/ns/activitystreams#Public'], 'cc': ['https://23.social/users/andreasofthings/followers'], 'sensitive': False, 'atomUri': 'https://23.social/users/andreasofthings/statuses/112826215633359303', 'inReplyToAtomUri': None, 'conversation': 'tag:23.social,2024-07-21:objectId=4978426:objectType=Conversation', 'content': '<p>Harris/Ocasio-Cortez</p>', 'contentMap': {'en': '<p>Harris/Ocasio-Cortez</p>'}, 'attachment': [], 'tag': [], 'replies': {'id': 'https://23.social/users/andreasofthings/statuses/112826215633359303/replies', 'type': 'Collection', 'first': {'type': 'CollectionPage', 'next': 'https://23.social/users/andreasofthings/statuses/112826215633359303/replies?min_id=112826217149903948&page=true', 'partOf': 'https://23.social/users/andreasofthings/statuses/112826215633359303/replies', 'items': ['https://23.social/users/andreasofthings/statuses/112826217149903948']}}}  # noqa: E501
     """
 
-    message = json.dumps(
-        {
-            "@context": "https://www.w3.org/ns/activitystreams",
-            "type": "Like",
-            "actor": localActor,
-            "object": object,
-        }
-    )
+    message = {
+        "@context": "https://www.w3.org/ns/activitystreams",
+        "type": "Like",
+        "actor": localActor,
+        "object": object,
+    }
 
-    print("sending like")
-    print(f"to: {actor_inbox}")
-    print(message)
-    signed = signedRequest(  # noqa: F841,E501
-        "POST", actor_inbox, message, f"{localActor}#main-key"
-    )  # noqa: F841,E501
+    logger.debug(f"sending like to: {actor_inbox}")
+    (result,) = deliver(f"{localActor}#main-key", message, [actor_inbox])
+    return result.ok
 
-    return True
+
+@shared_task
+def publishActivity(localID: str, activity: dict) -> int:
+    """
+    Task to deliver an activity of a local actor to its audience.
+
+    Followers on the same instance share one delivery to the instance's
+    `sharedInbox`.
+
+    :return: The number of inboxes that accepted the activity.
+    """
+    from webapp.activitypub.delivery import publish
+    from webapp.activitypub.models import Actor
+
+    localActor = Actor.objects.get(id=localID)
+    return sum(result.ok for result in publish(localActor, activity))
+
+
+@shared_task
+def retryDeliveries(limit: int = 100) -> dict:
+    """
+    Periodic task to retry queued deliveries that are due.
+
+    Schedule this with celery beat, i.e. every minute.
+    """
+    from webapp.activitypub.delivery import process_queue
+
+    return process_queue(limit=limit)
+
+
+@shared_task
+def processInbox(item_id: str) -> str | None:
+    """
+    Task to verify and dispatch an activity received in an inbox.
+    """
+    from webapp.activitypub.inbox import process_item
+
+    return process_item(item_id)
+
+
+@shared_task
+def drainInbox(limit: int = 100) -> dict:
+    """
+    Periodic task to process inbox items that are due.
+
+    Picks up items whose task was lost, retries failed ones and forgets
+    activities older than `INBOX_DEDUP_TTL`.
+    Schedule this with celery beat, i.e. every minute.
+    """
+    from webapp.activitypub.inbox import forget_received, process_queue
+
+    forget_received()
+    return process_queue(limit=limit)
+
+
+@shared_task
+def updateNodeInfo() -> dict:
+    """
+    Periodic task to refresh the NodeInfo usage statistics.
+
+    Schedule this with celery beat, i.e. every hour.
+    """
+    from webapp.activitypub.nodeinfo import update_usage
+
+    return update_usage()
 
 
 """
@@ -45,3 +45,39 @@ class ActionTest(TestCase):
         a = Action.objects.all()  # noqa: F841
         s = ActionSerializer(a)  # noqa: F841
         self.assertIsInstance(s, ActionSerializer)
+
+
+class BulkActionTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from webapp.activitypub.models import Note
+
+        self.a = get_user_model().objects.create(username="bulk").profile.actor
+        self.notes = [Note.objects.create(content=f"{i}") for i in range(5)]
+
+    def test_bulk_actions(self):
+        from webapp.activitypub.models import Action
+        from webapp.activitypub.signals import action, bulk_actions
+
+        with self.assertNumQueries(4):  # two batches, and their counts
+            with bulk_actions(batch_size=3) as pending:
+                for note in self.notes:
+                    action.send(sender=self.a, verb="Like", target=note)
+                self.assertEqual(len(pending), 2)
+
+        self.assertEqual(Action.objects.count(), 5)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.statuses_count, 5)
+
+    def test_bulk_actions_discarded(self):
+        from webapp.activitypub.models import Action
+        from webapp.activitypub.signals import action, bulk_actions
+
+        with self.assertRaises(RuntimeError):
+            with bulk_actions():
+                action.send(sender=self.a, verb="Like", target=self.notes[0])
+                raise RuntimeError()
+
+        self.assertFalse(Action.objects.exists())
+        action.send(sender=self.a, verb="Like", target=self.notes[0])
+        self.assertEqual(Action.objects.count(), 1)
@@ -22,3 +22,94 @@ class ActivityObjectTest(TestCase):
     def test_activity_object_repr(self):
         for verb, object in self.activity.items():
             self.assertIsInstance(object.__repr__(), str)
+
+
+class CanonicalizeTest(TestCase):
+    def test_canonicalize_matches_uncached(self):
+        import copy
+        from webapp.activitypub.activity import canonicalize
+        from webapp.management.commands.canonicalize import uncached
+        from webapp.tests.rename_messages import follow, mention, undo
+
+        for message in (follow, mention, undo):
+            self.assertEqual(
+                canonicalize(copy.deepcopy(message)),
+                uncached(copy.deepcopy(message)),
+            )
+
+    def test_canonicalize_reuses_contexts(self):
+        import copy
+        from unittest import mock
+        from webapp.activitypub import activity
+        from webapp.tests.rename_messages import mention
+
+        activity.context_cache.clear()
+        with mock.patch.object(
+            activity,
+            "default_document_loader",
+            wraps=activity.default_document_loader,
+        ) as loader:
+            for _ in range(3):
+                activity.canonicalize(copy.deepcopy(mention))
+        self.assertEqual(loader.call_count, 1)
+
+
+class FastPathTest(TestCase):
+    def setUp(self):
+        from webapp.tests.rename_messages import follow, mention, undo
+
+        self.messages = [follow, mention, undo] + [
+            message for messages in w3c_activity.values() for message in messages
+        ]
+
+    def test_fast_path_matches_canonicalize(self):
+        import copy
+        from webapp.activitypub.activity import canonicalize, fast_canonicalize
+
+        for message in self.messages:
+            result = fast_canonicalize(copy.deepcopy(message))
+            self.assertIsNotNone(result)
+            self.assertEqual(result, canonicalize(copy.deepcopy(message)))
+
+    def test_fast_path_falls_back(self):
+        from webapp.activitypub.activity import fast_canonicalize
+
+        for message in (
+            {"@context": "https://example.com/context", "type": "Note"},
+            {
+                "@context": "https://www.w3.org/ns/activitystreams",
+                "type": "Note",
+                "content": {"@value": "Hello", "@language": "en"},
+            },
+            {
+                "@context": [
+                    "https://www.w3.org/ns/activitystreams",
+                    {"@language": "en"},
+                ],
+                "type": "Note",
+                "content": "Hello",
+            },
+            {
+                "@context": [
+                    "https://www.w3.org/ns/activitystreams",
+                    {"@base": "https://remote.example/"},
+                ],
+                "type": "Note",
+                "id": "notes/1",
+            },
+        ):
+            self.assertIsNone(fast_canonicalize(message))
+
+    def test_force_slow_path(self):
+        from unittest import mock
+        from webapp.activitypub import activity
+        from webapp.tests.rename_messages import follow
+
+        with mock.patch.object(
+            activity, "canonicalize", wraps=activity.canonicalize
+        ) as canonicalize:
+            ActivityObject(dict(follow))
+            self.assertEqual(canonicalize.call_count, 0)
+            with self.settings(JSONLD_FAST_PATH=False):
+                ActivityObject(dict(follow))
+            self.assertEqual(canonicalize.call_count, 1)
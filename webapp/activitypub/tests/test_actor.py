@@ -58,3 +58,46 @@ class ActorTestCase(TestCase):
 
         serialized = ActorSerializer(actor)
         self.assertEqual(serialized.data["id"], user.profile.actor.id)
+
+    def test_actor_cache(self):
+        """
+        Test the rendered actor is cached, with an ETag and conditional
+        responses, until the profile changes.
+        """
+        from django.core.cache import cache
+        from webapp.activitypub.serializers.actor import actor_key
+
+        cache.clear()
+        url = reverse("actor-view", kwargs={"slug": self.username})
+        result = self.client.get(url, HTTP_ACCEPT=accept_ld)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result["Content-Type"], "application/ld+json")
+        self.assertIn("Accept", result["Vary"])
+        etag = result["ETag"]
+        content = result.content
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_ACCEPT=accept_ld)
+        self.assertEqual(cached.content, content)
+        self.assertEqual(cached["ETag"], etag)
+
+        result = self.client.get(url, HTTP_ACCEPT=accept_ld, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(result.status_code, 304)
+        self.assertEqual(result.content, b"")
+        self.assertIn("Accept", result["Vary"])
+
+        profile = get_user_model().objects.get(username=self.username).profile
+        profile.public_key_pem = "changed"
+        profile.save()
+        result = self.client.get(url, HTTP_ACCEPT=accept_ld, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(result.status_code, 200)
+        self.assertNotEqual(result["ETag"], etag)
+        self.assertIn(b"changed", result.content)
+
+        for n in range(3):  # one document, whatever the parameters
+            self.client.get(url, HTTP_ACCEPT=f'{accept_ld}; x="{n}"')
+        self.assertEqual(len(cache.get(actor_key(self.username))), 1)
+
+        profile.slug = "renamed"
+        profile.save()
+        self.assertIsNone(cache.get(actor_key(self.username)))
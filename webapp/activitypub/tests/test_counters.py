@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        """
+        Setup test.
+        """
+        User = get_user_model()
+        self.actor = User.objects.create(username="counted").profile.actor
+        self.others = [
+            User.objects.create(username=f"other{i}").profile.actor for i in range(3)
+        ]
+
+    def assertCounts(self, actor, **counts):
+        actor.refresh_from_db()
+        for field, value in counts.items():
+            self.assertEqual(getattr(actor, field), value, field)
+
+    def test_follows(self):
+        from webapp.activitypub.models import Follow
+
+        self.actor.follows.add(*self.others[:2])
+        self.actor.followed_by.add(self.others[2])
+        self.assertCounts(self.actor, following_count=2, followers_count=1)
+        self.assertCounts(self.others[0], followers_count=1, following_count=0)
+        self.assertCounts(self.others[2], following_count=1)
+
+        Follow.objects.get(actor=self.actor, object=self.others[0]).delete()
+        self.actor.follows.remove(self.others[1])
+        self.assertCounts(self.actor, following_count=0, followers_count=1)
+        self.assertCounts(self.others[0], followers_count=0)
+
+        Follow.objects.create(actor=self.others[0], object=self.actor)
+        self.assertCounts(self.actor, followers_count=2)
+
+    def test_likes_and_statuses(self):
+        from webapp.activitypub.models import Like, Note
+        from webapp.activitypub.signals import action
+
+        like = Like.objects.create(actor=self.actor, object="https://remote.example/1")
+        note = Note.objects.create(content="Hello, World!")
+        created = action.send(sender=self.actor, verb="Create", action_object=note)
+        action.send(sender=self.actor, verb="Like", target=note, public=False)
+        self.assertCounts(self.actor, likes_count=1, statuses_count=1)
+
+        like.delete()
+        created[0][1].delete()
+        self.assertCounts(self.actor, likes_count=0, statuses_count=0)
+
+    def test_statuses_of_local_actors(self):
+        from webapp.activitypub.counters import reconcile
+        from webapp.activitypub.models import Action, Actor, Note
+        from webapp.activitypub.signals import action
+
+        remote = Actor.objects.create(id="https://remote.example/users/alice")
+        note = Note.objects.create(content="Hello, World!")
+        action.send(sender=remote, verb="Like", action_object=self.actor)
+        action.send(sender=self.actor, verb="Create", action_object=note)
+        self.assertCounts(remote, statuses_count=0)
+        self.assertCounts(self.actor, statuses_count=1)
+
+        self.assertEqual(reconcile()["statuses_count"], 0)
+        self.assertFalse(Action.objects.outbox(remote.id).exists())
+        self.assertEqual(Action.objects.outbox(self.actor.id).count(), 1)
+
+    def test_reconcile(self):
+        from django.core.management import call_command
+        from webapp.activitypub.counters import reconcile
+        from webapp.activitypub.models import Actor, Follow
+
+        self.actor.follows.add(*self.others)
+        Actor.objects.update(following_count=7, followers_count=0)
+        Follow.objects.filter(object=self.others[0]).update(object=self.others[1])
+
+        result = reconcile()
+        self.assertEqual(result["following_count"], 4)
+        self.assertEqual(result["followers_count"], 2)
+        self.assertCounts(self.actor, following_count=3)
+        self.assertCounts(self.others[0], followers_count=0)
+        self.assertCounts(self.others[1], followers_count=2)
+        self.assertEqual(reconcile(), dict.fromkeys(result, 0))
+        call_command("counters", self.actor.id, stdout=open("/dev/null", "w"))
+
+    def test_collection_reads_counter(self):
+        from django.urls import reverse
+        from webapp.activitypub.models import Actor
+
+        self.actor.followed_by.add(*self.others)
+        Actor.objects.filter(pk=self.actor.pk).update(followers_count=42)
+        url = reverse("actor-followers", kwargs={"slug": self.actor.profile.slug})
+        with self.assertNumQueries(2):  # profile and actor, no COUNT
+            result = self.client.get(url).json()
+        self.assertEqual(result["totalItems"], 42)
+
+
+class CountersTransactionTest(TransactionTestCase):
+    def test_atomic(self):
+        from unittest import mock
+        from webapp.activitypub.models import Actor, Follow, Like
+
+        actor = Actor.objects.create(id="https://remote.example/users/alice")
+        other = Actor.objects.create(id="https://remote.example/users/bob")
+        with mock.patch(
+            "webapp.activitypub.counters.adjust", side_effect=RuntimeError("down")
+        ):
+            with self.assertRaises(RuntimeError):
+                Follow.objects.create(actor=other, object=actor)
+            with self.assertRaises(RuntimeError):
+                Like.objects.create(actor=actor, object="https://remote.example/1")
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(Like.objects.exists())
@@ -0,0 +1,295 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.test import TestCase
+from django.urls import reverse
+
+from webapp.activitypub.delivery import DeliveryEngine
+
+
+class StubInbox(BaseHTTPRequestHandler):
+    """
+    A local inbox that records what was posted to it.
+    """
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        body = self.rfile.read(int(self.headers["content-length"]))
+        with server.lock:
+            server.in_flight -= 1
+            server.received.append((self.path, dict(self.headers), body))
+        status = 410 if self.path.endswith("/gone") else 202
+        self.send_response(status)
+        self.send_header("content-length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubInboxTestCase(TestCase):
+    """
+    Run a local stub inbox server and a signing actor.
+    """
+
+    def setUp(self):
+        from webapp.tasks import genKeyPair
+
+        self.user = get_user_model().objects.create(username="sender")
+        (
+            self.user.profile.private_key_pem,
+            self.user.profile.public_key_pem,
+        ) = genKeyPair()
+        self.user.profile.save()
+        self.key_id = self.user.profile.actor.keyID
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubInbox)
+        self.server.lock = threading.Lock()
+        self.server.received = []
+        self.server.delay = 0
+        self.server.in_flight = self.server.max_in_flight = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+        self.engine = DeliveryEngine(per_host=2, validate=lambda inbox: True)
+        self.activity = {
+            "@context": "https://www.w3.org/ns/activitystreams",
+            "type": "Like",
+            "actor": self.user.profile.actor.id,
+            "object": "https://remote.example/notes/1",
+        }
+
+    def tearDown(self):
+        self.engine.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class DeliveryEngineTest(StubInboxTestCase):
+    """
+    Deliver signed activities to a local stub inbox server.
+    """
+
+    def test_deliver(self):
+        inboxes = [f"{self.base}/users/{n}/inbox" for n in range(3)]
+        inboxes.append(f"{self.base}/users/gone")
+
+        results = self.engine.deliver(self.key_id, self.activity, inboxes)
+
+        self.assertEqual([r.inbox for r in results], inboxes)
+        self.assertEqual([r.status for r in results], [202, 202, 202, 410])
+        self.assertEqual([r.ok for r in results], [True, True, True, False])
+        self.assertEqual(len(self.server.received), 4)
+        for path, headers, body in self.server.received:
+            self.assertEqual(json.loads(body), self.activity)
+            self.assertIn(f'keyId="{self.key_id}"', headers["signature"])
+
+    def test_deliver_per_host_limit(self):
+        self.server.delay = 0.05
+        inboxes = [f"{self.base}/users/{n}/inbox" for n in range(8)]
+
+        results = self.engine.deliver(self.key_id, self.activity, inboxes)
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertLessEqual(self.server.max_in_flight, 2)
+
+    def test_deliver_invalid_inbox(self):
+        def validate(inbox):
+            raise ValueError(f"Blocked {inbox}")
+
+        engine = DeliveryEngine(validate=validate)
+        (result,) = engine.deliver(
+            self.key_id, self.activity, ["https://blocked/inbox"]
+        )
+        engine.close()
+
+        self.assertFalse(result.ok)
+        self.assertEqual(self.server.received, [])
+
+
+class FanOutTest(TestCase):
+    """
+    Recipient expansion and shared-inbox grouping.
+    """
+
+    documents = {
+        "https://big.example/users/a": {
+            "inbox": "https://big.example/users/a/inbox",
+            "endpoints": {"sharedInbox": "https://big.example/inbox"},
+        },
+        "https://big.example/users/b": {
+            "inbox": "https://big.example/users/b/inbox",
+            "endpoints": {"sharedInbox": "https://big.example/inbox"},
+        },
+        "https://small.example/c": {"inbox": "https://small.example/c/inbox"},
+        "https://small.example/d": {"inbox": "https://small.example/d/inbox"},
+    }
+
+    def setUp(self):
+        from webapp.activitypub.models import Actor
+
+        self.user = get_user_model().objects.create(username="publisher")
+        self.actor = self.user.profile.actor
+        for id in self.documents:
+            Actor.objects.create(id=id).follows.add(self.actor)
+
+    def test_expand_recipients(self):
+        from webapp.activitypub.delivery import PUBLIC, expand_recipients
+
+        activity = {
+            "type": "Create",
+            "to": [PUBLIC],
+            "cc": [self.actor.followers, "https://other.example/e"],
+            "bcc": "https://big.example/users/a",
+        }
+        self.assertEqual(
+            expand_recipients(activity, self.actor),
+            sorted([*self.documents, "https://other.example/e"]),
+        )
+
+    def test_group_inboxes(self):
+        from unittest import mock
+        from webapp.activitypub.delivery import group_inboxes
+
+        def fetch(id, refresh=False):
+            return {"id": id, "type": "Person", **self.documents[id]}
+
+        with mock.patch("webapp.activitypub.tasks.Fetch", fetch):
+            inboxes = group_inboxes(list(self.documents))
+
+        self.assertEqual(
+            inboxes,
+            [
+                "https://big.example/inbox",
+                "https://small.example/c/inbox",
+                "https://small.example/d/inbox",
+            ],
+        )
+
+        # the endpoints were stored, the documents are not fetched again
+        with mock.patch("webapp.activitypub.tasks.Fetch") as fetch:
+            self.assertEqual(group_inboxes(list(self.documents)), inboxes)
+        fetch.assert_not_called()
+
+    def test_local_endpoints(self):
+        from webapp.activitypub.models import Actor
+
+        base = f"https://{Site.objects.get_current().domain}"
+        with self.assertNumQueries(1):
+            actor = Actor.objects.get(pk=self.actor.pk)
+            self.assertEqual(
+                actor.inbox, base + reverse("actor-inbox", args=["publisher"])
+            )
+            self.assertEqual(
+                actor.followers, base + reverse("actor-followers", args=["publisher"])
+            )
+            self.assertEqual(actor.sharedInbox, base + reverse("shared-inbox"))
+
+        self.user.profile.slug = "renamed"
+        self.user.profile.save()
+        actor.refresh_from_db()
+        self.assertEqual(actor.outbox, base + reverse("actor-outbox", args=["renamed"]))
+
+
+class DeliveryQueueTest(StubInboxTestCase):
+    """
+    Failed deliveries are queued, retried and trip the circuit breaker.
+    """
+
+    def setUp(self):
+        from unittest import mock
+        from webapp.activitypub import delivery
+
+        super().setUp()
+        patcher = mock.patch.object(delivery, "_engine", self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # A port nobody listens on.
+        closed = ThreadingHTTPServer(("127.0.0.1", 0), StubInbox)
+        self.dead = f"http://127.0.0.1:{closed.server_port}/inbox"
+        closed.server_close()
+
+    def test_failed_delivery_queued(self):
+        from webapp.activitypub.delivery import deliver
+        from webapp.activitypub.models import Delivery, RemoteHost
+
+        inbox = f"{self.base}/users/0/inbox"
+        results = deliver(self.key_id, self.activity, [inbox, self.dead])
+
+        self.assertEqual([r.ok for r in results], [True, False])
+        queued = Delivery.objects.get()
+        self.assertEqual(queued.inbox, self.dead)
+        self.assertEqual(queued.attempts, 1)
+        self.assertEqual(queued.status, Delivery.Status.PENDING)
+        self.assertEqual(RemoteHost.objects.get().failures, 1)
+
+    def test_permanent_failure_not_queued(self):
+        from webapp.activitypub.delivery import deliver
+        from webapp.activitypub.models import Delivery
+
+        deliver(self.key_id, self.activity, [f"{self.base}/users/gone"])
+        self.assertFalse(Delivery.objects.exists())
+
+    def test_unresolvable_queued(self):
+        from webapp.activitypub.delivery import deliver
+        from webapp.activitypub.models import Delivery
+        from webapp.activitypub.network import ResolutionError
+
+        def validate(inbox):
+            if "unresolvable" in inbox:
+                raise ResolutionError(f"rejecting unresolvable hostname {inbox}")
+            raise ValueError(f"Invalid {inbox}")
+
+        self.engine.validate = validate
+        results = deliver(
+            self.key_id,
+            self.activity,
+            ["https://unresolvable.example/inbox", "https://invalid/inbox"],
+        )
+
+        self.assertEqual([r.ok for r in results], [False, False])
+        self.assertEqual(
+            Delivery.objects.get().inbox, "https://unresolvable.example/inbox"
+        )
+
+    def test_process_queue(self):
+        from webapp.activitypub.delivery import process_queue
+        from webapp.activitypub.models import Delivery
+
+        Delivery.objects.create(
+            key_id=self.key_id,
+            inbox=f"{self.base}/users/0/inbox",
+            host=f"127.0.0.1:{self.server.server_port}",
+            activity=self.activity,
+        )
+        counts = process_queue()
+
+        self.assertEqual(counts[Delivery.Status.DELIVERED], 1)
+        self.assertEqual(len(self.server.received), 1)
+
+    def test_circuit_breaker(self):
+        from django.test import override_settings
+        from webapp.activitypub.delivery import deliver
+        from webapp.activitypub.models import Delivery, RemoteHost
+
+        with override_settings(CIRCUIT_BREAKER_THRESHOLD=2):
+            deliver(self.key_id, self.activity, [self.dead])
+            deliver(self.key_id, self.activity, [self.dead])
+            host = RemoteHost.objects.get()
+            self.assertFalse(host.available)
+
+            (result,) = deliver(self.key_id, self.activity, [self.dead])
+
+        self.assertEqual(result.error, "Circuit open")
+        self.assertFalse(result.attempted)
+        self.assertEqual(Delivery.objects.count(), 3)
+        self.assertEqual(RemoteHost.objects.get().failures, 2)
@@ -60,3 +60,208 @@ class ActivityPubTest(TestCase):
         with self.assertRaises(ValueError):
             activity = Fetch("http://example.onion")  # noqa: F841
 
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, document=None, headers=None):
+        self.status_code = status_code
+        self.document = document
+        self.headers = headers or {}
+        self.text = ""
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return self.document
+
+
+class FetchCacheTest(TestCase):
+    """
+    Tests for the cache of fetched remote documents.
+    """
+
+    url = "https://remote.example/users/alice"
+
+    def setUp(self):
+        from unittest import mock
+        from django.core.cache import cache
+
+        cache.clear()
+        self.responses = []
+        self.requests = []
+        self.urls = []
+
+        def get(url, headers, timeout):
+            self.urls.append(url)
+            self.requests.append(headers)
+            return self.responses.pop(0)
+
+        for target, replacement in (
+            ("webapp.activitypub.tasks.is_valid", lambda url: True),
+            ("webapp.activitypub.network.get", get),
+        ):
+            patcher = mock.patch(target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_fetch_cached(self):
+        document = {"id": self.url, "type": "Person"}
+        self.responses = [FakeResponse(document=document)]
+
+        self.assertEqual(Fetch(self.url), document)
+        self.assertEqual(Fetch(f"{self.url}#main-key"), document)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_fetch_revalidate(self):
+        from django.test import override_settings
+
+        document = {"id": self.url, "type": "Person"}
+        self.responses = [
+            FakeResponse(document=document, headers={"ETag": '"v1"'}),
+            FakeResponse(status_code=304),
+        ]
+
+        with override_settings(FETCH_TTL={"*": -1}):
+            Fetch(self.url)
+            self.assertEqual(Fetch(self.url), document)
+
+        self.assertEqual(self.requests[1]["If-None-Match"], '"v1"')
+
+    def test_fetch_negative(self):
+        from webapp.exceptions import ObjectIsGoneError
+
+        self.responses = [FakeResponse(status_code=410)]
+
+        for _ in range(2):
+            with self.assertRaises(ObjectIsGoneError):
+                Fetch(self.url)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_fetch_single_flight(self):
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+
+        document = {"id": self.url, "type": "Person"}
+
+        def get(url, headers, timeout):
+            self.requests.append(headers)
+            time.sleep(0.2)
+            return FakeResponse(document=document)
+
+        with mock.patch("webapp.activitypub.network.get", get):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(Fetch, [self.url] * 8))
+
+        self.assertEqual(results, [document] * 8)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_fetch_waits_for_other_process(self):
+        import threading
+        from django.core.cache import cache
+        from webapp.activitypub.tasks import _fetch_key
+
+        key = _fetch_key(self.url)
+        cache.add(f"{key}:lock", 1, 10)  # another worker is fetching
+        document = {"id": self.url, "type": "Person"}
+        entry = {"status": 200, "document": document, "expires": 2**32}
+
+        threading.Timer(0.1, cache.set, (key, entry)).start()
+        self.assertEqual(Fetch(self.url), document)
+        self.assertEqual(self.requests, [])
+
+
+class RemoteActorStoreTest(TestCase):
+    """
+    Tests for the stored documents of remote actors.
+    """
+
+    url = FetchCacheTest.url
+    setUp = FetchCacheTest.setUp
+
+    document = {
+        "id": FetchCacheTest.url,
+        "type": "Service",
+        "preferredUsername": "alice",
+        "inbox": f"{FetchCacheTest.url}/inbox",
+        "endpoints": {"sharedInbox": "https://remote.example/inbox"},
+        "publicKey": {
+            "id": f"{FetchCacheTest.url}#main-key",
+            "owner": FetchCacheTest.url,
+            "publicKeyPem": "PEM",
+        },
+    }
+
+    def test_fetch_stored(self):
+        from django.core.cache import cache
+        from webapp.activitypub.models import Actor
+        from webapp.activitypub.tasks import fetchRemoteActor
+
+        self.responses = [FakeResponse(document=self.document)]
+        self.assertEqual(fetchRemoteActor(f"{self.url}#main-key"), self.document)
+
+        actor = Actor.objects.get(id=self.url)
+        self.assertEqual(actor.type, "Service")
+        self.assertEqual(actor.preferredUsername, "alice")
+        self.assertEqual(actor.sharedInbox, "https://remote.example/inbox")
+        self.assertEqual(actor.publicKeyPem, "PEM")
+        self.assertIsNotNone(actor.last_fetched)
+
+        cache.clear()  # served from the database, without a request
+        with self.assertNumQueries(1):
+            self.assertEqual(fetchRemoteActor(self.url), self.document)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_fetch_other_origin(self):
+        from webapp.activitypub.models import Actor
+        from webapp.activitypub.tasks import fetchRemoteActor
+
+        planted = {
+            **self.document,
+            "inbox": "https://evil.example/inbox",
+            "publicKey": {**self.document["publicKey"], "publicKeyPem": "ATTACKER"},
+        }
+        self.responses = [
+            FakeResponse(document=planted),
+            FakeResponse(document=self.document),
+        ]
+
+        self.assertEqual(fetchRemoteActor("https://evil.example/actor"), self.document)
+        self.assertEqual(self.urls, ["https://evil.example/actor", self.url])
+        self.assertEqual(Actor.objects.get(id=self.url).publicKeyPem, "PEM")
+        self.assertFalse(Actor.objects.filter(id="https://evil.example/actor").exists())
+
+    def test_stale_while_revalidate(self):
+        from datetime import timedelta
+        from django.utils.timezone import now
+        from webapp.activitypub.models import Actor
+        from webapp.activitypub.tasks import fetchRemoteActor, refreshRemoteActors
+
+        self.responses = [FakeResponse(document=self.document)]
+        fetchRemoteActor(self.url)
+        Actor.objects.filter(id=self.url).update(last_fetched=now() - timedelta(days=2))
+        Actor.objects.create(id="https://remote.example/users/gone")
+
+        # stale, but served without a request
+        self.assertEqual(fetchRemoteActor(self.url), self.document)
+        self.assertEqual(len(self.requests), 1)
+
+        renamed = {**self.document, "preferredUsername": "alicia"}
+        self.responses = [FakeResponse(status_code=410), FakeResponse(document=renamed)]
+        self.assertEqual(refreshRemoteActors(), 1)
+        self.assertEqual(fetchRemoteActor(self.url), renamed)
+        self.assertEqual(len(self.requests), 3)
+
+        # failed actors are not retried right away
+        self.assertEqual(refreshRemoteActors(), 0)
+        self.assertEqual(len(self.requests), 3)
+
+        # nor are their documents served as fresh
+        Actor.objects.filter(id=self.url).update(last_fetched=now() - timedelta(days=2))
+        self.responses = [FakeResponse(status_code=500)]
+        self.assertEqual(refreshRemoteActors(), 0)
+        actor = Actor.objects.get(id=self.url)
+        self.assertLess(actor.last_fetched, now() - timedelta(days=1))
+        self.assertGreater(actor.next_refresh, now())
@@ -72,3 +72,47 @@ class FollowingTest(TestCase):
         )  # noqa: E501
 
         self.assertEqual(result.status_code, 200)
+
+
+class CollectionPagingTest(TestCase):
+    def setUp(self):
+        """
+        Setup test.
+        """
+        self.user = User.objects.create_user(username="user", password="password")
+        self.followers = [
+            User.objects.create(username=f"follower{i}").profile.actor
+            for i in range(5)
+        ]
+        for follower in self.followers:
+            follower.follows.add(self.user.profile.actor)
+
+    def test_followers_pages(self):
+        """
+        Walk the followers collection page by page.
+        """
+        url = reverse("actor-followers", kwargs={"slug": "user"})
+        with self.settings(COLLECTION_PAGE_SIZE=2):
+            collection = self.client.get(url).json()
+            self.assertEqual(collection["type"], "OrderedCollection")
+            self.assertEqual(collection["totalItems"], 5)
+
+            items, pages, page = [], 0, collection["first"]
+            while page:
+                result = self.client.get(page.removeprefix("https://example.com"))
+                self.assertEqual(result.status_code, 200)
+                data = result.json()
+                self.assertEqual(data["type"], "OrderedCollectionPage")
+                items += data["orderedItems"]
+                pages += 1
+                page = data.get("next")
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(
+            items, [follower.id for follower in reversed(self.followers)]
+        )
+
+    def test_invalid_cursor(self):
+        url = reverse("actor-followers", kwargs={"slug": "user"})
+        result = self.client.get(url, {"page": "true", "max_id": "invalid"})
+        self.assertEqual(result.status_code, 400)
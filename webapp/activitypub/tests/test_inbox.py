@@ -109,3 +109,406 @@ class InboxTest(TestCase):
             content_type="application/json",
         )
         self.assertRaises(ParseActivityError)
+
+
+class SignedInboxTestCase(TestCase):
+    """
+    Post activities signed by a local sender to a local recipient.
+    """
+
+    def setUp(self):
+        from unittest import mock
+        from django.urls import reverse
+        from webapp.activitypub.inbox import seen_cache
+        from webapp.tasks import genKeyPair
+
+        seen_cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create(username="recipient")
+        self.sender = User.objects.create(username="sender")
+        (
+            self.sender.profile.private_key_pem,
+            self.sender.profile.public_key_pem,
+        ) = genKeyPair()
+        self.sender.profile.save()
+        self.key_id = self.sender.profile.actor.keyID
+        self.path = reverse("actor-inbox", kwargs={"slug": self.user.profile.slug})
+        self.activity = {
+            "@context": "https://www.w3.org/ns/activitystreams",
+            "id": f"{self.sender.profile.actor.id}#likes/1",
+            "type": "Like",
+            "actor": self.sender.profile.actor.id,
+            "object": "https://remote.example/notes/1",
+        }
+
+        patcher = mock.patch(
+            "webapp.activitypub.signature.getPublicKey",
+            lambda key_id, refresh=False: self.sender.profile.public_key_pem,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, activity, **headers):
+        from webapp.activitypub.signature import signedRequest
+
+        request = signedRequest(
+            "POST", f"http://testserver{self.path}", activity, self.key_id
+        )
+        request.headers.update(headers)
+        return self.client.post(
+            self.path,
+            data=request.body,
+            content_type=request.headers["content-type"],
+            headers={
+                key: value
+                for key, value in request.headers.items()
+                if key.lower() not in ("content-type", "content-length")
+            },
+        )
+
+
+class AsyncInboxTest(SignedInboxTestCase):
+    """
+    Tests for the accept-then-process inbox.
+    """
+
+    def test_inbox_async(self):
+        from unittest import mock
+        from webapp.activitypub.inbox import process_queue, stats
+        from webapp.activitypub.models import InboxItem
+
+        with self.settings(INBOX_ASYNC=True, DEBUG=False):
+            with mock.patch("webapp.activitypub.tasks.processInbox") as task:
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.post(self.activity)
+
+        self.assertEqual(response.status_code, 202)
+        item = InboxItem.objects.get()
+        task.delay.assert_called_once_with(str(item.pk))
+        self.assertEqual(item.status, InboxItem.Status.PENDING)
+        self.assertEqual(item.actor, self.user.profile.actor)
+        self.assertEqual(stats()["pending"], 1)
+
+        counts = process_queue()
+        self.assertEqual(counts[InboxItem.Status.PROCESSED], 1)
+        item.refresh_from_db()
+        self.assertEqual(item.status, InboxItem.Status.PROCESSED)
+        self.assertIsNotNone(item.latency)
+
+        result = stats()
+        self.assertEqual(result["pending"], 0)
+        self.assertEqual(result[InboxItem.Status.PROCESSED], 1)
+        self.assertIsNotNone(result["average"])
+
+    def test_inbox_async_rejects_early(self):
+        from webapp.activitypub.models import InboxItem
+
+        with self.settings(INBOX_ASYNC=True):
+            response = self.post(self.activity, digest="SHA-256=invalid")
+            self.assertEqual(response.status_code, 400)
+            response = self.client.post(
+                self.path, data=self.activity, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(InboxItem.objects.exists())
+
+    def test_inbox_async_verifies_signature(self):
+        from webapp.activitypub.inbox import process_queue
+        from webapp.activitypub.models import InboxItem
+        from webapp.tasks import genKeyPair
+
+        with self.settings(INBOX_ASYNC=True):
+            response = self.post(self.activity)
+        self.assertEqual(response.status_code, 202)
+
+        self.sender.profile.private_key_pem, self.sender.profile.public_key_pem = (
+            genKeyPair()
+        )
+        counts = process_queue()
+        self.assertEqual(counts[InboxItem.Status.REJECTED], 1)
+        self.assertEqual(InboxItem.objects.get().result, "Invalid Signature")
+
+
+class InboxDedupTest(SignedInboxTestCase):
+    """
+    Tests for acknowledging duplicate deliveries without processing them.
+    """
+
+    def test_duplicate(self):
+        from unittest import mock
+        from webapp.activitypub.inbox import dispatch, seen_cache
+        from webapp.activitypub.models import ReceivedActivity
+
+        with mock.patch(
+            "webapp.activitypub.views.inbox.dispatch", wraps=dispatch
+        ) as handler:
+            first = self.post(self.activity)
+            second = self.post(self.activity)
+            seen_cache.clear()  # as seen by another process
+            third = self.post(self.activity)
+
+        self.assertTrue(first.json()["status"].startswith("success"))
+        self.assertEqual(second.json(), {"status": "duplicate"})
+        self.assertEqual(third.json(), {"status": "duplicate"})
+        self.assertEqual(handler.call_count, 1)
+        self.assertEqual(ReceivedActivity.objects.count(), 1)
+
+    def test_forged_not_claimed(self):
+        from webapp.activitypub.models import ReceivedActivity
+
+        forged = self.post(self.activity, signature="junk")
+        self.assertEqual(forged.status_code, 400)
+        self.assertFalse(ReceivedActivity.objects.exists())
+
+        response = self.post(self.activity)
+        self.assertTrue(response.json()["status"].startswith("success"))
+        self.assertEqual(ReceivedActivity.objects.count(), 1)
+
+    def test_same_id_different_body(self):
+        from webapp.activitypub.models import ReceivedActivity
+
+        self.post(self.activity)
+        self.post(dict(self.activity, object="https://remote.example/notes/2"))
+        self.assertEqual(ReceivedActivity.objects.count(), 2)
+
+    def test_duplicate_async(self):
+        from webapp.activitypub.inbox import process_queue
+        from webapp.activitypub.models import InboxItem
+
+        with self.settings(INBOX_ASYNC=True):
+            self.post(self.activity)
+            self.post(self.activity)
+            counts = process_queue()
+            response = self.post(self.activity)
+
+        self.assertEqual(counts[InboxItem.Status.PROCESSED], 1)
+        self.assertEqual(counts[InboxItem.Status.DUPLICATE], 1)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {"status": "duplicate"})
+        self.assertEqual(InboxItem.objects.count(), 2)
+
+    def test_released_on_failure(self):
+        from unittest import mock
+        from webapp.activitypub.inbox import process_queue
+        from webapp.activitypub.models import InboxItem, ReceivedActivity
+
+        with self.settings(INBOX_ASYNC=True):
+            self.post(self.activity)
+        with mock.patch(
+            "webapp.activitypub.inbox.dispatch", side_effect=RuntimeError("down")
+        ):
+            counts = process_queue()
+
+        self.assertEqual(counts[InboxItem.Status.PENDING], 1)
+        self.assertFalse(ReceivedActivity.objects.exists())
+
+
+class SharedInboxTest(SignedInboxTestCase):
+    """
+    Tests for the shared inbox.
+    """
+
+    def setUp(self):
+        from django.urls import reverse
+
+        super().setUp()
+        self.path = reverse("shared-inbox")
+        User = get_user_model()
+        self.follower = User.objects.create(username="shared-follower")
+        self.follower.profile.actor.follows.add(self.sender.profile.actor)
+        self.bystander = User.objects.create(username="shared-bystander")
+        self.activity.update(
+            to=[self.user.profile.actor.id],
+            cc=[f"{self.sender.profile.actor.id}/followers"],
+        )
+
+    def test_recipients(self):
+        from webapp.activitypub.activity import ActivityObject
+        from webapp.activitypub.inbox import recipients
+
+        activity = ActivityObject(dict(self.activity))
+        with self.assertNumQueries(1):
+            targets = list(recipients(activity))
+        self.assertEqual(
+            targets,
+            sorted(
+                [self.user.profile.actor, self.follower.profile.actor],
+                key=lambda actor: actor.id,
+            ),
+        )
+
+        activity = ActivityObject(dict(self.activity, cc=[]))
+        self.assertEqual(list(recipients(activity)), [self.user.profile.actor])
+
+    def test_shared_inbox(self):
+        from unittest import mock
+        from webapp.activitypub.inbox import dispatch
+
+        with mock.patch(
+            "webapp.activitypub.inbox.dispatch", wraps=dispatch
+        ) as handler:
+            response = self.post(self.activity)
+            duplicate = self.post(self.activity)
+
+        self.assertTrue(response.json()["status"].startswith("success"))
+        self.assertEqual(duplicate.json(), {"status": "duplicate"})
+        self.assertEqual(
+            {call.args[0] for call in handler.call_args_list},
+            {self.user.profile.actor, self.follower.profile.actor},
+        )
+        self.assertEqual(self.client.get(self.path).status_code, 404)
+
+    def test_shared_inbox_unverified(self):
+        from unittest import mock
+
+        with mock.patch("webapp.activitypub.inbox.dispatch") as handler:
+            junk = self.client.post(
+                self.path,
+                data=self.activity,
+                content_type="application/activity+json",
+                headers={"signature": "junk"},
+            )
+            impostor = self.post(dict(self.activity, actor=self.user.profile.actor.id))
+
+        self.assertEqual(junk.status_code, 400)
+        self.assertEqual(impostor.status_code, 400)
+        handler.assert_not_called()
+
+    def test_shared_inbox_async(self):
+        from unittest import mock
+        from webapp.activitypub.inbox import dispatch, process_queue
+        from webapp.activitypub.models import InboxItem
+
+        with self.settings(INBOX_ASYNC=True):
+            response = self.post(self.activity)
+        self.assertEqual(response.status_code, 202)
+        self.assertIsNone(InboxItem.objects.get().actor)
+
+        with mock.patch(
+            "webapp.activitypub.inbox.dispatch", wraps=dispatch
+        ) as handler:
+            counts = process_queue()
+        self.assertEqual(counts[InboxItem.Status.PROCESSED], 1)
+        self.assertEqual(handler.call_count, 2)
+
+    def test_endpoints(self):
+        from webapp.activitypub.serializers import ActorSerializer
+
+        data = ActorSerializer(instance=self.user.profile.actor).data
+        self.assertEqual(
+            data["endpoints"], {"sharedInbox": "https://example.com/inbox"}
+        )
+
+
+class ResolveActorsTest(TestCase):
+    """
+    Tests for loading the actors of an inbound activity.
+    """
+
+    def test_resolve_actors(self):
+        from webapp.activitypub.activities import resolve_actors
+        from webapp.activitypub.activity import ActivityObject
+        from webapp.activitypub.models import Actor
+
+        local = get_user_model().objects.create(username="local").profile.actor
+        activity = ActivityObject(
+            {
+                "@context": "https://www.w3.org/ns/activitystreams",
+                "id": "https://remote.example/follows/1",
+                "type": "Follow",
+                "actor": "https://remote.example/users/alice",
+                "object": local.id,
+            }
+        )
+
+        with self.assertNumQueries(2):
+            actors = resolve_actors(activity)
+        self.assertEqual(set(actors), {local.id, "https://remote.example/users/alice"})
+        self.assertTrue(
+            Actor.objects.filter(id="https://remote.example/users/alice").exists()
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_actors(activity), actors)
+
+
+class FollowHandlersTest(TestCase):
+    """
+    Tests for the handlers of `Accept` and `Undo` of a `Follow`.
+    """
+
+    def setUp(self):
+        from webapp.activitypub.models import Actor
+
+        User = get_user_model()
+        self.local = User.objects.create(username="local").profile.actor
+        self.other = User.objects.create(username="other").profile.actor
+        self.remote = Actor.objects.create(id="https://remote.example/users/alice")
+
+    def assertCounts(self, actor, **counts):
+        actor.refresh_from_db()
+        for field, value in counts.items():
+            self.assertEqual(getattr(actor, field), value, field)
+
+    def follow(self, actor, object):
+        return {
+            "id": f"{actor}/follows/1",
+            "type": "Follow",
+            "actor": actor,
+            "object": object,
+        }
+
+    def test_accept(self):
+        from webapp.activitypub.activity import ActivityObject
+        from webapp.activitypub.inbox import dispatch
+        from webapp.activitypub.models import Follow
+
+        self.local.follows.add(self.remote)
+        self.other.follows.add(self.remote)
+        accept = {
+            "@context": "https://www.w3.org/ns/activitystreams",
+            "id": "https://remote.example/accepts/1",
+            "type": "Accept",
+            "actor": self.remote.id,
+            "object": self.follow(self.local.id, self.remote.id),
+        }
+
+        response = dispatch(self.local, ActivityObject(accept))
+        self.assertEqual(response.status_code, 200)
+        follow = Follow.objects.get(actor=self.local, object=self.remote)
+        self.assertEqual(follow.accepted, accept["id"])
+        self.assertIsNone(Follow.objects.get(actor=self.other).accepted)
+        self.assertCounts(self.remote, followers_count=2)
+        self.assertCounts(self.local, following_count=1)
+
+        # only the followed actor accepts
+        accept["object"] = self.follow(self.other.id, self.local.id)
+        response = dispatch(self.other, ActivityObject(accept))
+        self.assertEqual(response.status_code, 403)
+
+    def test_undo_follow(self):
+        from webapp.activitypub.activity import ActivityObject
+        from webapp.activitypub.inbox import dispatch
+        from webapp.activitypub.models import Follow
+
+        self.remote.follows.add(self.local, self.other)
+        self.assertCounts(self.local, followers_count=1)
+        undo = {
+            "@context": "https://www.w3.org/ns/activitystreams",
+            "id": "https://remote.example/undos/1",
+            "type": "Undo",
+            "actor": self.remote.id,
+            "object": self.follow(self.remote.id, self.local.id),
+        }
+
+        # only the following actor undoes
+        forged = dict(undo, object=self.follow(self.other.id, self.local.id))
+        response = dispatch(self.local, ActivityObject(forged))
+        self.assertEqual(response.status_code, 403)
+
+        response = dispatch(self.local, ActivityObject(undo))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Follow.objects.filter(object=self.local).exists())
+        self.assertTrue(Follow.objects.filter(object=self.other).exists())
+        self.assertCounts(self.local, followers_count=0)
+        self.assertCounts(self.remote, following_count=1)
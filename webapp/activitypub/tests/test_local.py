@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.test import TestCase
+
+
+class LocalTest(TestCase):
+    """
+    Local IRIs are resolved, and local inboxes delivered to, in-process.
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        self.sender = User.objects.create(username="sender").profile.actor
+        self.recipient = User.objects.create(username="recipient").profile.actor
+        self.base = f"https://{Site.objects.get_current().domain}"
+
+        def offline(*args, **kwargs):
+            raise AssertionError("No network requests for local objects")
+
+        for target in (
+            "webapp.activitypub.network.get",
+            "webapp.activitypub.delivery.DeliveryEngine.post",
+        ):
+            patcher = mock.patch(target, offline)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_resolve_actor(self):
+        from webapp.activitypub.tasks import Fetch, fetchRemoteActor
+
+        document = Fetch(self.sender.id)
+        self.assertEqual(document["id"], self.sender.id)
+        self.assertEqual(document["inbox"], self.sender.inbox)
+        self.assertEqual(document["endpoints"]["sharedInbox"], self.sender.sharedInbox)
+        self.assertEqual(fetchRemoteActor(self.sender.keyID), document)
+        self.assertEqual(document["publicKey"]["id"], self.sender.keyID)
+
+    def test_resolve_objects(self):
+        from webapp.activitypub.models import Note
+        from webapp.activitypub.signals import action
+        from webapp.activitypub.tasks import Fetch
+        from webapp.exceptions import ObjectNotFoundError
+
+        note = Note.objects.create(content="Hello, World!")
+        created = action.send(sender=self.sender, verb="Create", action_object=note)
+        activity = Fetch(created[0][1].activity_id)
+        self.assertEqual(activity["type"], "Create")
+        self.assertEqual(activity["object"]["content"], "Hello, World!")
+
+        url = f"{self.base}{note.get_absolute_url()}"
+        self.assertEqual(Fetch(url)["id"], url)
+
+        note.delete()
+        with self.assertRaises(ObjectNotFoundError):
+            Fetch(url)
+        with self.assertRaises(ObjectNotFoundError):
+            Fetch(f"{self.base}/nowhere")
+
+    def test_deliver_local(self):
+        from webapp.activitypub.delivery import deliver
+        from webapp.activitypub.models import Delivery, Note
+
+        activity = {
+            "@context": "https://www.w3.org/ns/activitystreams",
+            "id": f"{self.base}/create/1",
+            "type": "Create",
+            "actor": self.sender.id,
+            "to": [self.recipient.id],
+            "object": {
+                "type": "Note",
+                "content": "Hello, neighbour!",
+                "published": "2026-10-18T12:00:00Z",
+            },
+        }
+        inboxes = [self.recipient.inbox, self.recipient.sharedInbox]
+        results = deliver(self.sender.keyID, activity, inboxes)
+
+        self.assertEqual([result.inbox for result in results], inboxes)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(Note.objects.filter(content="Hello, neighbour!").count(), 2)
+        self.assertFalse(Delivery.objects.exists())
+
+    def test_follow_local(self):
+        from webapp.activitypub.models import Action, Follow
+        from webapp.activitypub.tasks import requestFollow
+
+        self.assertTrue(requestFollow(self.sender.id, self.recipient.id))
+
+        follow = Follow.objects.get(actor=self.sender, object=self.recipient)
+        self.assertTrue(follow.accepted.startswith(self.base))
+        self.assertEqual(Follow.objects.count(), 1)
+        # the Accept was delivered to the inbox of the follower
+        self.assertTrue(
+            Action.objects.filter(
+                actor_object_id=self.recipient.id,
+                activity_type="accept",
+                target_object_id=self.sender.id,
+            ).exists()
+        )
+        self.sender.refresh_from_db()
+        self.recipient.refresh_from_db()
+        self.assertEqual(self.sender.following_count, 1)
+        self.assertEqual(self.recipient.followers_count, 1)
@@ -0,0 +1,160 @@
+import socket
+from unittest import mock
+
+import requests
+from django.test import TestCase
+
+from webapp.activitypub.network import PinnedAdapter
+from webapp.activitypub.network import get
+from webapp.activitypub.network import resolve
+from webapp.activitypub.network import resolver_cache
+
+
+def addrinfo(*addresses):
+    return [
+        (socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 443))
+        for address in addresses
+    ]
+
+
+class ResolverTest(TestCase):
+    def setUp(self):
+        resolver_cache.clear()
+        self.addCleanup(resolver_cache.clear)
+
+    def test_resolve_cached(self):
+        with mock.patch(
+            "socket.getaddrinfo", return_value=addrinfo("93.184.215.14")
+        ) as getaddrinfo:
+            self.assertEqual(resolve("example.com"), ["93.184.215.14"])
+            self.assertEqual(resolve("example.com"), ["93.184.215.14"])
+        self.assertEqual(getaddrinfo.call_count, 1)
+
+    def test_resolve_checks_all_addresses(self):
+        for address in ("10.0.0.1", "127.0.0.1", "169.254.169.254", "::1"):
+            resolver_cache.clear()
+            with mock.patch(
+                "socket.getaddrinfo", return_value=addrinfo("93.184.215.14", address)
+            ):
+                with self.assertRaises(ValueError):
+                    resolve("example.com")
+
+    def test_resolve_expires(self):
+        with mock.patch("socket.getaddrinfo", return_value=addrinfo("10.0.0.1")):
+            with self.assertRaises(ValueError):
+                resolve("example.com")
+        with mock.patch(
+            "socket.getaddrinfo", return_value=addrinfo("93.184.215.14")
+        ) as getaddrinfo:
+            with self.assertRaises(ValueError):
+                resolve("example.com")
+            resolver_cache.clear()
+            self.assertEqual(resolve("example.com"), ["93.184.215.14"])
+        self.assertEqual(getaddrinfo.call_count, 1)
+
+    def test_resolve_unknown(self):
+        with mock.patch("socket.getaddrinfo", side_effect=socket.gaierror):
+            with self.assertRaises(ValueError):
+                resolve("example.invalid")
+
+
+class PinnedAdapterTest(TestCase):
+    def setUp(self):
+        resolver_cache.clear()
+        self.addCleanup(resolver_cache.clear)
+        resolver_cache.set(("example.com", 443), ["93.184.215.14"])
+
+    def test_pinned_connection(self):
+        adapter = PinnedAdapter()
+        request = requests.Request("GET", "https://example.com/users/alice").prepare()
+        sent = {}
+
+        def send(self, request, **kwargs):
+            sent["request"] = request
+            sent["pool"] = self.get_connection_with_tls_context(request, True)
+            return requests.Response()
+
+        with mock.patch("requests.adapters.HTTPAdapter.send", send):
+            with mock.patch("socket.getaddrinfo") as getaddrinfo:
+                adapter.send(request)
+
+        getaddrinfo.assert_not_called()
+        self.assertEqual(request.url, "https://example.com/users/alice")
+        self.assertEqual(sent["request"].url, "https://93.184.215.14:443/users/alice")
+        self.assertEqual(sent["request"].headers["Host"], "example.com")
+        self.assertEqual(sent["pool"].host, "93.184.215.14")
+        self.assertEqual(sent["pool"].conn_kw["server_hostname"], "example.com")
+        self.assertEqual(sent["pool"].assert_hostname, "example.com")
+
+
+class RedirectTest(TestCase):
+    def setUp(self):
+        resolver_cache.clear()
+        self.addCleanup(resolver_cache.clear)
+        resolver_cache.set(("example.com", 443), ["93.184.215.14"])
+        self.responses = []
+        self.sent = []
+
+        def send(adapter, request, **kwargs):
+            self.sent.append(request.url)
+            response = self.responses.pop(0)
+            response.url, response.request = request.url, request
+            return response
+
+        patcher = mock.patch("requests.adapters.HTTPAdapter.send", send)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def response(self, status_code, location=None):
+        response = requests.Response()
+        response.status_code = status_code
+        if location is not None:
+            response.headers["Location"] = location
+        return response
+
+    def test_redirect_relative(self):
+        self.responses = [self.response(301, "/users/alicia"), self.response(200)]
+
+        response = get("https://example.com/users/alice")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.url, "https://example.com/users/alicia")
+        self.assertEqual(
+            self.sent,
+            [
+                "https://93.184.215.14:443/users/alice",
+                "https://93.184.215.14:443/users/alicia",
+            ],
+        )
+
+    def test_redirect_private(self):
+        self.responses = [
+            self.response(302, "https://169.254.169.254/latest/meta-data/")
+        ]
+
+        with self.assertRaises(ValueError):
+            get("https://example.com/users/alice")
+        self.assertEqual(self.sent, ["https://93.184.215.14:443/users/alice"])
+
+    def test_redirect_invalid(self):
+        from webapp.activitypub.models import InstancePolicy
+
+        InstancePolicy.objects.create(
+            domain="redirect.policy.test", severity=InstancePolicy.Severity.BLOCK
+        )
+        for host, port in (
+            ("redirect.policy.test", 443),
+            ("example.com", 80),
+            ("example.onion", 443),
+        ):
+            resolver_cache.set((host, port), ["93.184.215.14"])
+        for location in (
+            "https://redirect.policy.test/users/alice",
+            "http://example.com/users/alice",
+            "https://example.onion/users/alice",
+        ):
+            self.sent = []
+            self.responses = [self.response(302, location), self.response(200)]
+            with self.assertRaises(ValueError):
+                get("https://example.com/users/alice")
+            self.assertEqual(self.sent, ["https://93.184.215.14:443/users/alice"])
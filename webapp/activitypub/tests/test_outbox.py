@@ -53,3 +53,119 @@ class OutboxTest(TestCase):
         )
         logger.debug(f"result: {result.content}")
         self.assertEqual(result.status_code, 200)
+
+    def test_outbox_page(self):
+        """
+        Test whether the outbox pages list the actions of the actor.
+        """
+        from webapp.activitypub.models import Note
+        from webapp.activitypub.signals import action
+
+        actor = get_user_model().objects.get(username="andreas").profile.actor
+        note = Note.objects.create(content="Hello, World!")
+        created = action.send(sender=actor, verb="Create", action_object=note)
+        (_, activity), *_ = created
+
+        result = self.client.get("/accounts/andreas/outbox").json()
+        self.assertEqual(result["totalItems"], 1)
+        result = self.client.get("/accounts/andreas/outbox", {"page": "true"}).json()
+        self.assertEqual(
+            [item["id"] for item in result["orderedItems"]], [activity.activity_id]
+        )
+        self.assertNotIn("next", result)
+
+    def test_outbox_keyset(self):
+        """
+        Page through the outbox with `max_id` and back with `min_id`.
+        """
+        from datetime import timedelta
+
+        from django.utils.timezone import now
+
+        from webapp.activitypub.models import Action, Note
+        from webapp.activitypub.signals import action
+
+        actor = get_user_model().objects.get(username="andreas").profile.actor
+        note = Note.objects.create(content="Hello, World!")
+        start = now()
+        actions = [
+            action.send(
+                sender=actor,
+                verb="Create",
+                action_object=note,
+                timestamp=start + timedelta(seconds=i // 2),  # with ties
+            )[0][1]
+            for i in range(5)
+        ]
+        newest = sorted(actions, key=lambda a: (a.timestamp, str(a.pk)), reverse=True)
+        expected = [a.activity_id for a in newest]
+        self.assertEqual(Action.objects.count(), 5)
+
+        def get(url):
+            path = url.removeprefix("https://example.com")
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            return response.json()
+
+        with self.settings(COLLECTION_PAGE_SIZE=2):
+            pages = [get(get("/accounts/andreas/outbox")["first"])]
+            while "next" in pages[-1]:
+                pages.append(get(pages[-1]["next"]))
+            self.assertNotIn("prev", pages[0])
+            self.assertEqual(
+                [item["id"] for page in pages for item in page["orderedItems"]],
+                expected,
+            )
+
+            back = get(pages[-1]["prev"])
+            self.assertEqual(back["orderedItems"], pages[-2]["orderedItems"])
+            back = get(back["prev"])
+            self.assertEqual(back["orderedItems"], pages[0]["orderedItems"])
+            self.assertNotIn("prev", back)
+
+    def test_outbox_activities(self):
+        """
+        Test that outbox pages render actions as activities, with a
+        constant number of queries, and re-render changed objects.
+        """
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from webapp.activitypub.models import Note
+        from webapp.activitypub.signals import action
+
+        cache.clear()
+        actor = get_user_model().objects.get(username="andreas").profile.actor
+
+        def page():
+            with CaptureQueriesContext(connection) as queries:
+                result = self.client.get("/accounts/andreas/outbox", {"page": "true"})
+            return result.json()["orderedItems"], len(queries)
+
+        notes = []
+        for i in range(2):
+            notes.append(Note.objects.create(content=f"Note {i}"))
+            action.send(sender=actor, verb="Create", action_object=notes[-1])
+        _, few = page()
+        cache.clear()
+        for i in range(2, 20):
+            notes.append(Note.objects.create(content=f"Note {i}"))
+            action.send(sender=actor, verb="Create", action_object=notes[-1])
+        items, many = page()
+        self.assertEqual(few, many)
+
+        self.assertEqual(len(items), 20)
+        activity = items[-1]
+        self.assertEqual(activity["type"], "Create")
+        self.assertEqual(activity["actor"], actor.id)
+        self.assertEqual(activity["object"]["type"], "Note")
+        self.assertEqual(activity["object"]["content"], "Note 0")
+
+        _, cached = page()
+        self.assertLess(cached, many)
+
+        notes[0].content = "Edited"
+        notes[0].save()
+        items, _ = page()
+        self.assertEqual(items[-1]["object"]["content"], "Edited")
@@ -0,0 +1,122 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+
+class PolicyTest(TestCase):
+    """
+    Instance policies are looked up by host and reloaded when they change.
+    """
+
+    def test_suffix_trie(self):
+        from webapp.activitypub.policy import NONE, Policy, SuffixTrie
+
+        trie = SuffixTrie()
+        trie.add("example.net", Policy(severity="block"))
+        trie.add("good.example.net", Policy(severity="none", reject_media=True))
+
+        self.assertTrue(trie.lookup("example.net").blocked)
+        self.assertTrue(trie.lookup("social.EXAMPLE.net.").blocked)
+        self.assertFalse(trie.lookup("good.example.net").blocked)
+        self.assertTrue(trie.lookup("a.good.example.net").reject_media)
+        self.assertIs(trie.lookup("badexample.net"), NONE)
+        self.assertIs(trie.lookup("net"), NONE)
+
+    def test_blocked_servers(self):
+        from webapp.activitypub.policy import blocked, policy_for
+
+        self.assertTrue(blocked("https://example.onion/users/alice"))
+        self.assertTrue(blocked("https://social.example.onion/users/alice"))
+        self.assertFalse(blocked("https://remote.example/users/alice"))
+        self.assertFalse(policy_for(None).blocked)
+        self.assertFalse(blocked("https://example.com/accounts/alice"))  # this site
+
+    def test_reload(self):
+        from webapp.activitypub.models import InstancePolicy
+        from webapp.activitypub.policy import blocked, policy_for
+
+        iri = "https://social.reload.policy.test/users/alice"
+        self.assertFalse(blocked(iri))
+
+        policy = InstancePolicy.objects.create(
+            domain="Reload.Policy.Test.", severity=InstancePolicy.Severity.SILENCE
+        )
+        self.assertEqual(policy.domain, "reload.policy.test")
+        self.assertTrue(policy_for(iri).silenced)
+
+        policy.severity = InstancePolicy.Severity.BLOCK
+        policy.save()
+        self.assertTrue(blocked(iri))
+
+        policy.delete()
+        self.assertFalse(blocked(iri))
+
+    def test_inbox_rejects_blocked(self):
+        from webapp.activitypub.models import InboxItem, InstancePolicy
+
+        InstancePolicy.objects.create(
+            domain="inbox.policy.test", severity=InstancePolicy.Severity.BLOCK
+        )
+        signature = (
+            'keyId="https://inbox.policy.test/users/mallory#main-key",'
+            'algorithm="rsa-sha256",headers="(request-target) host date",'
+            'signature="c2lnbmF0dXJl"'
+        )
+
+        response = self.client.post(
+            reverse("shared-inbox"),
+            data="not even json",
+            content_type="application/activity+json",
+            headers={"signature": signature},
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(InboxItem.objects.exists())
+
+    def test_inbox_rejects_blocked_actor(self):
+        from webapp.activitypub.activity import ActivityObject
+        from webapp.activitypub.inbox import dispatch
+        from webapp.activitypub.models import InstancePolicy
+
+        InstancePolicy.objects.create(
+            domain="actor.policy.test", severity=InstancePolicy.Severity.BLOCK
+        )
+        activity = {
+            "@context": "https://www.w3.org/ns/activitystreams",
+            "id": "https://actor.policy.test/likes/1",
+            "type": "Like",
+            "actor": "https://actor.policy.test/users/mallory",
+            "object": "https://remote.example/notes/1",
+        }
+
+        with mock.patch("webapp.activitypub.views.inbox.SignatureChecker") as checker:
+            response = self.client.post(
+                reverse("shared-inbox"),
+                data=activity,
+                content_type="application/activity+json",
+            )
+        self.assertEqual(response.status_code, 403)
+        checker.assert_not_called()
+
+        response = dispatch(None, ActivityObject(activity))
+        self.assertEqual(response.status_code, 403)
+
+    def test_deliver_skips_blocked(self):
+        from webapp.activitypub.delivery import deliver
+        from webapp.activitypub.models import Delivery, InstancePolicy
+
+        InstancePolicy.objects.create(
+            domain="deliver.policy.test", severity=InstancePolicy.Severity.BLOCK
+        )
+        with mock.patch("webapp.activitypub.delivery.DeliveryEngine.post") as post:
+            (result,) = deliver(
+                "https://remote.example/users/alice#main-key",
+                {"type": "Like"},
+                ["https://deliver.policy.test/inbox"],
+            )
+
+        self.assertFalse(result.ok)
+        self.assertFalse(result.attempted)
+        post.assert_not_called()
+        self.assertFalse(Delivery.objects.exists())
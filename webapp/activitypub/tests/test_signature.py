@@ -180,3 +180,166 @@ class SignatureTest(TestCase):
         assert algorithm == 'algorithm="rsa-sha256"'
         assert headers == 'headers="name"'
         assert signature.startswith("signature=")
+
+
+class PublicKeyCacheTest(TestCase):
+    """
+    Tests for the keyId-indexed cache of loaded public keys.
+    """
+
+    def setUp(self):
+        from webapp.activitypub.signature import public_key_cache
+
+        public_key_cache.clear()
+        self.key_id = "https://remote.example/users/alice#main-key"
+        self.public_key, self.private_key = (
+            SignatureTest._generate_public_private_key(self)
+        )
+        self.fetched = []
+
+    def _document(self, public_key):
+        def fetch(key_id):
+            self.fetched.append(key_id)
+            return {
+                "id": key_id.split("#")[0],
+                "publicKey": {"id": key_id, "publicKeyPem": public_key},
+            }
+
+        return fetch
+
+    def test_public_key_cached(self):
+        from unittest import mock
+        from webapp.activitypub.signature import getPublicKey
+
+        with mock.patch(
+            "webapp.activitypub.tasks.fetchRemoteActor",
+            self._document(self.public_key),
+        ):
+            first = getPublicKey(self.key_id)
+            second = getPublicKey(self.key_id)
+
+        self.assertIs(first, second)
+        self.assertEqual(self.fetched, [self.key_id])
+
+    def test_public_key_refresh(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from webapp.activitypub.signature import getPublicKey
+
+        cache.clear()
+        rotated, _ = SignatureTest._generate_public_private_key(self)
+        with mock.patch(
+            "webapp.activitypub.tasks.fetchRemoteActor",
+            self._document(self.public_key),
+        ):
+            first = getPublicKey(self.key_id)
+        with mock.patch(
+            "webapp.activitypub.tasks.fetchRemoteActor",
+            self._document(rotated),
+        ):
+            self.assertIs(getPublicKey(self.key_id), first)
+            second = getPublicKey(self.key_id, refresh=True)
+            with mock.patch("webapp.activitypub.tasks.invalidateFetch") as invalidate:
+                throttled = getPublicKey(self.key_id, refresh=True)
+            invalidate.assert_not_called()  # the stored document is reread
+
+        self.assertIsNot(first, second)
+        self.assertEqual(throttled.public_numbers(), second.public_numbers())
+        self.assertEqual(len(self.fetched), 3)
+        self.assertIs(getPublicKey(self.key_id), throttled)
+
+    def test_public_key_invalidate(self):
+        from webapp.activitypub.signature import invalidatePublicKey
+        from webapp.activitypub.signature import public_key_cache
+
+        public_key_cache.set(self.key_id, object())
+        invalidatePublicKey("https://remote.example/users/alice")
+        self.assertNotIn(self.key_id, public_key_cache)
+
+
+class PrivateKeyCacheTest(TestCase):
+    """
+    Tests for the cache of loaded private keys and bulk signing.
+    """
+
+    def setUp(self):
+        from webapp.activitypub.signature import private_key_cache
+        from webapp.tasks import genKeyPair
+
+        private_key_cache.clear()
+        self.user = get_user_model().objects.create(
+            username="signer", password="testpassword"
+        )
+        (
+            self.user.profile.private_key_pem,
+            self.user.profile.public_key_pem,
+        ) = genKeyPair()
+        self.user.profile.save()
+        self.key_id = self.user.profile.actor.keyID
+
+    def test_private_key_cached(self):
+        from webapp.activitypub.signature import loadPrivateKey
+
+        first = loadPrivateKey(self.key_id)
+        with self.assertNumQueries(0):
+            second = loadPrivateKey(self.key_id)
+        self.assertIs(first, second)
+
+    def test_private_key_invalidated_on_save(self):
+        from webapp.activitypub.signature import loadPrivateKey
+        from webapp.activitypub.signature import private_key_cache
+
+        loadPrivateKey(self.key_id)
+        self.user.profile.save()
+        self.assertNotIn(self.key_id, private_key_cache)
+
+    def test_private_key_invalidated_elsewhere(self):
+        from django.core.cache import cache
+        from webapp.activitypub.signature import (
+            PRIVATE_KEY_VERSION_KEY,
+            loadPrivateKey,
+        )
+        from webapp.models import Profile
+        from webapp.tasks import genKeyPair
+
+        first = loadPrivateKey(self.key_id)
+
+        # another process saves the profile with a new key
+        private_key_pem, _ = genKeyPair()
+        Profile.objects.filter(pk=self.user.profile.pk).update(
+            private_key_pem=private_key_pem
+        )
+        actor_id = self.user.profile.actor.id
+        cache.set(PRIVATE_KEY_VERSION_KEY.format(actor_id=actor_id), "other", None)
+
+        second = loadPrivateKey(self.key_id)
+        self.assertNotEqual(first.private_numbers(), second.private_numbers())
+        self.assertIs(loadPrivateKey(self.key_id), second)
+
+    def test_signed_requests(self):
+        from webapp.activitypub.signature import signedRequests
+
+        inboxes = [
+            "https://remote.example/inbox",
+            "https://other.example/users/bob/inbox",
+        ]
+        requests = signedRequests(
+            self.key_id, [(inbox, follow) for inbox in inboxes]
+        )
+        self.assertEqual([r.url for r in requests], inboxes)
+
+        for request in requests:
+            parsed = Signature.from_signature_header(request.headers["signature"])
+            http_signature = HttpSignature()
+            for field in parsed.fields():
+                if field == "(request-target)":
+                    http_signature.with_field(
+                        field, f"post {request.path_url}"
+                    )
+                else:
+                    http_signature.with_field(field, request.headers[field])
+            self.assertTrue(
+                http_signature.verify(
+                    self.user.profile.public_key_pem, parsed.signature
+                )
+            )
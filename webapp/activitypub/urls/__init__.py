@@ -26,6 +26,7 @@ from webapp.activitypub.views import (
 from webapp.activitypub.views import (
     ActorView,
     InboxView,
+    SharedInboxView,
     OutboxView,
     FollowersView,
     FollowingView,
@@ -44,6 +45,7 @@ urlpatterns = [
     # /.well-known/nodeinfo
     path(".well-known/nodeinfo", NodeInfoView.as_view(), name="nodeinfo"),
     path(".well-known/webfinger", WebFingerView.as_view(), name="webfinger"),
+    path("inbox", SharedInboxView.as_view(), name="shared-inbox"),
     path("api/v1/version", VersionView.as_view(), name="version"),
     path("api/v1/timeline", TimelineView.as_view(), name="timeline"),
     path("api/v1/streaming", StreamingView.as_view(), name="streaming"),
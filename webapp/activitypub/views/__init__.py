@@ -32,7 +32,7 @@ from .webfinger import WebFingerView
 
 # ActivityPub
 from .actor import ActorView
-from .inbox import InboxView
+from .inbox import InboxView, SharedInboxView
 from .outbox import OutboxView
 from .followers import FollowersView
 from .following import FollowingView
@@ -45,6 +45,7 @@ __all__ += [
 __all__ = [
     "ActorView",
     "InboxView",
+    "SharedInboxView",
     "OutboxView",
     "FollowersView",
     "FollowingView",
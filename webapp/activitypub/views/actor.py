@@ -1,9 +1,15 @@
+import hashlib
 import logging
 
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from rest_framework import generics
 from rest_framework.response import Response
 from webapp.models import Profile  # Profile is hosting Actor
 from webapp.activitypub.serializers import ActorSerializer
+from webapp.activitypub.serializers.actor import actor_key
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +36,11 @@ class ActorView(generics.GenericAPIView):
     .. seealso::
         `W3C Actor Objects <https://www.w3.org/TR/activitypub/#actor-objects>`_
 
+    The rendered document is cached as bytes per profile and renderer,
+    with an `ETag` for conditional requests, for `ACTOR_RENDER_TTL`
+    seconds or until the profile or actor is saved, see
+    :py:func:`webapp.activitypub.signals.invalidateActor`.
+
     .. seealso::
         :py:mod:`webapp.urls.activitypub`
 
@@ -53,6 +64,43 @@ class ActorView(generics.GenericAPIView):
         )
         if request.accepted_renderer.format == "html":
             data = {"actor": self.get_object()}
-            return Response(data, template_name=self.template_name)
+            response = Response(data, template_name=self.template_name)
+        else:
+            response = self.rendered(request)
+        # the representation depends on the `Accept` header, for shared caches
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+    def render(self, request) -> tuple[str, str, bytes]:
+        """
+        Render the actor for the accepted media type.
+
+        :return: The `ETag`, `Content-Type` and content.
+        """
         actor = self.serializer_class(instance=self.get_object()).data
-        return Response(actor)
+        renderer = request.accepted_renderer
+        content = renderer.render(actor, renderer.media_type, self.get_renderer_context())
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        etag = f'"{hashlib.sha1(content, usedforsecurity=False).hexdigest()}"'
+        return etag, content_type, content
+
+    def rendered(self, request) -> HttpResponse:
+        """
+        The cached actor document, rendered on a miss, or `304 Not Modified`
+        if the client has it.
+        """
+        key = actor_key(self.kwargs["slug"])
+        media_type = request.accepted_renderer.media_type  # not the client's
+        documents = cache.get(key) or {}
+        document = documents.get(media_type)
+        if document is None:
+            document = self.render(request)
+            documents[media_type] = document
+            cache.set(key, documents, settings.ACTOR_RENDER_TTL)
+
+        etag, content_type, content = document
+        response = HttpResponse(content, content_type=content_type)
+        response["ETag"] = etag
+        return get_conditional_response(request, etag=etag, response=response)
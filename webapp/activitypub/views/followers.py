@@ -1,10 +1,10 @@
-import json
-
 from rest_framework import generics
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 
 from webapp.models import Profile
-from webapp.encoders import UUIDEncoder
+from webapp.activitypub.collection import OrderedCollection
+from webapp.activitypub.models import Follow
 
 
 class FollowersView(generics.RetrieveAPIView):
@@ -33,7 +33,6 @@ class FollowersView(generics.RetrieveAPIView):
     lookup_field = "slug"
 
     # template_name = "activitypub/followers.html"
-    paginate_by = 20
     model = Profile
 
     """
@@ -44,19 +43,16 @@ class FollowersView(generics.RetrieveAPIView):
         return self.get_object().actor.followed_by.all()
     """
 
-    def followed_by(self):
-        return self.get_object().actor.followed_by.all()
-
     def get(self, request, *args, **kwargs):  # pylint: disable=W0613
-        result = {
-            "id": self.get_object().actor.followers,
-            "type": "Collection",
-            "totalItems": 0,
-            "items": [],
-        }
-        followed_by = self.followed_by().values_list(
-            "id", flat=True
-        )  # .order_by("-created")
-        result.update({"totalItems": len(followed_by)})
-        result.update({"items": json.dumps(list(followed_by), cls=UUIDEncoder)})
+        actor = self.get_object().actor
+        collection = OrderedCollection(
+            actor.followers,
+            Follow.objects.filter(object=actor).only("pk", "created", "actor"),
+            item=lambda follow: follow.actor_id,
+            total=actor.followers_count,
+        )
+        try:
+            result = collection.document(request.query_params)
+        except ValueError as e:
+            raise ParseError(str(e))
         return Response(result, template_name="activitypub/followers.html")
@@ -1,8 +1,9 @@
-import json
 from rest_framework import generics, renderers
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
-from webapp.encoders import UUIDEncoder
 from webapp.models import Profile
+from webapp.activitypub.collection import OrderedCollection
+from webapp.activitypub.models import Follow
 from webapp.activitypub.renderers import ActivityRenderer
 
 
@@ -31,21 +32,19 @@ class FollowingView(generics.RetrieveAPIView):
     queryset = Profile.objects.all()
     lookup_field = "slug"
 
-    paginate_by = 20
     model = Profile
     template_name = "activitypub/following.html"
 
-    def follows(self):
-        return self.get_object().actor.follows.all()
-
     def get(self, request, *args, **kwargs):
-        result = {
-            "id": self.get_object().actor.following,
-            "type": "Collection",
-            "totalItems": 0,
-            "items": [],
-        }
-        follows = self.follows().values_list("id", flat=True)  # .order_by("-created")
-        result.update({"totalItems": len(follows)})
-        result.update({"items": json.dumps(list(follows), cls=UUIDEncoder)})
+        actor = self.get_object().actor
+        collection = OrderedCollection(
+            actor.following,
+            Follow.objects.filter(actor=actor).only("pk", "created", "object"),
+            item=lambda follow: follow.object_id,
+            total=actor.following_count,
+        )
+        try:
+            result = collection.document(request.query_params)
+        except ValueError as e:
+            raise ParseError(str(e))
         return Response(result)
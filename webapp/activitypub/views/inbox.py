@@ -9,9 +9,9 @@ See::
     https://paul.kinlan.me/adding-activity-pub-to-your-static-site/
 """
 
-
 import logging
 
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.generic import DetailView
 from django.utils.decorators import method_decorator
@@ -20,7 +20,18 @@ from django.views.decorators.csrf import csrf_exempt
 from webapp.models import Profile
 from webapp.activitypub.models import Actor
 from webapp.activitypub.activity import ActivityObject
-from webapp.activitypub.activities import follow, undo, create, delete, accept, like
+from webapp.activitypub.inbox import (
+    claim,
+    dedup_key,
+    dispatch,
+    dispatch_shared,
+    receive,
+    rejected,
+    release,
+    schedule,
+    seen,
+    verified,
+)
 from webapp.activitypub.signature import SignatureChecker
 
 from ...exceptions import ParseError  # noqa: E501
@@ -94,13 +105,27 @@ class InboxView(DetailView):
             logger.error(f"ParseError: {e}")
             raise e
 
-        signature = SignatureChecker().validate(request)
+        signature = None
+        if not rejected(request, activity):  # no keys are fetched for those
+            signature = SignatureChecker().validate(request)
         logger.debug(f"Signature: {signature}")
 
-        target = self.get_object()  # this should work with DetailView?
+        target = self.recipient()
 
         return signature, activity, target
 
+    def recipient(self) -> Actor | None:
+        """
+        The local actor the inbox belongs to.
+        """
+        return self.get_object().actor
+
+    def deliver(self, target: Actor | None, activity: ActivityObject):
+        """
+        Dispatch the verified `activity` to `target`.
+        """
+        return dispatch(target=target, activity=activity)
+
     def post(self, request, *args, **kwargs):
         """
         Process the incoming activity.
@@ -111,7 +136,23 @@ class InboxView(DetailView):
 
         Second:
             Dispatch to the appropriate method based on the activity type.
+
+        With `INBOX_ASYNC`, only the basics are checked and the activity is
+        queued for a worker, see :py:mod:`webapp.activitypub.inbox`.
+
+        Requests from blocked hosts are rejected first, see
+        :py:mod:`webapp.activitypub.policy`.
         """
+        if rejected(request):
+            return JsonResponse({"error": "Blocked"}, status=403)
+
+        if settings.INBOX_ASYNC:
+            return self.enqueue(request)
+
+        key = dedup_key(request.body)
+        if key is not None and seen(key):
+            return JsonResponse({"status": "duplicate"})
+
         # Process the incoming activity
 
         try:
@@ -120,32 +161,45 @@ class InboxView(DetailView):
             logger.debug("InboxView: ParseError %s", e)
             return JsonResponse({"error": str(e.message)}, status=400)
 
-        if not signature:
+        if rejected(request, activity):
+            return JsonResponse({"error": "Blocked"}, status=403)
+
+        if not verified(request, signature, activity):
             return JsonResponse({"error": "Invalid Signature"}, status=400)
 
         logger.debug(f"Activity Object: {activity}")
 
-        match activity.type.lower():
-            case "like":
-                result = like(target=target.actor, activity=activity)
-            case "follow":
-                result = follow(target=target.actor, activity=activity)
-            case "undo":
-                result = undo(target=target.actor, activity=activity)
-            case "create":
-                result = create(target=target.actor, activity=activity)
-            case "delete":
-                result = delete(target=target.actor, activity=activity)
-            case "accept":
-                result = accept(target=target.actor, activity=activity)
-            case _:
-                error = f"InboxView: Unsupported activity: {activity.type}"
-                logger.error(f"Actvity error: {error}")
-                return JsonResponse({"error": error}, status=400)  # noqa: E501
+        if key is not None and not claim(key):
+            return JsonResponse({"status": "duplicate"})
+
+        try:
+            result = self.deliver(target, activity)
+        except Exception:
+            if key is not None:
+                release(key)
+            raise
+        if result.status_code in (400, 403):  # unsupported or blocked
+            return result
 
         # Return a success response. Unclear, why.
         return JsonResponse({"status": f"success: {result}"})
 
+    def enqueue(self, request):
+        """
+        Store the incoming activity and process it in the background.
+        """
+        try:
+            item = receive(request, self.recipient())
+        except ParseError as e:
+            logger.debug("InboxView: ParseError %s", e)
+            return JsonResponse({"error": str(e.message)}, status=400)
+
+        if item is None:
+            return JsonResponse({"status": "duplicate"}, status=202)
+
+        schedule(item)
+        return JsonResponse({"status": "accepted", "id": str(item.pk)}, status=202)
+
     def get(self, request, *args, **kwargs):
         """
         Return a 200 for GET requests.
@@ -171,3 +225,34 @@ class InboxView(DetailView):
         No CSRF token required for incoming activities.
         """
         return super().dispatch(*args, **kwargs)
+
+
+class SharedInboxView(InboxView):
+    """
+    .. py:class:: webapp.views.SharedInboxView
+
+    The shared inbox is advertised as `endpoints.sharedInbox` of all local
+    :py:class:webapp.models.activitypub.Actor objects. Remote servers post
+    an activity there once, instead of once per local recipient. The
+    signature is verified once and the activity is dispatched to each local
+    recipient, see :py:func:`webapp.activitypub.inbox.recipients`.
+
+    .. seealso::
+        `ActivityPub Shared Inbox Delivery
+        <https://www.w3.org/TR/activitypub/#shared-inbox-delivery>_`
+    """
+
+    def recipient(self) -> None:
+        """
+        The shared inbox does not belong to one actor.
+        """
+        return None
+
+    def deliver(self, target: None, activity: ActivityObject):
+        return dispatch_shared(activity)
+
+    def get(self, request, *args, **kwargs):
+        """
+        There is nothing to read in the shared inbox.
+        """
+        return JsonResponse({"status": "not found"}, status=404)
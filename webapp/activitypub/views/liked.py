@@ -1,11 +1,12 @@
-import json
-
 # from django.views.generic.detail import DetailView
 # from django.http import JsonResponse
 from rest_framework.response import Response
 from webapp.models import Profile
 
 from rest_framework import generics
+from rest_framework.exceptions import ParseError
+from webapp.activitypub.collection import OrderedCollection
+from webapp.activitypub.models import Like
 from webapp.activitypub.renderers import ActivityRenderer
 
 
@@ -32,20 +33,19 @@ class LikedView(generics.RetrieveAPIView):
     lookup_field = "slug"
     model = Profile
 
-    def liked(self):
-        result = self.get_object().actor.like_set.all()
-        return result
-
     def get(self, request, *args, **kwargs):
-        result = {
-            "id": f"{self.get_object().actor.liked}",
-            "type": "Collection",
-            "totalItems": 0,
-            "items": [],
-        }
-        likes = self.liked().values_list("object", flat=True).order_by("-created_at")
-        result.update({"totalItems": len(likes)})
-        result.update({"items": json.dumps(list(likes))})
+        actor = self.get_object().actor
+        collection = OrderedCollection(
+            f"{actor.liked}",
+            Like.objects.filter(actor=actor).only("pk", "created_at", "object"),
+            item=lambda like: like.object,
+            timestamp="created_at",
+            total=actor.likes_count,
+        )
+        try:
+            result = collection.document(request.query_params)
+        except ValueError as e:
+            raise ParseError(str(e))
         # return JsonResponse(result, content_type="application/activity+json")
         # self.object = self.get_object()
         return Response(result)
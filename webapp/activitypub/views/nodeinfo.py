@@ -10,13 +10,15 @@ Herein are NodeInfo and Version views.
 
 import logging
 
+from django.conf import settings
 from django.urls import reverse
 from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
 from django.views.generic import View
 from django.contrib.auth import get_user_model
 from django.contrib.sites.models import Site
 
-from webapp.models import Profile
+from webapp.activitypub.nodeinfo import usage
 
 from webapp import __version__
 
@@ -37,15 +39,18 @@ class NodeInfoView(View):
         """
         Response to GET Requests.
         """
+        base = f"https://{Site.objects.get_current().domain}"
         r = {
             "links": [
                 {
                     "rel": "http://nodeinfo.diaspora.software/ns/schema/2.0",
-                    "href": reverse("version"),
+                    "href": f"{base}{reverse('version')}",
                 }
             ]
         }
-        return JsonResponse(r)
+        response = JsonResponse(r)
+        patch_cache_control(response, public=True, max_age=settings.NODEINFO_MAX_AGE)
+        return response
 
 
 class VersionView(View):
@@ -54,6 +59,8 @@ class VersionView(View):
 
     endpoint::
         /api/v1/version
+
+    The usage statistics are cached, see :py:mod:`webapp.activitypub.nodeinfo`.
     """
 
     def get(self, request, *args, **kwargs):  # pylint: disable=W0613
@@ -61,7 +68,6 @@ class VersionView(View):
         Response to GET Requests.
         """
         nodename = Site.objects.get_current().name
-        total = len(Profile.objects.all())
         r = {
             "version": __version__,
             "software": {
@@ -70,18 +76,13 @@ class VersionView(View):
             },
             "protocols": ["activitypub"],
             "services": {"outbound": [], "inbound": []},
-            "usage": {
-                "users": {
-                    "total": total,
-                    "activeMonth": 0,  # 251585,
-                    "activeHalfyear": 0,  # 660001,
-                },
-                "localPosts": 0,  # 83554772,
-            },
+            "usage": usage(),
             "openRegistrations": False,
             "metadata": {
                 "nodeName": nodename,
                 "nodeDescription": "Private ActivityPub Server",
             },
         }
-        return JsonResponse(r)
+        response = JsonResponse(r)
+        patch_cache_control(response, public=True, max_age=settings.NODEINFO_MAX_AGE)
+        return response
@@ -1,9 +1,10 @@
 from django.http import JsonResponse
 from django.views import View
-from django.core.paginator import Paginator
 
 from webapp.models import Profile
+from webapp.activitypub.collection import OrderedCollection
 from webapp.activitypub.models import Action
+from webapp.activitypub.serializers.action import ActionSerializer
 
 
 class OutboxView(View):
@@ -19,42 +20,32 @@ class OutboxView(View):
     """
 
     def get(self, request, *args, **kwargs):
-        # Retrieve the activity stream of the authenticated user's actor
-        # ...
+        """
+        Return the outbox, or one of its pages, see
+        :py:class:`webapp.activitypub.collection.OrderedCollection`.
+        """
 
         slug = kwargs.get("slug")
-        page = request.GET.get("page", None)
 
         try:
             profile = Profile.objects.get(slug=slug)  # pylint: disable=E1101
         except Profile.DoesNotExist:
             return JsonResponse({"error": "Profile not found"}, status=404)
 
-        activity_list = Action.objects.filter(actor_object_id=profile.id)
-        paginator = Paginator(activity_list, 10)
-        # from django.core import serializers
+        actor = profile.actor
+        collection = OrderedCollection(
+            actor.outbox,
+            Action.objects.outbox(actor.id),
+            timestamp="timestamp",
+            items=lambda actions: ActionSerializer(actions, many=True).data,
+            total=actor.statuses_count,
+        )
 
         # Prepare the activity stream response
-        activity_stream = {
-            "@context": "https://www.w3.org/ns/activitystreams",
-            "type": "OrderedCollection",
-            "totalItems": paginator.count,
-            "first": f"{profile.actor.outbox}?page=1",
-            "last": f"{profile.actor.outbox}?page={paginator.num_pages}",
-        }
-
-        if page:
-            # Add the serialized activity list to the activity stream
-            data = {}  # serializers.serialize(
-            # "json",
-            # paginator.page(int(page)),
-            # fields=["id", "content", "published"],  # pylint: disable=E501
-            # )
-            activity_stream["type"] = "OrderedCollectionPage"
-            activity_stream[
-                "current"
-            ] = f"{profile.actor.outbox}?page={page}"  # pylint: disable=E501
-            activity_stream["orderedItems"] = data
+        try:
+            activity_stream = collection.document(request.GET)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
 
         # Return the activity stream as a JSON response
         return JsonResponse(activity_stream)
@@ -0,0 +1,79 @@
+import copy
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+
+def uncached(ld_data: dict) -> dict:
+    """
+    `canonicalize` without the context cache, as a baseline.
+
+    The document loader is passed in the options, pyld's process wide
+    loader is left alone.
+    """
+    from pyld import jsonld
+    from webapp.activitypub.activity import default_document_loader
+
+    options = {"documentLoader": default_document_loader}
+    context = ld_data["@context"]
+    return jsonld.compact(jsonld.expand(ld_data, options), context, options)
+
+
+class Command(BaseCommand):
+    help = "benchmark json-ld canonicalization of inbound activities"
+
+    def add_arguments(self, parser):
+        """
+        add arguments to the command
+
+        args:
+            Files with activities to canonicalize, defaults to samples.
+
+        use like this:
+            manage.py canonicalize
+            manage.py canonicalize --iterations 1000 activity.json
+        """
+        parser.add_argument("files", nargs="*", type=str)
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        """
+        handle the command
+
+        args:
+            args: arguments
+            options: options
+        """
+        from webapp.activitypub.activity import canonicalize, fast_canonicalize, parse
+        from webapp.activitypub.samples import follow, mention, undo
+
+        if options["files"]:
+            activities = {}
+            for name in options["files"]:
+                with open(name) as f:
+                    activities[name] = json.load(f)
+        else:
+            activities = {"follow": follow, "undo": undo, "mention": mention}
+
+        iterations = options["iterations"]
+        for name, activity in activities.items():
+            if fast_canonicalize(copy.deepcopy(activity)) is None:
+                self.stdout.write(f"{name}: not eligible for the fast path")
+            timings = {}
+            for label, function in (
+                ("uncached", uncached),
+                ("cached", canonicalize),
+                ("fast", parse),
+            ):
+                function(copy.deepcopy(activity))  # warm up
+                copies = [copy.deepcopy(activity) for _ in range(iterations)]
+                start = time.perf_counter()
+                for document in copies:
+                    function(document)
+                timings[label] = (time.perf_counter() - start) / iterations * 1000
+            self.stdout.write(
+                f"{name}: {timings['uncached']:.3f}ms -> {timings['cached']:.3f}ms "
+                f"-> {timings['fast']:.3f}ms per activity "
+                f"(uncached -> cached -> fast path)"
+            )
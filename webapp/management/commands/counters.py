@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "reconcile the follower, following, like and status counters of actors"
+
+    def add_arguments(self, parser):
+        """
+        add arguments to the command
+
+        args:
+            IDs of the actors to reconcile, defaults to all.
+
+        use like this:
+            manage.py counters
+            manage.py counters https://pramari.de/@andreas
+        """
+        parser.add_argument("actors", nargs="*", type=str)
+
+    def handle(self, *args, **options):
+        """
+        handle the command
+
+        args:
+            args: arguments
+            options: options
+        """
+        from webapp.activitypub.counters import reconcile
+        from webapp.activitypub.models import Actor
+
+        queryset = Actor.objects.all()
+        if options["actors"]:
+            queryset = queryset.filter(id__in=options["actors"])
+
+        for field, drifted in reconcile(queryset).items():
+            self.stdout.write(f"{field}\t{drifted} reconciled")
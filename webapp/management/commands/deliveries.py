@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+
+class Command(BaseCommand):
+    help = "inspect and drain the outbound delivery queue"
+
+    def add_arguments(self, parser):
+        """
+        add arguments to the command
+
+        use like this:
+            manage.py deliveries
+            manage.py deliveries --hosts
+            manage.py deliveries --drain
+            manage.py deliveries --purge
+        """
+        parser.add_argument(
+            "--hosts",
+            action="store_true",
+            help="List remote hosts with failures.",
+        )
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="Attempt all pending deliveries now, ignoring backoff.",
+        )
+        parser.add_argument(
+            "--purge",
+            action="store_true",
+            help="Delete delivered and failed deliveries.",
+        )
+        parser.add_argument("--limit", type=int, default=100)
+
+    def handle(self, *args, **options):
+        """
+        handle the command
+
+        args:
+            args: arguments
+            options: options
+        """
+        from webapp.activitypub.delivery import process_queue
+        from webapp.activitypub.models import Delivery, RemoteHost
+
+        if options["drain"]:
+            while Delivery.objects.filter(status=Delivery.Status.PENDING).exists():
+                counts = process_queue(limit=options["limit"], force=True)
+                self.stdout.write(f"Processed: {counts}")
+                if not counts[Delivery.Status.DELIVERED]:
+                    break  # nothing gets through, leave the rest to backoff
+
+        if options["purge"]:
+            deleted, _ = Delivery.objects.exclude(
+                status=Delivery.Status.PENDING
+            ).delete()
+            self.stdout.write(f"Deleted {deleted} deliveries.")
+
+        if options["hosts"]:
+            for host in RemoteHost.objects.filter(failures__gt=0).order_by("-failures"):
+                state = (
+                    "gone"
+                    if host.gone
+                    else (
+                        "available"
+                        if host.available
+                        else f"open until {host.open_until}"
+                    )
+                )
+                self.stdout.write(f"{host.host}\t{host.failures}\t{state}")
+
+        for row in (
+            Delivery.objects.values("status")
+            .annotate(count=Count("id"))
+            .order_by("status")
+        ):
+            self.stdout.write(f"{row['status']}\t{row['count']}")
+
+        pending = Delivery.objects.filter(status=Delivery.Status.PENDING)
+        for row in (
+            pending.values("host").annotate(count=Count("id")).order_by("-count")[:20]
+        ):
+            self.stdout.write(f"  {row['host']}\t{row['count']}")
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "inspect and drain the queue of received activities"
+
+    def add_arguments(self, parser):
+        """
+        add arguments to the command
+
+        use like this:
+            manage.py inbox
+            manage.py inbox --window 1440
+            manage.py inbox --drain
+            manage.py inbox --purge
+        """
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="Process all pending activities that are due now.",
+        )
+        parser.add_argument(
+            "--purge",
+            action="store_true",
+            help="Delete processed activities and expired dedup records.",
+        )
+        parser.add_argument("--limit", type=int, default=100)
+        parser.add_argument(
+            "--window",
+            type=int,
+            default=60,
+            help="Report latency over the last WINDOW minutes.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        handle the command
+
+        args:
+            args: arguments
+            options: options
+        """
+        from webapp.activitypub.inbox import forget_received, process_queue, stats
+        from webapp.activitypub.models import InboxItem
+
+        if options["drain"]:
+            while True:
+                counts = process_queue(limit=options["limit"])
+                if not any(counts.values()):
+                    break
+                self.stdout.write(f"Processed: {counts}")
+
+        if options["purge"]:
+            deleted, _ = InboxItem.objects.exclude(
+                status=InboxItem.Status.PENDING
+            ).delete()
+            self.stdout.write(f"Deleted {deleted} activities.")
+            self.stdout.write(f"Forgot {forget_received()} received activities.")
+
+        result = stats(timedelta(minutes=options["window"]))
+        self.stdout.write(f"pending\t{result['pending']}")
+        self.stdout.write(f"oldest\t{result['oldest']}")
+        for status in InboxItem.Status.values:
+            if status != InboxItem.Status.PENDING:
+                self.stdout.write(f"{status}\t{result.get(status, 0)}")
+        self.stdout.write(f"average\t{result['average']}")
+        self.stdout.write(f"maximum\t{result['maximum']}")
@@ -717,9 +717,48 @@ class ToolTest(TestCase):
         result = response.json()["links"][0]["href"]
         base = f"https://{Site.objects.get_current().domain}"
         logger.debug(f"base: {base}")
-        self.assertEqual(result, "/api/v1/version")
+        self.assertEqual(result, f"{base}/api/v1/version")
 
     def test_version(self):
         # Issue a GET request.
         response = self.client.get("/api/v1/version")
         self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age", response["Cache-Control"])
+
+    def test_version_usage(self):
+        from datetime import timedelta
+
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        from django.utils.timezone import now
+
+        from webapp.activitypub.models import Action, Note
+        from webapp.activitypub.nodeinfo import update_usage
+        from webapp.activitypub.signals import action
+
+        User = get_user_model()
+        recent, old = (
+            User.objects.create(username=name).profile.actor
+            for name in ("recent", "old")
+        )
+        note = Note.objects.create(content="Hello, World!")
+        Note.objects.create(content="Remote", remoteID="https://remote.example/1")
+        action.send(sender=recent, verb="Create", action_object=note)
+        action.send(sender=old, verb="Like", target=note)
+        Action.objects.filter(actor_object_id=old.id).update(
+            timestamp=now() - timedelta(days=90)
+        )
+
+        cache.clear()
+        usage = self.client.get("/api/v1/version").json()["usage"]
+        self.assertEqual(usage["users"]["activeMonth"], 1)
+        self.assertEqual(usage["users"]["activeHalfyear"], 2)
+        self.assertEqual(usage["localPosts"], 1)
+
+        # served from the cache until it is updated
+        Note.objects.create(content="Another")
+        usage = self.client.get("/api/v1/version").json()["usage"]
+        self.assertEqual(usage["localPosts"], 1)
+        update_usage()
+        usage = self.client.get("/api/v1/version").json()["usage"]
+        self.assertEqual(usage["localPosts"], 2)